@@ -0,0 +1,160 @@
+'''
+    Benchmark of the HLC timestamp codec against the iso8601 path it replaced.
+
+    Parses and formats a set of distinct timestamps with the old functions (iso8601.parse_date plus string surgery,
+    strftime for every timestamp), with parse_hlc / format_hlc with empty caches, and with warm caches, which is what
+    a node sees when the same timestamp is looked at by several queues. New timestamps are made with a locked
+    HLC_Clock, a single loop one and in batches with reserve_hlc_timestamps. Results are printed as JSON.
+
+        python -m lamden.benchmarks.hlc_codec --timestamps 10000
+'''
+from datetime import datetime, timezone
+from iso8601 import parse_date
+from lamden.hlcpy import HLC, parse_hlc, format_hlc, hlc_key, seconds_to_iso8601
+from lamden.nodes.hlc import HLC_Clock
+import argparse
+import json
+import random
+import sys
+import time
+import timeit
+
+
+def old_iso8601_to_nanos(s: str) -> int:
+    last_dot = s.rindex('.')
+    zone_sep = s.index('Z') if 'Z' in s else s.index('+')
+    decimals_str = s[last_dot:zone_sep]
+    s_clean = s.replace(decimals_str, '')
+    dt = parse_date(s_clean)
+    seconds = round(dt.timestamp())
+    decimals_str = decimals_str.replace('.', '').ljust(9, '0')
+    return int(str(seconds) + decimals_str)
+
+
+def old_parse(s: str) -> tuple:
+    spl = s.split('_')
+    return old_iso8601_to_nanos(spl[0]), int(spl[1]) if len(spl) > 1 else 0
+
+
+def old_format(nanos: int, logical: int) -> str:
+    dt = datetime.fromtimestamp(nanos // 1_000_000_000, tz=timezone.utc)
+    return '{}.{:09.0f}Z_{}'.format(dt.strftime('%Y-%m-%dT%H:%M:%S'), nanos % 1_000_000_000, logical)
+
+
+def make_timestamps(amount: int, seed: int = None) -> list:
+    # A few minutes of timestamps, like a busy node produces
+    rng = random.Random(seed)
+    start = HLC.get_nanoseconds()
+    return sorted((start + rng.randrange(0, 300 * 10**9), rng.randrange(0, 4)) for _ in range(amount))
+
+
+def clear_caches():
+    parse_hlc.cache_clear()
+    seconds_to_iso8601.cache_clear()
+
+
+def best_of(function, repeat: int, setup=None) -> float:
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        timings.append(timeit.timeit(function, number=1))
+    return min(timings)
+
+
+def run(amount: int, repeat: int = 5, seed: int = None) -> dict:
+    tuples = make_timestamps(amount, seed=seed)
+    strings = [format_hlc(nanos, logical) for nanos, logical in tuples]
+
+    if [old_parse(s) for s in strings] != [parse_hlc(s) for s in strings]:
+        raise RuntimeError('parse_hlc does not match the iso8601 parser.')
+    if [old_format(*t) for t in tuples] != strings:
+        raise RuntimeError('format_hlc does not match the old formatter.')
+
+    def parse_old():
+        for s in strings:
+            old_parse(s)
+
+    def parse_new():
+        for s in strings:
+            parse_hlc(s)
+
+    def format_old():
+        for t in tuples:
+            old_format(*t)
+
+    def format_new():
+        for t in tuples:
+            format_hlc(*t)
+
+    locked_clock = HLC_Clock()
+    single_loop_clock = HLC_Clock(single_loop=True)
+
+    def tick_locked():
+        for _ in range(amount):
+            locked_clock.get_new_hlc_timestamp()
+
+    def tick_single_loop():
+        for _ in range(amount):
+            single_loop_clock.get_new_hlc_timestamp()
+
+    def reserve_single_loop():
+        single_loop_clock.reserve_hlc_timestamps(amount)
+
+    def sort_strings():
+        sorted(strings)
+
+    def sort_keys():
+        sorted(strings, key=hlc_key)
+
+    timings = {
+        'parse_iso8601': best_of(parse_old, repeat),
+        'parse_cold': best_of(parse_new, repeat, setup=clear_caches),
+        'parse_warm': best_of(parse_new, repeat),
+        'format_strftime': best_of(format_old, repeat),
+        'format_cold': best_of(format_new, repeat, setup=clear_caches),
+        'format_warm': best_of(format_new, repeat),
+        'tick_locked': best_of(tick_locked, repeat),
+        'tick_single_loop': best_of(tick_single_loop, repeat),
+        'reserve_single_loop': best_of(reserve_single_loop, repeat),
+        'sort_strings': best_of(sort_strings, repeat),
+        'sort_keys_warm': best_of(sort_keys, repeat)
+    }
+
+    return {
+        'timestamps': amount,
+        'ops_per_second': {name: round(amount / seconds, 1) for name, seconds in timings.items()},
+        'speedup': {
+            'parse_cold': round(timings['parse_iso8601'] / timings['parse_cold'], 2),
+            'parse_warm': round(timings['parse_iso8601'] / timings['parse_warm'], 2),
+            'format_cold': round(timings['format_strftime'] / timings['format_cold'], 2),
+            'format_warm': round(timings['format_strftime'] / timings['format_warm'], 2),
+            'tick_single_loop': round(timings['tick_locked'] / timings['tick_single_loop'], 2),
+            'reserve_single_loop': round(timings['tick_locked'] / timings['reserve_single_loop'], 2)
+        }
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the HLC timestamp codec against the iso8601 path')
+    parser.add_argument('-n', '--timestamps', type=int, default=10_000)
+    parser.add_argument('-r', '--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('-o', '--output', type=str, default=None, help='file to write the results to')
+    args = parser.parse_args()
+
+    results = {
+        'time': time.time(),
+        'python': sys.version.split()[0],
+        **run(amount=args.timestamps, repeat=args.repeat, seed=args.seed)
+    }
+
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4)
+
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,272 @@
+'''
+    Multi node consensus throughput benchmark.
+
+    Starts a network of N masternodes in this process, all on one event loop and connected over loopback, and spreads
+    pre-signed transactions over their FileQueues. Every node has to execute every transaction, reach consensus on
+    its result with the others and store it in a block. Latency, jitter and loss can be injected into the work and
+    solution messages a node receives from its peers, to see how consensus holds up on a slower network.
+
+    For every network size the transactions and blocks per second stored by every node, the time to consensus
+    distribution (from the FileQueue to a node's BlockStorage, per node and until the last node) and the messages
+    sent and received per node are printed as JSON.
+
+        python -m lamden.benchmarks.network_throughput --nodes 3 10 30 --txs 200 --latency 0.02 --loss 0.01
+'''
+from contracting.db.encoder import encode, decode
+from lamden.benchmarks.node_throughput import make_genesis_block, create_node, cpu_seconds, lamden_version, \
+    LatencyTracker, track_stored_blocks
+from lamden.benchmarks.webserver_submissions import SignedTransactions
+from lamden.crypto.wallet import Wallet
+from lamden.nodes.base import Node, WORK_SERVICE, CONTENDER_SERVICE
+from lamden.nodes.processors.processor import Processor
+from lamden.nodes.profiler import summarize
+from collections import Counter
+from pathlib import Path
+import argparse
+import asyncio
+import json
+import random
+import resource
+import shutil
+import tempfile
+import time
+
+BASE_PORT = 19000
+
+# Peers derive the publisher port of a node from its router port, 80 apart
+MAX_NODES = 80
+
+IMPAIRED_SERVICES = (WORK_SERVICE, CONTENDER_SERVICE)
+
+
+class ImpairedProcessor(Processor):
+    '''
+        Sits in front of a node's processor for a subscription and delays or drops the messages it receives.
+    '''
+    def __init__(self, processor: Processor, latency: float = 0, jitter: float = 0, loss: float = 0,
+                 rng: random.Random = None):
+        self.processor = processor
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.random = rng or random.Random()
+
+        self.received = 0
+        self.dropped = 0
+
+    async def process_message(self, msg):
+        self.received += 1
+
+        if self.loss > 0 and self.random.random() < self.loss:
+            self.dropped += 1
+            return
+
+        delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter > 0 else 0)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        await self.processor.process_message(msg)
+
+
+def impair(node: Node, latency: float, jitter: float, loss: float, rng: random.Random) -> dict:
+    processors = {}
+    for service in IMPAIRED_SERVICES:
+        processors[service] = ImpairedProcessor(processor=node.network.services[service], latency=latency,
+                                                jitter=jitter, loss=loss, rng=rng)
+        node.network.add_service(service, processors[service])
+
+    return processors
+
+
+def count_published(node: Node) -> Counter:
+    sent = Counter()
+    async_publish = node.network.publisher.async_publish
+
+    async def counted_async_publish(topic_str: str, msg_dict: dict):
+        sent[topic_str] += 1
+        return await async_publish(topic_str=topic_str, msg_dict=msg_dict)
+
+    node.network.publisher.async_publish = counted_async_publish
+
+    return sent
+
+
+async def submit(nodes: list, trackers: list, submitted: dict, txs: list, rate: float):
+    # txs holds (node index, tx), every transaction goes to the FileQueue of the node it was signed for
+    interval = 1 / rate if rate else 0
+    start = time.time()
+
+    for index, (node_index, tx) in enumerate(txs):
+        if interval:
+            await asyncio.sleep(max(start + index * interval - time.time(), 0))
+
+        now = time.time()
+        submitted[tx['metadata']['signature']] = now
+        for tracker in trackers:
+            tracker.submit([tx], now=now)
+
+        nodes[node_index].tx_queue.append(encode(tx).encode())
+
+
+async def run(num_of_nodes: int, num_of_txs: int, senders_per_node: int, rate: float, latency: float, jitter: float,
+              loss: float, delay: dict, timeout: float, root: Path, seed: int = None) -> dict:
+    rng = random.Random(seed)
+
+    wallets = [Wallet() for _ in range(num_of_nodes)]
+    senders = [[Wallet() for _ in range(senders_per_node)] for _ in range(num_of_nodes)]
+
+    members = [wallet.verifying_key for wallet in wallets]
+    bootnodes = {wallet.verifying_key: f'tcp://127.0.0.1:{BASE_PORT + i}' for i, wallet in enumerate(wallets)}
+
+    genesis_block = make_genesis_block(founder_wallet=Wallet(), members=members,
+                                       senders=[wallet for node_senders in senders for wallet in node_senders])
+
+    nodes = []
+    trackers = []
+    processors = []
+    published = []
+
+    for i, wallet in enumerate(wallets):
+        node = create_node(
+            wallet=wallet,
+            root=root.joinpath(wallet.verifying_key),
+            genesis_block=genesis_block,
+            constitution={'masternodes': bootnodes},
+            bootnodes=bootnodes,
+            port=BASE_PORT + i,
+            delay=delay
+        )
+
+        tracker = LatencyTracker()
+        track_stored_blocks(node=node, tracker=tracker)
+
+        nodes.append(node)
+        trackers.append(tracker)
+        processors.append(impair(node=node, latency=latency, jitter=jitter, loss=loss, rng=rng))
+        published.append(count_published(node=node))
+
+    # Signing happens up front so it is not part of the measurement
+    signers = [SignedTransactions(wallets=senders[i], processor=wallet.verifying_key) for i, wallet in enumerate(wallets)]
+    txs = [(i % num_of_nodes, decode(signers[i % num_of_nodes].next())) for i in range(num_of_txs)]
+    submitted = {}
+
+    await asyncio.gather(*[node.start() for node in nodes])
+    if not all(node.started for node in nodes):
+        await asyncio.gather(*[node.stop() for node in nodes])
+        raise RuntimeError(f'{sum(not node.started for node in nodes)} of {num_of_nodes} nodes did not start.')
+
+    # The genesis block is stored when a node starts
+    blocks_before = [tracker.blocks for tracker in trackers]
+
+    cpu_before = cpu_seconds()
+    start = time.time()
+
+    try:
+        submitting = asyncio.ensure_future(submit(nodes=nodes, trackers=trackers, submitted=submitted, txs=txs,
+                                                  rate=rate))
+
+        stop_at = start + timeout
+        while (not submitting.done() or any(tracker.pending > 0 for tracker in trackers)) and time.time() < stop_at:
+            await asyncio.sleep(0.05)
+
+        elapsed = time.time() - start
+        cpu = cpu_seconds() - cpu_before
+
+        submitting.cancel()
+    finally:
+        await asyncio.gather(*[node.stop() for node in nodes])
+
+    # A transaction is in consensus on the network once the last node stored its block
+    on_all_nodes = [
+        max(tracker.stored_at[signature] for tracker in trackers) - submitted_at
+        for signature, submitted_at in submitted.items()
+        if all(signature in tracker.stored_at for tracker in trackers)
+    ]
+
+    blocks = [tracker.blocks - before for tracker, before in zip(trackers, blocks_before)]
+
+    return {
+        'version': lamden_version(),
+        'nodes': num_of_nodes,
+        'txs': num_of_txs,
+        'rate': rate,
+        'latency': latency,
+        'jitter': jitter,
+        'loss': loss,
+        'processed': len(on_all_nodes),
+        'missing': num_of_txs - len(on_all_nodes),
+        'seconds': round(elapsed, 3),
+        'txs_per_second': round(len(on_all_nodes) / elapsed, 2),
+        'blocks_per_second': round(min(blocks) / elapsed, 2),
+        'time_to_consensus_seconds': {
+            'per_node': summarize([latency for tracker in trackers for latency in tracker.latencies]),
+            'all_nodes': summarize(on_all_nodes)
+        },
+        'messages': [
+            {
+                'node': node.wallet.verifying_key,
+                'blocks': node_blocks,
+                'sent': dict(sent),
+                'received': {service: processor.received for service, processor in node_processors.items()},
+                'dropped': {service: processor.dropped for service, processor in node_processors.items()}
+            }
+            for node, node_blocks, node_processors, sent in zip(nodes, blocks, processors, published)
+        ],
+        'cpu_seconds': round(cpu, 3),
+        # ru_maxrss is in kilobytes on Linux
+        'max_rss_bytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark consensus throughput of a network of nodes in one process')
+    parser.add_argument('-N', '--nodes', type=int, nargs='+', default=[3, 10, 30],
+                        help=f'network sizes to run, at most {MAX_NODES}')
+    parser.add_argument('-n', '--txs', type=int, default=200)
+    parser.add_argument('-s', '--senders', type=int, default=2, help='sender wallets per node')
+    parser.add_argument('-r', '--rate', type=float, default=0,
+                        help='transactions per second to submit, 0 submits all of them at once')
+    parser.add_argument('--latency', type=float, default=0, help='seconds added to every message between nodes')
+    parser.add_argument('--jitter', type=float, default=0, help='up to this many seconds added on top of latency')
+    parser.add_argument('--loss', type=float, default=0, help='fraction of messages between nodes that are dropped')
+    parser.add_argument('--delay-base', type=float, default=None, help='processing delay of the nodes in seconds')
+    parser.add_argument('--delay-self', type=float, default=None, help='extra delay for a node\'s own transactions')
+    parser.add_argument('--seed', type=int, default=None, help='seed for the injected jitter and loss')
+    parser.add_argument('-t', '--timeout', type=float, default=600)
+    parser.add_argument('-o', '--output', type=str, default=None, help='file to write the results to')
+    args = parser.parse_args()
+
+    if max(args.nodes) > MAX_NODES or min(args.nodes) < 1:
+        parser.error(f'--nodes must be between 1 and {MAX_NODES}')
+
+    if not 0 <= args.loss < 1:
+        parser.error('--loss must be at least 0 and less than 1')
+
+    delay = None
+    if args.delay_base is not None or args.delay_self is not None:
+        delay = {
+            'base': args.delay_base if args.delay_base is not None else 1,
+            'self': args.delay_self if args.delay_self is not None else 0.5
+        }
+
+    results = []
+    for num_of_nodes in args.nodes:
+        root = Path(tempfile.mkdtemp(prefix='lamden_bench_'))
+        try:
+            results.append(asyncio.get_event_loop().run_until_complete(
+                run(num_of_nodes=num_of_nodes, num_of_txs=args.txs, senders_per_node=args.senders, rate=args.rate,
+                    latency=args.latency, jitter=args.jitter, loss=args.loss, delay=delay, timeout=args.timeout,
+                    root=root, seed=args.seed)
+            ))
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4)
+
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,259 @@
+'''
+    Single node transaction throughput benchmark.
+
+    Starts a Node as the only masternode of a new network over temporary storage, pushes pre-signed transactions into
+    its FileQueue and waits until every one of them is stored in a block. Each transaction goes through the full
+    pipeline: FileQueue -> HLC -> execution -> validation -> hard apply -> BlockStorage.
+
+    Transactions per second, end to end latency from the FileQueue to BlockStorage, CPU time and memory of the
+    process are printed as JSON, so runs can be compared across versions and tuning options.
+
+        python -m lamden.benchmarks.node_throughput --txs 1000 --senders 10 --batch-size 100 --output results.json
+'''
+from contracting.db.driver import ContractDriver, FSDriver
+from contracting.db.encoder import encode, decode
+from lamden.benchmarks.webserver_submissions import SignedTransactions
+from lamden.crypto.wallet import Wallet
+from lamden.nodes.base import Node
+from lamden.nodes.events import EventWriter
+from lamden.nodes.filequeue import FileQueue
+from lamden.nodes.profiler import summarize
+from lamden.storage import BlockStorage, NonceStorage
+from lamden.utils import create_genesis
+from pathlib import Path
+import argparse
+import asyncio
+import json
+import pkg_resources
+import psutil
+import resource
+import shutil
+import tempfile
+import time
+
+SENDER_BALANCE = 1_000_000_000
+
+
+def make_genesis_block(founder_wallet: Wallet, members: list, senders: list) -> dict:
+    additional_state = {'masternodes.S:members': members}
+    for wallet in senders:
+        additional_state[f'currency.balances:{wallet.verifying_key}'] = SENDER_BALANCE
+
+    return create_genesis.build_block(founder_sk=founder_wallet.signing_key, additional_state=additional_state,
+                                      initial_members=members)
+
+
+def create_node(wallet: Wallet, root: Path, genesis_block: dict, constitution: dict, bootnodes: dict, port: int,
+                delay: dict = None) -> Node:
+    node = Node(
+        socket_base='',
+        wallet=wallet,
+        constitution=constitution,
+        bootnodes=bootnodes,
+        socket_ports={'router': port, 'publisher': port + 80, 'webserver': port - 920},
+        driver=ContractDriver(driver=FSDriver(root=root.joinpath('state'))),
+        blocks=BlockStorage(root=root),
+        nonces=NonceStorage(root=root.joinpath('nonces')),
+        tx_queue=FileQueue(root=root.joinpath('txq')),
+        event_writer=EventWriter(root=root.joinpath('events')),
+        genesis_block=genesis_block,
+        delay=delay,
+        debug=False,
+        testing=True
+    )
+    node.network.set_to_local()
+
+    return node
+
+
+def cpu_seconds() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def lamden_version() -> str:
+    # importlib.metadata is only in 3.8 and later
+    try:
+        return pkg_resources.get_distribution('lamden').version
+    except pkg_resources.DistributionNotFound:
+        return None
+
+
+class LatencyTracker:
+    '''
+        Keeps the time every transaction was put on the FileQueue and the time its block was stored, matched on the
+        transaction's signature.
+    '''
+    def __init__(self):
+        self.submitted = {}
+        self.latencies = []
+        # signature -> time the block was stored
+        self.stored_at = {}
+        self.blocks = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self.submitted)
+
+    def submit(self, txs: list, now: float = None):
+        now = now or time.time()
+        for tx in txs:
+            self.submitted[tx['metadata']['signature']] = now
+
+    def stored(self, block: dict):
+        self.blocks += 1
+
+        try:
+            signature = block['processed']['transaction']['metadata']['signature']
+        except (KeyError, TypeError):
+            return
+
+        submitted = self.submitted.pop(signature, None)
+        if submitted is not None:
+            self.latencies.append(time.time() - submitted)
+            self.stored_at[signature] = time.time()
+
+    def summary(self) -> dict:
+        return summarize(self.latencies)
+
+
+def track_stored_blocks(node: Node, tracker: LatencyTracker):
+    # hard_apply_block_finish runs once a block is in BlockStorage, for minted and reorged blocks alike
+    finish = node.hard_apply_block_finish
+
+    def hard_apply_block_finish(block: dict):
+        tracker.stored(block)
+        finish(block=block)
+
+    node.hard_apply_block_finish = hard_apply_block_finish
+
+
+async def submit(queue: FileQueue, tracker: LatencyTracker, txs: list, batch_size: int, rate: float):
+    # Batches are spread evenly over the second at rate transactions per second, or submitted at once without one
+    interval = batch_size / rate if rate else 0
+    start = time.time()
+
+    for index, offset in enumerate(range(0, len(txs), batch_size)):
+        if interval:
+            await asyncio.sleep(max(start + index * interval - time.time(), 0))
+
+        batch = txs[offset:offset + batch_size]
+        tracker.submit(batch)
+
+        if batch_size == 1:
+            queue.append(encode(batch[0]).encode())
+        else:
+            queue.extend(batch)
+
+
+async def run(num_of_txs: int, num_of_senders: int, batch_size: int, rate: float, delay: dict, port: int,
+              timeout: float, root: Path) -> dict:
+    node_wallet = Wallet()
+    senders = [Wallet() for _ in range(num_of_senders)]
+
+    genesis_block = make_genesis_block(founder_wallet=Wallet(), members=[node_wallet.verifying_key], senders=senders)
+
+    node = create_node(
+        wallet=node_wallet,
+        root=root,
+        genesis_block=genesis_block,
+        constitution={'masternodes': {node_wallet.verifying_key: f'tcp://127.0.0.1:{port}'}},
+        bootnodes={},
+        port=port,
+        delay=delay
+    )
+
+    tracker = LatencyTracker()
+    track_stored_blocks(node=node, tracker=tracker)
+
+    # Signing happens up front so it is not part of the measurement
+    txs = [decode(tx) for tx in SignedTransactions(wallets=senders, processor=node_wallet.verifying_key).sign(num_of_txs)]
+
+    await node.start()
+    if not node.started:
+        raise RuntimeError('Node did not start.')
+
+    process = psutil.Process()
+    blocks_before = tracker.blocks
+    cpu_before = cpu_seconds()
+    start = time.time()
+
+    try:
+        submitting = asyncio.ensure_future(submit(queue=node.tx_queue, tracker=tracker, txs=txs,
+                                                  batch_size=batch_size, rate=rate))
+
+        stop_at = start + timeout
+        while (not submitting.done() or tracker.pending > 0) and time.time() < stop_at:
+            await asyncio.sleep(0.05)
+
+        elapsed = time.time() - start
+        cpu = cpu_seconds() - cpu_before
+        rss = process.memory_info().rss
+
+        submitting.cancel()
+    finally:
+        await node.stop()
+
+    processed = len(tracker.latencies)
+
+    return {
+        'version': lamden_version(),
+        'txs': num_of_txs,
+        'senders': num_of_senders,
+        'batch_size': batch_size,
+        'rate': rate,
+        'delay': node.processing_delay_secs,
+        'processed': processed,
+        'missing': num_of_txs - processed,
+        'blocks': tracker.blocks - blocks_before,
+        'seconds': round(elapsed, 3),
+        'txs_per_second': round(processed / elapsed, 2),
+        'latency_seconds': tracker.summary(),
+        'cpu_seconds': round(cpu, 3),
+        'cpu_percent': round(cpu / elapsed * 100, 1),
+        'rss_bytes': rss,
+        # ru_maxrss is in kilobytes on Linux
+        'max_rss_bytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark transaction throughput of a single node')
+    parser.add_argument('-n', '--txs', type=int, default=1000)
+    parser.add_argument('-s', '--senders', type=int, default=10)
+    parser.add_argument('-b', '--batch-size', type=int, default=1,
+                        help='transactions per FileQueue file, 1 writes one file per transaction')
+    parser.add_argument('-r', '--rate', type=float, default=0,
+                        help='transactions per second to submit, 0 submits all of them at once')
+    parser.add_argument('--delay-base', type=float, default=None, help='processing delay of the node in seconds')
+    parser.add_argument('--delay-self', type=float, default=None, help='extra delay for the node\'s own transactions')
+    parser.add_argument('-p', '--port', type=int, default=19000)
+    parser.add_argument('-t', '--timeout', type=float, default=600)
+    parser.add_argument('-o', '--output', type=str, default=None, help='file to write the results to')
+    args = parser.parse_args()
+
+    delay = None
+    if args.delay_base is not None or args.delay_self is not None:
+        delay = {
+            'base': args.delay_base if args.delay_base is not None else 1,
+            'self': args.delay_self if args.delay_self is not None else 0.5
+        }
+
+    root = Path(tempfile.mkdtemp(prefix='lamden_bench_'))
+    try:
+        results = asyncio.get_event_loop().run_until_complete(
+            run(num_of_txs=args.txs, num_of_senders=args.senders, batch_size=max(args.batch_size, 1),
+                rate=args.rate, delay=delay, port=args.port, timeout=args.timeout, root=root)
+        )
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4)
+
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+'''
+    Micro benchmarks for the canonical hashing, encoding and validation primitives every transaction and block goes
+    through.
+
+    Fixtures are a signed currency transfer, its processing results and a minted block with proofs. Every primitive
+    is timed for about --seconds and reports operations per second and the peak memory one call allocates. Results
+    are printed as JSON and can be saved with --output and compared to an earlier run with --baseline.
+
+        python -m lamden.benchmarks.primitives --output baseline.json
+        python -m lamden.benchmarks.primitives --baseline baseline.json --max-regression 0.1
+'''
+from contracting.db.encoder import encode, decode
+from contracting.stdlib.bridge.decimal import ContractingDecimal
+from lamden.crypto.block_validator import verify_block
+from lamden.crypto.canonical import format_dictionary, encode_canonical, tx_hash_from_tx, \
+    tx_result_hash_from_tx_result_object, block_from_tx_results
+from lamden.crypto.transaction import build_transaction
+from lamden.crypto.wallet import Wallet
+from lamden.hlcpy import HLC
+from lamden.nodes.hlc import HLC_Clock
+import argparse
+import copy
+import gc
+import json
+import sys
+import time
+import timeit
+import tracemalloc
+
+DEFAULT_SECONDS = 1
+DEFAULT_PROOFS = 3
+
+
+class Fixtures:
+    def __init__(self, num_of_proofs: int = DEFAULT_PROOFS):
+        sender = Wallet()
+        processor = Wallet()
+        to = Wallet().verifying_key
+
+        self.hlc_timestamp = HLC_Clock().get_new_hlc_timestamp()
+        self.tx = json.loads(build_transaction(
+            wallet=sender,
+            contract='currency',
+            function='transfer',
+            kwargs={'amount': {'__fixed__': '10.5'}, 'to': to},
+            nonce=0,
+            processor=processor.verifying_key,
+            stamps=20
+        ))
+        tx_hash = tx_hash_from_tx(self.tx)
+
+        self.tx_result = {
+            'result': 'None',
+            'stamps_used': 0,
+            'state': [{'key': f'currency.balances:{to}', 'value': ContractingDecimal('10.5')}],
+            'status': 0,
+            'transaction': self.tx,
+            'hash': tx_hash
+        }
+        self.rewards = [
+            {'key': f'currency.balances:{Wallet().verifying_key}', 'value': {'__fixed__': '0.5'}, 'reward': '0.5'}
+        ]
+        self.previous = 64 * '0'
+
+        tx_result_hash = tx_result_hash_from_tx_result_object(
+            tx_result=self.tx_result, hlc_timestamp=self.hlc_timestamp, rewards=self.rewards
+        )
+        self.proofs = []
+        for _ in range(num_of_proofs):
+            wallet = Wallet()
+            self.proofs.append({'signer': wallet.verifying_key, 'signature': wallet.sign(msg=tx_result_hash)})
+
+        self.processing_results = {
+            'tx_result': self.tx_result,
+            'hlc_timestamp': self.hlc_timestamp,
+            'rewards': self.rewards,
+            'tx_message': {
+                'sender': processor.verifying_key,
+                'signature': processor.sign(f'{tx_hash}{self.hlc_timestamp}')
+            }
+        }
+
+        self.minter = Wallet()
+        self.block = self.mint_block()
+        self.encoded_block = encode(self.block)
+
+        if not verify_block(copy.deepcopy(self.block)):
+            raise RuntimeError('The block fixture does not verify.')
+
+    def mint_block(self) -> dict:
+        # block_from_tx_results takes the result hashes out of the proofs it is given
+        return block_from_tx_results(processing_results=self.processing_results, proofs=copy.deepcopy(self.proofs),
+                                     prev_block_hash=self.previous, wallet=self.minter)
+
+
+def primitives(fixtures: Fixtures) -> dict:
+    return {
+        'format_dictionary': lambda: format_dictionary(fixtures.tx),
+        'encode_canonical': lambda: encode_canonical(fixtures.tx_result),
+        'tx_hash_from_tx': lambda: tx_hash_from_tx(fixtures.tx),
+        'tx_result_hash_from_tx_result_object': lambda: tx_result_hash_from_tx_result_object(
+            tx_result=fixtures.tx_result, hlc_timestamp=fixtures.hlc_timestamp, rewards=fixtures.rewards
+        ),
+        'block_from_tx_results': fixtures.mint_block,
+        'verify_block': lambda: verify_block(fixtures.block),
+        'encode': lambda: encode(fixtures.block),
+        'decode': lambda: decode(fixtures.encoded_block),
+        'HLC.from_str': lambda: HLC.from_str(fixtures.hlc_timestamp)
+    }
+
+
+def peak_allocated(function) -> tuple:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return peak, current
+
+
+def measure(function, seconds: float = DEFAULT_SECONDS, repeat: int = 5) -> dict:
+    timer = timeit.Timer(function)
+
+    # Find the number of calls that takes about seconds / repeat, the best of the repeats is reported
+    number, elapsed = timer.autorange()
+    number = max(int(number * (seconds / repeat) / max(elapsed, 1e-9)), 1)
+    best = min(timer.repeat(repeat=repeat, number=number)) / number
+
+    peak, retained = peak_allocated(function)
+
+    return {
+        'ops_per_second': round(1 / best, 1),
+        'seconds_per_op': best,
+        'peak_bytes': peak,
+        'retained_bytes': retained
+    }
+
+
+def compare(results: dict, baseline: dict) -> dict:
+    comparison = {}
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+
+        comparison[name] = {
+            'baseline_ops_per_second': before['ops_per_second'],
+            'ops_per_second': result['ops_per_second'],
+            # Above 1 is faster than the baseline
+            'speedup': round(result['ops_per_second'] / before['ops_per_second'], 3),
+            'peak_bytes_change': result['peak_bytes'] - before['peak_bytes']
+        }
+
+    return comparison
+
+
+def regressions(comparison: dict, max_regression: float) -> list:
+    return sorted(name for name, change in comparison.items() if change['speedup'] < 1 - max_regression)
+
+
+def run(names: list = None, seconds: float = DEFAULT_SECONDS, num_of_proofs: int = DEFAULT_PROOFS) -> dict:
+    functions = primitives(Fixtures(num_of_proofs=num_of_proofs))
+
+    results = {}
+    for name, function in functions.items():
+        if names and name not in names:
+            continue
+        results[name] = measure(function, seconds=seconds)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark canonical hashing, encoding and validation primitives')
+    parser.add_argument('names', nargs='*', help='primitives to run, all of them by default')
+    parser.add_argument('-s', '--seconds', type=float, default=DEFAULT_SECONDS, help='time spent per primitive')
+    parser.add_argument('-p', '--proofs', type=int, default=DEFAULT_PROOFS, help='proofs in the block fixture')
+    parser.add_argument('-o', '--output', type=str, default=None, help='file to write the results to')
+    parser.add_argument('-b', '--baseline', type=str, default=None, help='results of an earlier run to compare to')
+    parser.add_argument('--max-regression', type=float, default=None,
+                        help='exit with 1 when a primitive is this fraction slower than the baseline')
+    args = parser.parse_args()
+
+    results = {
+        'time': time.time(),
+        'python': sys.version.split()[0],
+        'primitives': run(names=args.names, seconds=args.seconds, num_of_proofs=args.proofs)
+    }
+
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4)
+
+    failed = []
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+        results['comparison'] = compare(results['primitives'], baseline['primitives'])
+
+        if args.max_regression is not None:
+            failed = regressions(results['comparison'], args.max_regression)
+            results['regressions'] = failed
+
+    print(json.dumps(results, indent=4))
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
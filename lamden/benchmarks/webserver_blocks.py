@@ -0,0 +1,187 @@
+'''
+    Load test for the webserver block endpoints.
+
+    Starts a WebServer over a temporary BlockStorage filled with synthetic blocks and hammers /latest_block,
+    /latest_block_num, /latest_block_hash and /blocks for a fixed time, once with the block response cache disabled
+    and once with it enabled. Results are printed as JSON.
+
+        python -m lamden.benchmarks.webserver_blocks --blocks 500 --duration 10 --concurrency 32
+'''
+from contracting.client import ContractingClient
+from contracting.db.driver import ContractDriver, FSDriver
+from lamden import storage
+from lamden.crypto.wallet import Wallet
+from lamden.nodes.filequeue import FileQueue
+from lamden.nodes.masternode.webserver import WebServer
+from pathlib import Path
+import aiohttp
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import shutil
+import tempfile
+import time
+
+
+def make_blocks(amount: int) -> list:
+    blocks = []
+    previous = '0' * 64
+
+    for number in range(1, amount + 1):
+        block_hash = hashlib.sha3_256(f'{number}{previous}'.encode()).hexdigest()
+        sender = hashlib.sha3_256(f'sender{number}'.encode()).hexdigest()
+
+        blocks.append({
+            'hash': block_hash,
+            'number': str(number),
+            'hlc_timestamp': f'2022-07-18T17:04:54.{number:09d}Z_0',
+            'previous': previous,
+            'proofs': [{'signature': 'a' * 128, 'signer': 'b' * 64} for _ in range(3)],
+            'processed': {
+                'hash': hashlib.sha3_256(block_hash.encode()).hexdigest(),
+                'result': 'None',
+                'stamps_used': 18,
+                'state': [
+                    {'key': f'currency.balances:{sender}', 'value': {'__fixed__': '100.5'}},
+                    {'key': f'currency.balances:{"c" * 64}', 'value': {'__fixed__': '200.5'}}
+                ],
+                'status': 0,
+                'transaction': {
+                    'metadata': {'signature': 'a' * 128},
+                    'payload': {
+                        'contract': 'currency',
+                        'function': 'transfer',
+                        'kwargs': {'amount': {'__fixed__': '1.5'}, 'to': 'c' * 64},
+                        'nonce': 0,
+                        'processor': 'b' * 64,
+                        'sender': sender,
+                        'stamps_supplied': 20
+                    }
+                }
+            },
+            'rewards': [{'key': f'currency.balances:{"b" * 64}', 'value': {'__fixed__': '0.5'}, 'reward': '0.5'}],
+            'origin': {'sender': sender, 'signature': 'a' * 128},
+            'minted': {'minter': 'b' * 64, 'signature': 'a' * 128}
+        })
+
+        previous = block_hash
+
+    return blocks
+
+
+async def hammer(session, urls, duration):
+    requests = 0
+    errors = 0
+    stop_at = time.time() + duration
+
+    while time.time() < stop_at:
+        async with session.get(random.choice(urls)) as res:
+            await res.read()
+            if res.status == 200:
+                requests += 1
+            else:
+                errors += 1
+
+    return requests, errors
+
+
+async def load(webserver: WebServer, blocks: list, duration: float, concurrency: int, cached: bool) -> dict:
+    if cached:
+        webserver.block_cache.enable()
+        webserver.block_cache.new_block(blocks[-1])
+    else:
+        webserver.block_cache.disable()
+
+    base = f'http://127.0.0.1:{webserver.port}'
+    urls = [f'{base}/latest_block', f'{base}/latest_block_num', f'{base}/latest_block_hash']
+    urls += [f'{base}/blocks?num={block["number"]}' for block in blocks]
+    urls += [f'{base}/blocks?hash={block["hash"]}' for block in blocks]
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        start = time.time()
+        results = await asyncio.gather(*[hammer(session, urls, duration) for _ in range(concurrency)])
+        elapsed = time.time() - start
+
+    requests = sum(r for r, _ in results)
+    errors = sum(e for _, e in results)
+
+    return {
+        'cached': cached,
+        'requests': requests,
+        'errors': errors,
+        'seconds': round(elapsed, 3),
+        'requests_per_second': round(requests / elapsed, 1),
+        'cache_hits': webserver.block_cache.hits,
+        'cache_misses': webserver.block_cache.misses
+    }
+
+
+async def run(num_of_blocks: int, duration: float, concurrency: int, port: int, root: Path) -> dict:
+    blocks = make_blocks(num_of_blocks)
+
+    block_storage = storage.BlockStorage(root=root)
+    for block in blocks:
+        block_storage.store_block(json.loads(json.dumps(block)))
+
+    driver = ContractDriver(driver=FSDriver(root=root))
+    storage.set_latest_block_height(num_of_blocks, driver=driver)
+    storage.set_latest_block_hash(blocks[-1]['hash'], driver=driver)
+    driver.commit()
+
+    webserver = WebServer(
+        wallet=Wallet(),
+        contracting_client=ContractingClient(driver=driver),
+        blocks=block_storage,
+        driver=driver,
+        queue=FileQueue(root=root.joinpath('txq')),
+        nonces=storage.NonceStorage(root=root.joinpath('nonces')),
+        port=port,
+        debug=False
+    )
+
+    # after_server_start listeners are not triggered, so the server never connects to an event service
+    server = await webserver.app.create_server(host='127.0.0.1', port=port, debug=False, access_log=False,
+                                               return_asyncio_server=True)
+    await server
+
+    try:
+        uncached = await load(webserver, blocks, duration, concurrency, cached=False)
+        cached = await load(webserver, blocks, duration, concurrency, cached=True)
+    finally:
+        await server.close()
+
+    return {
+        'blocks': num_of_blocks,
+        'duration': duration,
+        'concurrency': concurrency,
+        'uncached': uncached,
+        'cached': cached,
+        'speedup': round(cached['requests_per_second'] / max(uncached['requests_per_second'], 0.1), 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the webserver block endpoints')
+    parser.add_argument('-b', '--blocks', type=int, default=500)
+    parser.add_argument('-d', '--duration', type=float, default=10)
+    parser.add_argument('-c', '--concurrency', type=int, default=32)
+    parser.add_argument('-p', '--port', type=int, default=18099)
+    args = parser.parse_args()
+
+    root = Path(tempfile.mkdtemp(prefix='lamden_bench_'))
+    try:
+        results = asyncio.get_event_loop().run_until_complete(
+            run(num_of_blocks=args.blocks, duration=args.duration, concurrency=args.concurrency, port=args.port,
+                root=root)
+        )
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+'''
+    Sustained transaction submission benchmark for the webserver.
+
+    Starts a WebServer over temporary storage, funds a set of wallets, pre-signs their transactions and submits them
+    for a fixed time, first one per request to / and then in batches to /batch. Results are printed as JSON.
+
+        python -m lamden.benchmarks.webserver_submissions --wallets 50 --duration 10 --batch-size 50
+'''
+from contracting.client import ContractingClient
+from contracting.db.driver import ContractDriver, FSDriver
+from lamden import storage
+from lamden.crypto.transaction import build_transaction
+from lamden.crypto.wallet import Wallet
+from lamden.nodes.filequeue import FileQueue
+from lamden.nodes.masternode.webserver import WebServer, SizeLimitedHttpProtocol, MAX_BATCH_SIZE
+from pathlib import Path
+import aiohttp
+import argparse
+import asyncio
+import json
+import shutil
+import tempfile
+import time
+
+
+class SignedTransactions:
+    def __init__(self, wallets: list, processor: str):
+        self.wallets = wallets
+        self.processor = processor
+        self.nonces = {wallet.verifying_key: 0 for wallet in wallets}
+        self.index = 0
+
+    def next(self) -> str:
+        wallet = self.wallets[self.index % len(self.wallets)]
+        self.index += 1
+
+        nonce = self.nonces[wallet.verifying_key]
+        self.nonces[wallet.verifying_key] += 1
+
+        return build_transaction(
+            wallet=wallet,
+            processor=self.processor,
+            stamps=100,
+            nonce=nonce,
+            contract='currency',
+            function='transfer',
+            kwargs={'amount': 1, 'to': 'a' * 64}
+        )
+
+    def sign(self, amount: int) -> list:
+        return [self.next() for _ in range(amount)]
+
+
+async def submit(session, url, bodies, batch_size, stop_at):
+    submitted = 0
+    rejected = 0
+
+    while bodies and time.time() < stop_at:
+        if batch_size is None:
+            data = bodies.pop()
+        else:
+            data = '[' + ', '.join(bodies.pop() for _ in range(min(batch_size, len(bodies)))) + ']'
+
+        async with session.post(url, data=data) as res:
+            result = await res.json()
+
+        if batch_size is None:
+            if 'hash' in result:
+                submitted += 1
+            else:
+                rejected += 1
+        else:
+            submitted += result.get('accepted', 0)
+            rejected += result.get('rejected', 0)
+
+    return submitted, rejected
+
+
+async def load(webserver: WebServer, workers: list, duration: float, batch_size: int = None,
+               rate_hint: int = 2_000) -> dict:
+    # Every worker signs for its own wallets so nonces reach the webserver in order. Signing happens up front so
+    # it is not part of the measurement.
+    bodies = []
+    for transactions in workers:
+        worker_bodies = transactions.sign(int(rate_hint * duration / len(workers)) + 1)
+        worker_bodies.reverse()
+        bodies.append(worker_bodies)
+
+    url = f'http://127.0.0.1:{webserver.port}/' + ('' if batch_size is None else 'batch')
+
+    connector = aiohttp.TCPConnector(limit=len(workers))
+    async with aiohttp.ClientSession(connector=connector) as session:
+        start = time.time()
+        stop_at = start + duration
+        results = await asyncio.gather(
+            *[submit(session, url, worker_bodies, batch_size, stop_at) for worker_bodies in bodies]
+        )
+        elapsed = time.time() - start
+
+    submitted = sum(s for s, _ in results)
+    rejected = sum(r for _, r in results)
+
+    return {
+        'batch_size': batch_size,
+        'submitted': submitted,
+        'rejected': rejected,
+        'unsent': sum(len(worker_bodies) for worker_bodies in bodies),
+        'seconds': round(elapsed, 3),
+        'submissions_per_second': round(submitted / elapsed, 1)
+    }
+
+
+async def run(num_of_wallets: int, duration: float, concurrency: int, batch_size: int, port: int,
+              root: Path) -> dict:
+    driver = ContractDriver(driver=FSDriver(root=root))
+    client = ContractingClient(driver=driver)
+
+    wallets = [Wallet() for _ in range(num_of_wallets)]
+    for wallet in wallets:
+        client.set_var(contract='currency', variable='balances', arguments=[wallet.verifying_key],
+                       value=1_000_000_000)
+    client.set_var(contract='stamp_cost', variable='S', arguments=['value'], value=20)
+    driver.commit()
+
+    webserver = WebServer(
+        wallet=Wallet(),
+        contracting_client=client,
+        blocks=storage.BlockStorage(root=root),
+        driver=driver,
+        queue=FileQueue(root=root.joinpath('txq')),
+        nonces=storage.NonceStorage(root=root.joinpath('nonces'), write_back=True),
+        port=port,
+        max_queue_len=10_000_000,
+        debug=False
+    )
+
+    # after_server_start listeners are not triggered, so the server never connects to an event service
+    server = await webserver.app.create_server(host='127.0.0.1', port=port, debug=False, access_log=False,
+                                               protocol=SizeLimitedHttpProtocol, return_asyncio_server=True)
+    await server
+
+    workers = [
+        SignedTransactions(wallets=wallets[i::concurrency], processor=webserver.wallet.verifying_key)
+        for i in range(min(concurrency, num_of_wallets))
+    ]
+
+    try:
+        single = await load(webserver, workers, duration)
+        batched = await load(webserver, workers, duration, batch_size=batch_size, rate_hint=20_000)
+    finally:
+        await server.close()
+
+    return {
+        'wallets': num_of_wallets,
+        'duration': duration,
+        'concurrency': concurrency,
+        'single': single,
+        'batched': batched,
+        'speedup': round(batched['submissions_per_second'] / max(single['submissions_per_second'], 0.1), 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark sustained transaction submissions to the webserver')
+    parser.add_argument('-w', '--wallets', type=int, default=50)
+    parser.add_argument('-d', '--duration', type=float, default=10)
+    parser.add_argument('-c', '--concurrency', type=int, default=8)
+    parser.add_argument('-b', '--batch-size', type=int, default=MAX_BATCH_SIZE)
+    parser.add_argument('-p', '--port', type=int, default=18099)
+    args = parser.parse_args()
+
+    root = Path(tempfile.mkdtemp(prefix='lamden_bench_'))
+    try:
+        results = asyncio.get_event_loop().run_until_complete(
+            run(num_of_wallets=args.wallets, duration=args.duration, concurrency=args.concurrency,
+                batch_size=min(args.batch_size, MAX_BATCH_SIZE), port=args.port, root=root)
+        )
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == '__main__':
+    main()
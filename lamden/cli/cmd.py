@@ -1,8 +1,15 @@
 from contracting.client import ContractDriver, ContractingClient
+from contracting.db.driver import FSDriver
+from lamden.cli.loadgen import generate_load
 from lamden.cli.start import start_node, join_network
 from lamden.contracts import sync
+from lamden.nodes.replay import Replayer
 from lamden.storage import BlockStorage
 import argparse
+import json
+import pathlib
+import shutil
+import tempfile
 
 def flush(args):
     if args.storage_type == 'blocks':
@@ -15,6 +22,28 @@ def flush(args):
     else:
         print('Invalid option. < blocks | state | all >')
 
+def replay(args):
+    # Without a state directory the state is rebuilt in a temporary one and thrown away
+    state_root = pathlib.Path(args.state).expanduser() if args.state else pathlib.Path(tempfile.mkdtemp(prefix='lamden_replay_'))
+
+    try:
+        replayer = Replayer(
+            blocks=BlockStorage(root=pathlib.Path(args.blocks).expanduser()),
+            driver=ContractDriver(driver=FSDriver(root=state_root)),
+            verify=not args.skip_verify,
+            metering=not args.no_metering
+        )
+        results = replayer.run(start=args.start, end=args.end, limit=args.limit)
+    finally:
+        if not args.state:
+            shutil.rmtree(state_root, ignore_errors=True)
+
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4)
+
+    print(json.dumps(results, indent=4))
+
 def setup_cilparser(parser):
     # create parser for update commands
     subparser = parser.add_subparsers(title='subcommands', description='Network update commands',
@@ -27,6 +56,9 @@ def setup_cilparser(parser):
     start_parser.add_argument('-p', '--pid', type=int, default=-1)
     start_parser.add_argument('-b', '--bypass_catchup', type=bool, default=False)
     start_parser.add_argument('-d', '--debug', type=bool, default=False)
+    start_parser.add_argument('--metrics_port', type=int, default=None)
+    start_parser.add_argument('--profile_endpoint', action='store_true',
+                              help='serve /profile on the metrics port to start profiles remotely')
 
     flush_parser = subparser.add_parser('flush')
     flush_parser.add_argument('storage_type', type=str)
@@ -36,9 +68,42 @@ def setup_cilparser(parser):
     join_parser.add_argument('-mp', '--mn_seed_port', type=int, default=18080)
     join_parser.add_argument('-wp', '--webserver_port', type=int, default=18080)
     join_parser.add_argument('-d', '--debug', type=bool, default=False)
+    join_parser.add_argument('--metrics_port', type=int, default=None)
+    join_parser.add_argument('--profile_endpoint', action='store_true',
+                             help='serve /profile on the metrics port to start profiles remotely')
 
     sync_parser = subparser.add_parser('sync')
 
+    replay_parser = subparser.add_parser('replay')
+    replay_parser.add_argument('-b', '--blocks', type=str, default='~/.lamden', help='root of the BlockStorage to replay')
+    replay_parser.add_argument('-s', '--state', type=str, default=None,
+                               help='state directory to replay into, a temporary one if not given')
+    replay_parser.add_argument('--start', type=int, default=0)
+    replay_parser.add_argument('--end', type=int, default=None)
+    replay_parser.add_argument('--limit', type=int, default=None)
+    replay_parser.add_argument('--skip_verify', action='store_true')
+    replay_parser.add_argument('--no_metering', action='store_true')
+    replay_parser.add_argument('-o', '--output', type=str, default=None)
+
+    loadgen_parser = subparser.add_parser('loadgen')
+    loadgen_parser.add_argument('-u', '--urls', type=str, nargs='+', default=['http://127.0.0.1:18080'])
+    loadgen_parser.add_argument('-k', '--keys', type=str, default=None,
+                                help='file with one hex signing key per line of the wallets to send from')
+    loadgen_parser.add_argument('-w', '--wallets', type=int, default=10, help='new wallets to send from without --keys')
+    loadgen_parser.add_argument('-n', '--txs', type=int, default=1000)
+    loadgen_parser.add_argument('-r', '--rate', type=float, default=0,
+                                help='transactions per second sent open loop, 0 sends them back to back')
+    loadgen_parser.add_argument('-d', '--duration', type=float, default=None, help='stop sending after this many seconds')
+    loadgen_parser.add_argument('-c', '--concurrency', type=int, default=100, help='connections to the webservers')
+    loadgen_parser.add_argument('--workers', type=int, default=None, help='processes used to sign the transactions')
+    loadgen_parser.add_argument('--grace', type=float, default=10,
+                                help='seconds to wait for answers after the last transaction with --rate')
+    loadgen_parser.add_argument('--contract', type=str, default='currency')
+    loadgen_parser.add_argument('--function', type=str, default='transfer')
+    loadgen_parser.add_argument('--kwargs', type=str, default=None, help='kwargs of the transactions as JSON')
+    loadgen_parser.add_argument('--stamps', type=int, default=100)
+    loadgen_parser.add_argument('-o', '--output', type=str, default=None)
+
     return True
 
 def main():
@@ -64,5 +129,11 @@ def main():
         sync.flush_sys_contracts(client=client)
         sync.submit_from_genesis_json_file(client=client)
 
+    elif args.command == 'replay':
+        replay(args)
+
+    elif args.command == 'loadgen':
+        generate_load(args)
+
 if __name__ == '__main__':
     main()
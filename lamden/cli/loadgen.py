@@ -0,0 +1,240 @@
+'''
+    Transaction load generator for one or more masternode webservers.
+
+    Wallets come from a file of hex signing keys, one per line, or are created on the fly (those need a balance on the
+    network for their transactions to execute). Every wallet is bound to one of the webservers, whose verifying key is
+    the processor of its transactions, and starts at the nonce that webserver reports. All transactions are built and
+    signed up front in a pool of worker processes, so signing is not part of the measurement.
+
+    A wallet only has one request in flight at a time, so its nonces reach the webserver in order. With --rate the
+    transactions are sent open loop: each one goes out at its scheduled time, or as soon as the previous request of
+    its wallet is answered, whether or not other requests were answered. Latency is measured from the scheduled time.
+    Requests still unanswered --grace seconds after the last one was scheduled are cancelled and counted as errors.
+    With --rate 0 a fixed number of workers send them back to back. The achieved rate, rejects by reason and latency
+    percentiles are printed as JSON.
+
+        lamden loadgen --urls http://127.0.0.1:18080 --keys keys.txt --txs 10000 --rate 500
+'''
+from concurrent.futures import ProcessPoolExecutor
+from lamden.crypto.transaction import build_transaction
+from lamden.crypto.wallet import Wallet
+from lamden.nodes.profiler import summarize
+from collections import Counter
+import aiohttp
+import asyncio
+import json
+import math
+import time
+
+DEFAULT_STAMPS = 100
+DEFAULT_GRACE = 10
+
+
+def sign_transactions(signing_key: str, processor: str, start_nonce: int, amount: int, contract: str, function: str,
+                      kwargs: dict, stamps: int) -> list:
+    # Runs in a worker process, so it only takes and returns plain values
+    wallet = Wallet(seed=signing_key)
+
+    return [
+        build_transaction(wallet=wallet, contract=contract, function=function, kwargs=kwargs, nonce=nonce,
+                          processor=processor, stamps=stamps)
+        for nonce in range(start_nonce, start_nonce + amount)
+    ]
+
+
+def load_wallets(keys_file: str = None, amount: int = 0) -> list:
+    if keys_file is None:
+        return [Wallet() for _ in range(amount)]
+
+    with open(keys_file) as f:
+        return [Wallet(seed=line.strip()) for line in f if line.strip()]
+
+
+def interleave(batches: list) -> list:
+    # Round robin over the wallets so consecutive transactions have different senders
+    txs = []
+    for index in range(max((len(batch) for batch in batches), default=0)):
+        for batch in batches:
+            if index < len(batch):
+                txs.append(batch[index])
+    return txs
+
+
+class LoadGenerator:
+    def __init__(self, urls: list, wallets: list, contract: str = 'currency', function: str = 'transfer',
+                 kwargs: dict = None, stamps: int = DEFAULT_STAMPS, workers: int = None, concurrency: int = 100,
+                 grace: float = DEFAULT_GRACE):
+        self.urls = [url.rstrip('/') for url in urls]
+        self.wallets = wallets
+        self.contract = contract
+        self.function = function
+        self.kwargs = kwargs if kwargs is not None else {'amount': 1, 'to': 'a' * 64}
+        self.stamps = stamps
+        self.workers = workers
+        self.concurrency = concurrency
+        self.grace = grace
+
+        self.sent = 0
+        self.accepted = 0
+        self.rejected = Counter()
+        self.errors = Counter()
+        self.latencies = []
+
+        # sender -> lock held while a request of the sender is in flight, waiters get it in the order they came
+        self.in_flight = {}
+
+    async def get_json(self, session: aiohttp.ClientSession, url: str) -> dict:
+        async with session.get(url) as res:
+            return await res.json(content_type=None)
+
+    async def prepare(self, session: aiohttp.ClientSession, num_of_txs: int) -> list:
+        '''
+            Returns (url, sender, tx) for num_of_txs transactions spread evenly over the wallets.
+        '''
+        processors = [(await self.get_json(session, f'{url}/id'))['verifying_key'] for url in self.urls]
+
+        bindings = []
+        for index, wallet in enumerate(self.wallets):
+            url_index = index % len(self.urls)
+            nonce = await self.get_json(session, f'{self.urls[url_index]}/nonce/{wallet.verifying_key}')
+            bindings.append((wallet, url_index, int(nonce['nonce'])))
+
+        per_wallet = math.ceil(num_of_txs / len(self.wallets))
+        loop = asyncio.get_event_loop()
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            batches = await asyncio.gather(*[
+                loop.run_in_executor(pool, sign_transactions, wallet.signing_key, processors[url_index], nonce,
+                                     per_wallet, self.contract, self.function, self.kwargs, self.stamps)
+                for wallet, url_index, nonce in bindings
+            ])
+
+        return interleave([
+            [(self.urls[url_index], wallet.verifying_key, tx) for tx in batch]
+            for (wallet, url_index, _), batch in zip(bindings, batches)
+        ])[:num_of_txs]
+
+    async def send(self, session: aiohttp.ClientSession, url: str, sender: str, tx: str, scheduled: float):
+        lock = self.in_flight.get(sender)
+        if lock is None:
+            lock = self.in_flight[sender] = asyncio.Lock()
+
+        async with lock:
+            self.sent += 1
+            try:
+                async with session.post(f'{url}/', data=tx) as res:
+                    result = await res.json(content_type=None)
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as err:
+                self.errors[type(err).__name__] += 1
+                return
+
+        self.latencies.append(time.time() - scheduled)
+
+        if isinstance(result, dict) and 'hash' in result:
+            self.accepted += 1
+        else:
+            reason = result.get('error') if isinstance(result, dict) else None
+            self.rejected[str(reason)] += 1
+
+    async def open_loop(self, session: aiohttp.ClientSession, txs: list, rate: float, stop_at: float):
+        interval = 1 / rate
+        start = time.time()
+        pending = set()
+
+        for index, (url, sender, tx) in enumerate(txs):
+            scheduled = start + index * interval
+            if scheduled >= stop_at:
+                break
+
+            await asyncio.sleep(max(scheduled - time.time(), 0))
+            pending.add(asyncio.ensure_future(self.send(session, url, sender, tx, scheduled)))
+
+            if len(pending) > self.concurrency * 10:
+                pending = {task for task in pending if not task.done()}
+
+        if pending:
+            _, unanswered = await asyncio.wait(pending, timeout=self.grace)
+
+            for task in unanswered:
+                task.cancel()
+            if unanswered:
+                self.errors['Unanswered'] += len(unanswered)
+                await asyncio.wait(unanswered)
+
+    async def closed_loop(self, session: aiohttp.ClientSession, txs: list, stop_at: float):
+        txs = iter(txs)
+
+        async def worker():
+            for url, sender, tx in txs:
+                if time.time() >= stop_at:
+                    return
+                await self.send(session, url, sender, tx, time.time())
+
+        await asyncio.gather(*[worker() for _ in range(self.concurrency)])
+
+    async def run(self, num_of_txs: int, rate: float = 0, duration: float = None) -> dict:
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            signing_started = time.time()
+            txs = await self.prepare(session, num_of_txs)
+            signing_seconds = time.time() - signing_started
+
+            start = time.time()
+            stop_at = start + duration if duration else math.inf
+
+            if rate > 0:
+                await self.open_loop(session, txs, rate, stop_at)
+            else:
+                await self.closed_loop(session, txs, stop_at)
+
+            elapsed = time.time() - start
+
+        return {
+            'urls': self.urls,
+            'wallets': len(self.wallets),
+            'txs': len(txs),
+            'signing_seconds': round(signing_seconds, 3),
+            'sent': self.sent,
+            'accepted': self.accepted,
+            'rejected': sum(self.rejected.values()),
+            'rejects': dict(self.rejected),
+            'errors': dict(self.errors),
+            'seconds': round(elapsed, 3),
+            'target_rate': rate or None,
+            'achieved_rate': round(self.sent / elapsed, 2) if elapsed > 0 else 0,
+            'accepted_rate': round(self.accepted / elapsed, 2) if elapsed > 0 else 0,
+            'latency_seconds': summarize(self.latencies)
+        }
+
+
+def generate_load(args):
+    wallets = load_wallets(keys_file=args.keys, amount=args.wallets)
+    if len(wallets) == 0:
+        print('No wallets to send from. Pass --keys or --wallets.')
+        return
+
+    if args.concurrency > len(wallets):
+        print(f'Warning: a wallet only has one request in flight, at most {len(wallets)} of the {args.concurrency} '
+              f'connections will be used. Pass more --wallets or --keys.')
+
+    generator = LoadGenerator(
+        urls=args.urls,
+        wallets=wallets,
+        contract=args.contract,
+        function=args.function,
+        kwargs=json.loads(args.kwargs) if args.kwargs else None,
+        stamps=args.stamps,
+        workers=args.workers,
+        concurrency=args.concurrency,
+        grace=args.grace
+    )
+
+    results = asyncio.get_event_loop().run_until_complete(
+        generator.run(num_of_txs=args.txs, rate=args.rate, duration=args.duration)
+    )
+
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4)
+
+    print(json.dumps(results, indent=4))
@@ -106,7 +106,9 @@ def start_node(args):
         bootnodes=bootnodes,
         bypass_catchup=args.bypass_catchup,
         genesis_block=genesis_block,
-        metering=True
+        metering=True,
+        metrics_port=args.metrics_port,
+        profile_endpoint=args.profile_endpoint
     )
 
     loop = asyncio.get_event_loop()
@@ -136,7 +138,9 @@ def join_network(args):
         socket_base=socket_base,
         bootnodes=bootnodes,
         join=True,
-        metering=True
+        metering=True,
+        metrics_port=args.metrics_port,
+        profile_endpoint=args.profile_endpoint
     )
 
     loop = asyncio.get_event_loop()
@@ -1,10 +1,13 @@
 from iso8601 import parse_date
-from lamden.crypto.canonical import block_hash_from_block, tx_hash_from_tx, format_dictionary, tx_result_hash_from_tx_result_object, hash_genesis_block_state_changes
+from lamden.crypto.canonical import block_hash_from_block, tx_hash_from_tx, encode_canonical, tx_result_hash_from_tx_result_object, hash_genesis_block_state_changes
 from contracting.db.encoder import encode
 from lamden.logger.base import get_logger
 from lamden.crypto.wallet import verify
 from lamden.utils import hlc
-from copy import deepcopy
+from collections import OrderedDict
+import hashlib
+
+MAX_VERIFIED_BLOCKS = 1000
 
 GENESIS_BLOCK_NUMBER = "0"
 GENESIS_HLC_TIMESTAMP = '0000-00-00T00:00:00.000000000Z_0'
@@ -374,13 +377,58 @@ def verify_block(block: dict) -> bool:
             validate_genesis_signatures(block=block)
         else:
             validate_all_hashes(block=block)
-            validate_all_signatures(block=block)
+            # The processed hash was just checked against the transaction
+            validate_all_signatures(block=block, tx_hash=block['processed']['hash'])
     except Exception as err:
         log.error(err)
         return False
 
     return True
 
+def block_content_digest(block: dict) -> str:
+    return hashlib.sha3_256(encode(block).encode()).hexdigest()
+
+class VerifiedBlocks:
+    '''
+        Remembers the blocks that passed verify_block by their hash and a digest of their full content, so copies of
+        a block served by several peers, or served again later, are verified once. A copy with the same hash but any
+        other content has another digest and is verified in full. Failed blocks are not remembered.
+    '''
+    def __init__(self, max_blocks: int = MAX_VERIFIED_BLOCKS):
+        self.max_blocks = max_blocks
+        self.blocks = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.blocks)
+
+    def verify(self, block: dict) -> bool:
+        try:
+            key = (block.get('hash'), block_content_digest(block))
+        except Exception:
+            return verify_block(block=block)
+
+        if key in self.blocks:
+            self.blocks.move_to_end(key)
+            self.hits += 1
+            return True
+
+        self.misses += 1
+
+        if not verify_block(block=block):
+            return False
+
+        self.blocks[key] = True
+        while len(self.blocks) > self.max_blocks:
+            self.blocks.popitem(last=False)
+
+        return True
+
+    def clear(self):
+        self.blocks.clear()
+
 def validate_all_hashes(block: dict) -> bool:
     if not verify_block_hash(block=block):
         raise BlockHashMalformed(EXCEPTION_BLOCK_HASH_MALFORMED)
@@ -408,20 +456,21 @@ def verify_processed_transaction_hash(processed_transaction) -> bool:
     return tx_hash == processed_transaction.get('hash')
 
 
-def validate_all_signatures(block: dict) -> bool:
+def validate_all_signatures(block: dict, tx_hash: str = None) -> bool:
     processed = block.get('processed')
     transaction = processed.get('transaction')
 
     if not verify_transaction_signature(transaction=transaction):
         raise TransactionMetadataSignatureMalformed(EXCEPTION_TRANSACTION_METADATA_SIGNATURE_MALFORMED)
 
-    if not verify_origin_signature(block=block):
+    if not verify_origin_signature(block=block, tx_hash=tx_hash):
         raise BlockOriginSignatureMalformed(EXCEPTION_BLOCK_ORIGIN_SIGNATURE_MALFORMED)
 
     if not verify_proofs(block=block):
         raise BlockProofMalformed(EXCEPTION_BLOCK_PROOF_MALFORMED)
 
-    if not verify_minter_signature(deepcopy(block)):
+    # verify_minter_signature only removes 'minted' from the top level
+    if not verify_minter_signature(dict(block)):
         raise BlockMinterSignatureMalformed(EXCEPTION_BLOCK_MINTER_SIGNATURE_MALFORMED)
 
     return True
@@ -441,8 +490,8 @@ def verify_minter_signature(block):
 def verify_transaction_signature(transaction: dict) -> bool:
     try:
         signature = transaction['metadata'].get('signature')
-        payload = format_dictionary(transaction.get('payload'))
-        message = encode(payload)
+        payload = transaction.get('payload')
+        message = encode_canonical(payload)
         sender = payload.get('sender')
 
         valid = verify(vk=sender, msg=message, signature=signature)
@@ -451,7 +500,7 @@ def verify_transaction_signature(transaction: dict) -> bool:
         print(err)
         return False
 
-def verify_origin_signature(block: dict) -> bool:
+def verify_origin_signature(block: dict, tx_hash: str = None) -> bool:
     try:
         hlc_timestamp = block.get('hlc_timestamp')
 
@@ -460,7 +509,8 @@ def verify_origin_signature(block: dict) -> bool:
 
         transaction = block['processed'].get('transaction')
 
-        tx_hash = tx_hash_from_tx(tx=transaction)
+        if tx_hash is None:
+            tx_hash = tx_hash_from_tx(tx=transaction)
         message = f'{tx_hash}{hlc_timestamp}'
 
         valid = verify(vk=sender, msg=message, signature=signature)
@@ -491,29 +541,27 @@ def verify_proofs(block: dict) -> bool:
 
     proofs = block.get('proofs')
 
-    for proof in proofs:
-        if not verify_proof(proof=proof, tx_result=tx_result, rewards=rewards, hlc_timestamp=hlc_timestamp):
-            return False
-
-    return True
-
-def verify_proof(proof: dict, tx_result: str, rewards: dict, hlc_timestamp: str) -> bool:
     try:
-        signature = proof.get('signature')
-        signer = proof.get('signer')
-
+        # Every proof signs the same result hash
         message = tx_result_hash_from_tx_result_object(
             tx_result=tx_result,
             hlc_timestamp=hlc_timestamp,
             rewards=rewards
         )
-
-        valid = verify(vk=signer, msg=message, signature=signature)
-        return valid
     except Exception as err:
         print(err)
         return False
 
+    for proof in proofs:
+        try:
+            if not verify(vk=proof.get('signer'), msg=message, signature=proof.get('signature')):
+                return False
+        except Exception as err:
+            print(err)
+            return False
+
+    return True
+
 def validate_genesis_hashes(block: dict):
     if not verify_block_hash(block=block):
         raise BlockHashMalformed(EXCEPTION_BLOCK_HASH_MALFORMED)
@@ -3,7 +3,7 @@ from copy import deepcopy
 
 import hashlib
 
-from contracting.db.encoder import encode
+from contracting.db.encoder import encode, Encoder
 
 from lamden.logger.base import get_logger
 
@@ -27,13 +27,89 @@ def format_dictionary(d: dict) -> dict:
     return {k: v for k, v in sorted(d.items())}
 
 
+# Same output as contracting's encode, one with keys sorted
+_encode = Encoder(separators=(',', ':')).encode
+_encode_sorted = Encoder(separators=(',', ':'), sort_keys=True).encode
+
+
+def _has_no_dicts(v) -> bool:
+    if isinstance(v, dict):
+        return False
+    if isinstance(v, (list, tuple)):
+        return all(_has_no_dicts(e) for e in v)
+    return True
+
+
+def _formats_like_sort_keys(d: dict) -> bool:
+    # format_dictionary sorts dicts in dicts and in lists in dicts, but not deeper ones like dicts in lists in lists.
+    # When there are none of those, sorting every dict while encoding gives the same output.
+    for k, v in d.items():
+        if type(k) is not str:
+            return False
+
+        t = type(v)
+        if t is str or t is int:
+            continue
+        if t is list:
+            for e in v:
+                if isinstance(e, dict):
+                    if not _formats_like_sort_keys(e):
+                        return False
+                elif not _has_no_dicts(e):
+                    return False
+        elif isinstance(v, dict):
+            if not _formats_like_sort_keys(v):
+                return False
+        elif not _has_no_dicts(v):
+            return False
+
+    return True
+
+
+def _formatted_copy(d: dict) -> dict:
+    # format_dictionary without changing d
+    for k in d:
+        assert type(k) == str, 'Non-string key types not allowed.'
+
+    formatted = {}
+    for k in sorted(d):
+        v = d[k]
+        if type(v) == list:
+            v = [_formatted_copy(e) if isinstance(e, dict) else e for e in v]
+        elif isinstance(v, dict):
+            v = _formatted_copy(v)
+        formatted[k] = v
+    return formatted
+
+
+def encode_canonical(d: dict) -> str:
+    '''
+        Same output as encode(format_dictionary(d)) without rebuilding or changing d. Dicts are sorted by the json
+        encoder while it writes them, d is only copied when it has dicts format_dictionary leaves unsorted.
+    '''
+    if _formats_like_sort_keys(d):
+        return _encode_sorted(d)
+    return _encode(_formatted_copy(d))
+
+
 def tx_hash_from_tx(tx):
     h = hashlib.sha3_256()
-    tx_dict = format_dictionary(tx)
-    encoded_tx = encode(tx_dict).encode()
+    encoded_tx = encode_canonical(tx).encode()
     h.update(encoded_tx)
     return h.hexdigest()
 
+def tx_hash_from_tx_message(tx_message: dict) -> str:
+    # The first stage that hashes the transaction of a tx message keeps the hash in it under 'tx_hash', so the stages
+    # after it do not hash it again. Messages from peers only have one once their signature was checked against it.
+    tx_hash = tx_message.get('tx_hash')
+    if tx_hash is None:
+        tx_hash = tx_hash_from_tx(tx_message['tx'])
+        tx_message['tx_hash'] = tx_hash
+    return tx_hash
+
+def without_tx_hash(tx_message: dict) -> dict:
+    return {k: v for k, v in tx_message.items() if k != 'tx_hash'}
+
 def hash_from_results(formatted_results):
     h = hashlib.sha3_256()
     encoded_tx = encode(formatted_results).encode()
@@ -124,7 +200,7 @@ def block_from_tx_results(processing_results, proofs, prev_block_hash, wallet) -
         'origin': processing_results.get('tx_message')
     }
 
-    signature = wallet.sign(encode(deepcopy(block)))
+    signature = wallet.sign(encode(block))
     block['minted'] = {
         'minter': wallet.verifying_key,
         'signature': signature
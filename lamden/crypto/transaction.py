@@ -1,6 +1,6 @@
 import time
 
-from lamden.crypto.canonical import format_dictionary
+from lamden.crypto.canonical import format_dictionary, encode_canonical
 from lamden.formatting import check_format, rules, primatives
 from contracting.db.encoder import encode, decode
 from lamden import storage
@@ -184,17 +184,21 @@ def get_new_pending_nonce(tx_nonce, nonce, pending_nonce, strict=True, tx_per_bl
 
     return expected_nonce
 
-def check_nonce(tx: dict, nonces: storage.NonceStorage):
+def check_nonce(tx: dict, nonces: storage.NonceStorage, pending_nonces=None):
     tx_nonce = tx['payload']['nonce']
     tx_processor = tx['payload']['processor']
     tx_sender = tx['payload']['sender']
 
-    current_nonce = nonces.get_nonce(
-        sender=tx_sender,
-        processor=tx_processor
-    )
+    # The webserver also allows the reserved nonces of a sender in any order
+    if pending_nonces is not None:
+        valid = pending_nonces.check(sender=tx_sender, nonce=tx_nonce)
+    else:
+        current_nonce = nonces.get_nonce(
+            sender=tx_sender,
+            processor=tx_processor
+        )
 
-    valid = current_nonce is None or tx_nonce > current_nonce
+        valid = current_nonce is None or tx_nonce > current_nonce
 
     if not valid:
         raise TransactionNonceInvalid
@@ -261,12 +265,24 @@ def build_transaction(wallet, contract: str, function: str, kwargs: dict, nonce:
         'metadata': metadata
     }
 
-    return encode(format_dictionary(tx))
+    return encode_canonical(tx)
 
 
 # Run through all tests
+def get_var(client: ContractingClient, contract: str, variable: str, arguments: list, state_cache: dict = None):
+    if state_cache is None:
+        return client.get_var(contract=contract, variable=variable, arguments=arguments, mark=False)
+
+    # Transactions validated together share their state lookups
+    key = (contract, variable, *arguments)
+    if key not in state_cache:
+        state_cache[key] = client.get_var(contract=contract, variable=variable, arguments=arguments, mark=False)
+
+    return state_cache[key]
+
+
 def transaction_is_valid(transaction, expected_processor, client: ContractingClient, nonces: storage.NonceStorage, strict=True,
-                         tx_per_block=15, timeout=60):
+                         tx_per_block=15, timeout=60, state_cache: dict = None, pending_nonces=None):
     # Checks if correct processor and if signature is valid
     check_tx_formatting(transaction, expected_processor)
 
@@ -274,11 +290,11 @@ def transaction_is_valid(transaction, expected_processor, client: ContractingCli
     sender = transaction['payload']['sender']
 
     # Check the Nonce is greater than the current nonce we have
-    check_nonce(tx=transaction, nonces=nonces)
+    check_nonce(tx=transaction, nonces=nonces, pending_nonces=pending_nonces)
 
     # Get the senders balance and the current stamp rate
-    balance = client.get_var(contract='currency', variable='balances', arguments=[sender], mark=False)
-    stamp_rate = client.get_var(contract='stamp_cost', variable='S', arguments=['value'], mark=False)
+    balance = get_var(client, contract='currency', variable='balances', arguments=[sender], state_cache=state_cache)
+    stamp_rate = get_var(client, contract='stamp_cost', variable='S', arguments=['value'], state_cache=state_cache)
 
     contract = transaction['payload']['contract']
     func = transaction['payload']['function']
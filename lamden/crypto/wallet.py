@@ -1,17 +1,26 @@
 import nacl
 import nacl.encoding
+import nacl.exceptions
 import nacl.signing
+from functools import lru_cache
 from zmq.utils import z85
 import secrets
 from . import zbase
 
+# Parsed keys of the signers seen last, masternodes and active senders
+VERIFY_KEY_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=VERIFY_KEY_CACHE_SIZE)
+def verify_key(vk: str) -> nacl.signing.VerifyKey:
+    return nacl.signing.VerifyKey(bytes.fromhex(vk))
+
 
 def verify(vk: str, msg: str, signature: str):
-    vk = bytes.fromhex(vk)
     msg = msg.encode()
     signature = bytes.fromhex(signature)
 
-    vk = nacl.signing.VerifyKey(vk)
+    vk = verify_key(vk)
     try:
         vk.verify(msg, signature)
     except nacl.exceptions.BadSignatureError:
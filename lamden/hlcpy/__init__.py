@@ -1,15 +1,34 @@
 import threading
 import time
 import math
+import re
 
-from datetime import datetime, timezone
+from datetime import date, datetime, timezone
+from functools import lru_cache
 from iso8601 import parse_date
 
+NANOS_PER_SECOND = 1_000_000_000
+SECONDS_PER_DAY = 86_400
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+LOGICAL_BITS = 16
+MAX_MILLIS = 2**43
+MAX_LOGICAL = 2**LOGICAL_BITS
+
+# Parsed timestamps kept by parse_hlc, about 100 bytes each
+HLC_CACHE_SIZE = 2**16
+SECONDS_CACHE_SIZE = 2**12
+
+# The shape str(HLC) produces, everything else goes through iso8601
+HLC_FORMAT = re.compile(r'(\d{4})-(\d\d)-(\d\d)T(\d\d):(\d\d):(\d\d)\.(\d{9})Z(?:_(\d+))?', re.ASCII)
+
 
 def synchronized(fn):
-    """Synchronization for object methods using self.lock"""
+    """Synchronization for object methods using self.lock, objects without a lock are not synchronized"""
 
     def wrapper(self, *args, **kwargs):
+        if self.lock is None:
+            return fn(self, *args, **kwargs)
         with self.lock:
             return fn(self, *args, **kwargs)
     return wrapper
@@ -19,12 +38,16 @@ def now_utc() -> datetime:
     return datetime.now(timezone.utc)
 
 
+@lru_cache(maxsize=SECONDS_CACHE_SIZE)
+def seconds_to_iso8601(seconds: int) -> str:
+    return datetime.fromtimestamp(seconds, tz=timezone.utc).strftime('%Y-%m-%dT%H:%M:%S')
+
+
 def nanos_to_iso8601(nanos: int) -> str:
-    nanos_order = int(1e9)
-    dt = datetime.fromtimestamp(nanos // nanos_order, tz=timezone.utc)
-    return '{}.{:09.0f}Z'.format(
-        dt.strftime('%Y-%m-%dT%H:%M:%S'),
-        nanos % nanos_order)
+    seconds, fraction = divmod(nanos, NANOS_PER_SECOND)
+    if type(fraction) is int:
+        return '{}.{:09d}Z'.format(seconds_to_iso8601(seconds), fraction)
+    return '{}.{:09.0f}Z'.format(seconds_to_iso8601(int(seconds)), fraction)
 
 
 def iso8601_to_nanos(s: str) -> int:
@@ -39,6 +62,71 @@ def iso8601_to_nanos(s: str) -> int:
     full_str = str(seconds) + decimals_str
     return int(full_str)
 
+
+def check_range(nanos: int, logical: int):
+    if nanos / 1e6 >= MAX_MILLIS:
+        raise ValueError('Time in milliseconds cannot be larger than 43 bits')
+    if logical >= MAX_LOGICAL:
+        raise ValueError('Logical time cannot be larger than 16 bits')
+
+
+@lru_cache(maxsize=HLC_CACHE_SIZE)
+def parse_hlc(s: str) -> tuple:
+    """Returns <nanoseconds since unix epoch, logical clock> of a timestamp like str(HLC).
+    Timestamps in that exact shape are parsed with integer arithmetic, others are left to iso8601.
+    Raises ValueError for timestamps HLC.from_str does not accept.
+    """
+    match = HLC_FORMAT.fullmatch(s)
+    if match is not None and match.group(1) >= '1970':
+        year, month, day, hours, minutes, seconds, fraction, logical = match.groups()
+        try:
+            days = date(int(year), int(month), int(day)).toordinal() - EPOCH_ORDINAL
+        except ValueError:
+            days = None
+
+        if days is not None and hours < '24' and minutes < '60' and seconds < '60':
+            nanos = (days * SECONDS_PER_DAY + int(hours) * 3600 + int(minutes) * 60 + int(seconds)) \
+                * NANOS_PER_SECOND + int(fraction)
+            logical = int(logical) if logical is not None else 0
+            check_range(nanos, logical)
+            return nanos, logical
+
+    spl = s.split('_')
+    nanos = iso8601_to_nanos(spl[0])
+    logical = int(spl[1]) if len(spl) > 1 else 0
+    check_range(nanos, logical)
+    return nanos, logical
+
+
+def format_hlc(nanos: int, logical: int) -> str:
+    return '{}_{}'.format(nanos_to_iso8601(nanos), logical)
+
+
+class Formatter:
+    """Formats like format_hlc and keeps the rendered seconds of the last timestamp, so timestamps within
+    the same second only render their nanos and logical clock. Not thread safe.
+    """
+    def __init__(self):
+        self.seconds = None
+        self.prefix = None
+
+    def format(self, nanos: int, logical: int) -> str:
+        if type(nanos) is not int:
+            return format_hlc(nanos, logical)
+
+        seconds, fraction = divmod(nanos, NANOS_PER_SECOND)
+        if seconds != self.seconds:
+            self.prefix = seconds_to_iso8601(seconds)
+            self.seconds = seconds
+        return '{}.{:09d}Z_{}'.format(self.prefix, fraction, logical)
+
+
+def hlc_key(s: str) -> int:
+    """Integer that orders timestamps by <nanoseconds, logical clock>, for sorting and keys"""
+    nanos, logical = parse_hlc(s)
+    return nanos << LOGICAL_BITS | logical
+
+
 class HLC:
     n_bits = 64
     n_bytes = int(n_bits / 8)
@@ -50,8 +138,11 @@ class HLC:
     compatibility_mask = (1 << n_bits) - 1 ^ millis_mask ^ logical_mask
     byteorder = 'little'
 
-    def __init__(self, nanos: int = 0, logical: int = 0):
-        self.lock = threading.Lock()
+    def __init__(self, nanos: int = 0, logical: int = 0, threadsafe: bool = True):
+        """Pass threadsafe=False when the clock is only used from one thread, such as one event loop,
+        to skip taking a lock on every tick.
+        """
+        self.lock = threading.Lock() if threadsafe else None
         self._set(nanos, logical)
 
     @classmethod
@@ -64,9 +155,7 @@ class HLC:
 
     @classmethod
     def from_str(cls, s: str):
-        spl = s.split('_')
-        nanos = iso8601_to_nanos(spl[0])
-        logical = int(spl[1]) if len(spl) > 1 else 0
+        nanos, logical = parse_hlc(s)
         return cls(nanos, logical)
 
     @classmethod
@@ -106,11 +195,7 @@ class HLC:
         self._set(nanos, 0)
 
     def _set(self, nanos: int, logical: int):
-        if nanos / 1e6 >= 2**self.millis_bits:
-            raise ValueError(
-                'Time in milliseconds cannot be larger than 43 bits')
-        if logical >= 2**self.logical_bits:
-            raise ValueError('Logical time cannot be larger than 16 bits')
+        check_range(nanos, logical)
         self._nanos = nanos
         self._logical = logical
 
@@ -118,8 +203,12 @@ class HLC:
         """Returns a tuple of <nanoseconds since unix epoch, logical clock>"""
         return self.nanos, self.logical
 
+    def key(self):
+        """Returns the integer form, see hlc_key"""
+        return int(self.nanos) << LOGICAL_BITS | self.logical
+
     def __str__(self):
-        return '{}_{}'.format(nanos_to_iso8601(self.nanos), self.logical)
+        return format_hlc(self.nanos, self.logical)
 
     def __repr__(self):
         return 'HLC(nanos={},logical={})'.format(self.nanos, self.logical)
@@ -133,9 +222,8 @@ class HLC:
     @synchronized
     def sync(self):
         "Used to refresh the clock"
-        wall = HLC.from_now()
         cnanos, clogical = self.tuple()
-        wnanos, _ = wall.tuple()
+        wnanos = self.get_nanoseconds()
         nanos = max(cnanos, wnanos)
         if nanos == cnanos:
             logical = clogical + 1
@@ -148,8 +236,7 @@ class HLC:
         "To be used on receiving an event"
         cnanos, clogical = self.tuple()
         enanos, elogical = event.tuple()
-        wall = HLC.from_now()
-        wnanos, _ = wall.tuple()
+        wnanos = self.get_nanoseconds()
         nanos = max(cnanos, enanos, wnanos)
         if nanos == enanos and nanos == cnanos:
             logical = max(clogical, elogical) + 1
@@ -160,3 +247,16 @@ class HLC:
         else:
             logical = 0
         self._set(nanos, logical)
+
+    @synchronized
+    def reserve(self, n: int) -> list:
+        """Ticks the clock n times and returns the <nanoseconds, logical clock> of every tick.
+        Every tick gets its own nanoseconds, as the nanoseconds of a timestamp are its block number.
+        """
+        if n < 1:
+            return []
+
+        cnanos, _ = self.tuple()
+        start = max(cnanos + 1, self.get_nanoseconds())
+        self._set(start + n - 1, 0)
+        return [(nanos, 0) for nanos in range(start, start + n)]
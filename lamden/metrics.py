@@ -0,0 +1,348 @@
+'''
+    Counters, gauges and histograms for the node's hot paths, rendered in the Prometheus text exposition format.
+
+    Metrics are created once at import time of the module that uses them and updating one is a dict lookup and an
+    addition, so they can stay on in production. Everything lives in one process wide REGISTRY which the node serves
+    with a MetricsServer and the webserver serves on its /metrics route.
+'''
+from abc import ABC, abstractmethod
+from lamden.logger.base import get_logger
+from urllib.parse import parse_qsl
+import asyncio
+import bisect
+import math
+import weakref
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+MAX_REQUEST_SIZE = 8 * 1024
+
+
+def format_value(value) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if value == -math.inf:
+        return '-Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def escape_label_value(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_labels(names: tuple, values: tuple, extra: str = None) -> str:
+    pairs = [f'{name}="{escape_label_value(value)}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(extra)
+
+    if len(pairs) == 0:
+        return ''
+    return '{' + ','.join(pairs) + '}'
+
+
+class Metric(ABC):
+    kind = None
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+        # label values -> child, the unlabelled metric is the child under ()
+        self.children = {}
+        self.function = None
+
+    @abstractmethod
+    def new_child(self):
+        pass
+
+    def labels(self, *values):
+        '''
+            Returns the child for these label values. Callers on hot paths can keep the child around instead of
+            looking it up every time.
+        '''
+        if len(values) != len(self.labelnames):
+            raise ValueError(f'{self.name} takes labels {self.labelnames}.')
+
+        key = tuple(str(value) for value in values)
+
+        child = self.children.get(key)
+        if child is None:
+            child = self.children.setdefault(key, self.new_child())
+
+        return child
+
+    def set_function(self, function):
+        '''
+            Reads the value from function when the metric is rendered, for values the code already keeps track of
+            such as queue lengths. For a labelled metric function returns a dict of label values to values.
+        '''
+        self.function = function
+
+    def clear(self):
+        self.children.clear()
+
+    def samples(self):
+        if self.function is not None:
+            try:
+                value = self.function()
+            except Exception:
+                return
+
+            if not isinstance(value, dict):
+                yield self.name, '', value
+                return
+
+            for values, child_value in sorted(value.items()):
+                yield self.name, format_labels(self.labelnames, values), child_value
+            return
+
+        for values, child in sorted(self.children.items()):
+            yield self.name, format_labels(self.labelnames, values), child.value
+
+    def render(self) -> list:
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.kind}'
+        ]
+        lines.extend(f'{name}{labels} {format_value(value)}' for name, labels, value in self.samples())
+        return lines
+
+
+class CounterChild:
+    __slots__ = ('value', )
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class GaugeChild(CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def new_child(self):
+        return CounterChild()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    @property
+    def value(self):
+        if self.function is not None:
+            return self.function()
+        return self.labels().value
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def new_child(self):
+        return GaugeChild()
+
+    def dec(self, amount=1):
+        self.labels().dec(amount)
+
+    def set(self, value):
+        self.labels().set(value)
+
+
+class HistogramChild:
+    __slots__ = ('upper_bounds', 'buckets', 'count', 'sum')
+
+    def __init__(self, upper_bounds: tuple):
+        self.upper_bounds = upper_bounds
+        self.buckets = [0] * (len(upper_bounds) + 1)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        # buckets are stored non-cumulative and only added up when rendered
+        self.buckets[bisect.bisect_left(self.upper_bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name=name, documentation=documentation, labelnames=labelnames)
+        self.upper_bounds = tuple(sorted(buckets))
+
+    def new_child(self):
+        return HistogramChild(upper_bounds=self.upper_bounds)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def samples(self):
+        for values, child in sorted(self.children.items()):
+            total = 0
+            for upper_bound, count in zip(self.upper_bounds + (math.inf, ), child.buckets):
+                total += count
+                le = f'le="{format_value(float(upper_bound))}"'
+                yield f'{self.name}_bucket', format_labels(self.labelnames, values, extra=le), total
+
+            labels = format_labels(self.labelnames, values)
+            yield f'{self.name}_count', labels, child.count
+            yield f'{self.name}_sum', labels, child.sum
+
+
+class InstanceValues:
+    '''
+        Function for a labelled metric that reads one value per live object, e.g. the length of every queue in a
+        process that runs several nodes. Objects are held by weak references, so tracking them does not keep them
+        alive and they drop out of the metric when they are garbage collected.
+    '''
+    def __init__(self, value):
+        self.value = value
+        self.instances = weakref.WeakKeyDictionary()
+
+    def __len__(self):
+        return len(self.instances)
+
+    def add(self, instance, *label_values):
+        self.instances[instance] = tuple(str(value) for value in label_values)
+
+    def __call__(self) -> dict:
+        return {label_values: self.value(instance) for instance, label_values in list(self.instances.items())}
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def __len__(self):
+        return len(self.metrics)
+
+    def get(self, name: str):
+        return self.metrics.get(name)
+
+    def register(self, metric: Metric) -> Metric:
+        # Registering a name twice returns the first metric, so modules and tests can create nodes more than once
+        existing = self.metrics.get(metric.name)
+        if existing is not None:
+            if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                raise ValueError(f'Metric {metric.name} is already registered as a different metric.')
+            return existing
+
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        return self.register(Counter(name=name, documentation=documentation, labelnames=labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple = ()) -> Gauge:
+        return self.register(Gauge(name=name, documentation=documentation, labelnames=labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple = (),
+                  buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name=name, documentation=documentation, labelnames=labelnames,
+                                       buckets=buckets))
+
+    def clear(self):
+        for metric in self.metrics.values():
+            metric.clear()
+
+    def render(self) -> str:
+        lines = []
+        for name in sorted(self.metrics):
+            lines.extend(self.metrics[name].render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
+render = REGISTRY.render
+
+
+class MetricsServer:
+    '''
+        Minimal HTTP server for GET /metrics on the node's event loop. The node has no HTTP server of its own and a
+        scrape only needs the rendered registry, so this avoids starting a Sanic app in the node process.
+
+        Other diagnostics of the node can be served next to the metrics with add_route.
+    '''
+    def __init__(self, registry: Registry = REGISTRY, host: str = '0.0.0.0', port: int = 19090):
+        self.registry = registry
+        self.host = host
+        self.port = port
+
+        # path -> (content type, handler taking the query args and returning the body)
+        self.routes = {
+            '/metrics': (CONTENT_TYPE, lambda args: self.registry.render())
+        }
+
+        self.server = None
+        self.log = get_logger('METRICS')
+
+    def add_route(self, path: str, handler, content_type: str = 'application/json'):
+        self.routes[path] = (content_type, handler)
+
+    @property
+    def is_running(self) -> bool:
+        return self.server is not None
+
+    async def start(self):
+        if self.server is not None:
+            return
+
+        self.server = await asyncio.start_server(self.handle, host=self.host, port=self.port,
+                                                 limit=MAX_REQUEST_SIZE)
+        self.log.info(f'Serving metrics on {self.host}:{self.port}/metrics')
+
+    async def stop(self):
+        if self.server is None:
+            return
+
+        self.server.close()
+        await self.server.wait_closed()
+        self.server = None
+
+    async def handle(self, reader, writer):
+        try:
+            request = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), timeout=5)
+            method, path = request.split(b'\r\n', 1)[0].decode().split(' ')[:2]
+            path, _, query = path.partition('?')
+
+            content_type, handler = self.routes.get(path, (CONTENT_TYPE, None))
+
+            if method != 'GET':
+                status, body = '405 Method Not Allowed', ''
+            elif handler is None:
+                status, body = '404 Not Found', ''
+            else:
+                try:
+                    status, body = '200 OK', handler(dict(parse_qsl(query)))
+                except ValueError as err:
+                    status, body = '400 Bad Request', str(err)
+
+            body = body.encode()
+            writer.write(
+                f'HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\nContent-Length: {len(body)}\r\n'
+                f'Connection: close\r\n\r\n'.encode() + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
@@ -15,23 +15,25 @@ from contracting.client import ContractingClient
 from contracting.db.driver import ContractDriver
 from contracting.db.encoder import convert_dict, encode
 
-from lamden import storage, contracts
+from lamden import storage, contracts, metrics, tracing
 from lamden.peer import Peer
 from lamden.contracts import sync
 from lamden.crypto.wallet import Wallet
 from lamden.logger.base import get_logger
 from lamden.network import Network
 from lamden.nodes import system_usage
+from lamden.nodes.profiler import Profiler
+from lamden.nodes import watchdog
 from lamden.nodes.processing_queue  import TxProcessingQueue
 from lamden.nodes.validation_queue  import ValidationQueue
 from lamden.nodes.processors import work, block_contender
 from lamden.nodes.processors.processor import Processor
 from lamden.nodes.filequeue import FileQueue
 from lamden.nodes.hlc import HLC_Clock
-from lamden.crypto.canonical import tx_hash_from_tx, block_from_tx_results, recalc_block_info, tx_result_hash_from_tx_result_object
+from lamden.crypto.canonical import tx_hash_from_tx, without_tx_hash, block_from_tx_results, recalc_block_info, tx_result_hash_from_tx_result_object
 from lamden.crypto.transaction import get_nonces
 from lamden.nodes.events import Event, EventWriter
-from lamden.crypto.block_validator import verify_block
+from lamden.crypto.block_validator import VerifiedBlocks
 from typing import List
 
 from lamden.crypto.transaction import build_transaction
@@ -50,6 +52,19 @@ NEW_BLOCK_REORG_EVENT = 'block_reorg'
 WORK_SERVICE = 'work'
 CONTENDER_SERVICE = 'contenders'
 
+TXS_FROM_FILE = metrics.counter('lamden_txs_from_file_total', 'Transactions taken off the file queue.')
+BLOCKS_STORED = metrics.counter('lamden_blocks_stored_total',
+                                'New blocks stored, by whether this node minted them from consensus results, received '
+                                'them finished (from a peer or genesis), got them during catchup or held them until '
+                                'catchup was done.', ('source', ))
+BLOCKS_MINTED = BLOCKS_STORED.labels('minted')
+BLOCKS_RECEIVED = BLOCKS_STORED.labels('received')
+CATCHUP_BLOCKS = BLOCKS_STORED.labels('catchup')
+HELD_BLOCKS = BLOCKS_STORED.labels('held')
+BLOCKS_REORGED = metrics.counter('lamden_blocks_reorged_total',
+                                 'Blocks stored again because an earlier block was inserted before them.')
+CATCHUP_RATE = metrics.gauge('lamden_catchup_blocks_per_second', 'Blocks per second of the last catchup run.')
+
 class NewBlock(Processor):
     def __init__(self, driver: ContractDriver):
         self.q = []
@@ -76,7 +91,8 @@ class Node:
     def __init__(self, socket_base,  wallet, constitution={}, bootnodes={}, blocks=None,
                  driver=None, delay=None, debug=True, testing=False, bypass_catchup=False,
                  consensus_percent=None, nonces=None, parallelism=4, genesis_block=None, metering=False,
-                 tx_queue=None, socket_ports=None, reconnect_attempts=5, join=False, event_writer=None):
+                 tx_queue=None, socket_ports=None, reconnect_attempts=5, join=False, event_writer=None,
+                 metrics_port=None, profile_endpoint=False):
 
         self.main_processing_queue = None
         self.validation_queue = None
@@ -93,7 +109,7 @@ class Node:
         self.pause_tx_queue_checking = False
 
         self.driver = driver if driver is not None else ContractDriver()
-        self.nonces = nonces if nonces is not None else storage.NonceStorage()
+        self.nonces = nonces if nonces is not None else storage.NonceStorage(write_back=True)
         self.event_writer = event_writer if event_writer is not None else EventWriter()
 
         self.blocks = blocks if blocks is not None else storage.BlockStorage()
@@ -122,9 +138,23 @@ class Node:
         self.log.propagate = debug
         self.socket_base = socket_base
         self.wallet = wallet
-        self.hlc_clock = HLC_Clock()
+        self.hlc_clock = HLC_Clock(single_loop=True)
+
+        # Blocks from peers that passed verify_block, identical copies are not verified again
+        self.verified_blocks = VerifiedBlocks()
 
         self.system_monitor = system_usage.SystemUsage()
+        self.profiler = Profiler()
+        self.watchdog = watchdog.from_env()
+
+        self.metrics_server = metrics.MetricsServer(port=metrics_port) if metrics_port is not None else None
+        if self.metrics_server is not None:
+            self.metrics_server.add_route('/traces', tracing.TRACER.handle_request)
+            self.metrics_server.add_route('/blockers', self.watchdog.handle_request)
+
+            # Starting a profile costs CPU and anyone who can reach the metrics port can call it, so it is opt in
+            if profile_endpoint:
+                self.metrics_server.add_route('/profile', self.profiler.handle_request)
 
         self.last_minted_block = None
         self.held_blocks = []
@@ -232,6 +262,12 @@ class Node:
                 asyncio.ensure_future(self.system_monitor.start(delay_sec=120))
                 # asyncio.ensure_future(self.debug_print_loop_counter())
 
+            if self.metrics_server is not None:
+                await self.metrics_server.start()
+
+            self.profiler.install()
+            self.watchdog.start()
+
             self.network.start()
             await self.network.starting()
 
@@ -263,9 +299,19 @@ class Node:
         await self.cancel_checking_all_queues()
 
         await self.network.stop()
+        self.nonces.commit()
         self.system_monitor.stop()
         await self.system_monitor.stopping()
 
+        if self.metrics_server is not None:
+            await self.metrics_server.stop()
+
+        self.profiler.stop()
+        self.watchdog.stop()
+
+        if tracing.TRACE_FILE and tracing.TRACER.enabled:
+            self.log.info(f'Wrote {tracing.TRACER.dump(tracing.TRACE_FILE)} traces to {tracing.TRACE_FILE}')
+
         self.started = False
 
         self.log.error("!!!!!! STOPPED NODE !!!!!!")
@@ -481,21 +527,23 @@ class Node:
             new_block = self.held_blocks.pop(0)
 
             if int(new_block.get('number')) > self.get_current_height():
-                # Apply state to DB
-                self.apply_state_changes_from_block(block=new_block)
+                with storage.state_write(self.driver.driver):
+                    # Apply state to DB
+                    self.apply_state_changes_from_block(block=new_block)
 
-                # change to previous hash and recalculate the hash
-                self.blocks.set_previous_hash(block=new_block)
-                new_block = recalc_block_info(block=new_block)
+                    # change to previous hash and recalculate the hash
+                    self.blocks.set_previous_hash(block=new_block)
+                    new_block = recalc_block_info(block=new_block)
 
-                # Store the block in the block db
-                encoded_block = encode(new_block)
-                encoded_block = json.loads(encoded_block)
+                    # Store the block in the block db
+                    encoded_block = encode(new_block)
+                    encoded_block = json.loads(encoded_block)
 
-                self.blocks.store_block(block=deepcopy(encoded_block))
+                    self.blocks.store_block(block=deepcopy(encoded_block))
+                    HELD_BLOCKS.inc()
 
-                # Set the current block hash and height
-                self.update_block_db(block=encoded_block)
+                    # Set the current block hash and height
+                    self.update_block_db(block=encoded_block)
 
                 latest_block = self.get_current_height()
                 latest_block_hash = self.get_current_hash()
@@ -510,12 +558,17 @@ class Node:
                     data=encoded_block
                 ))
 
+        self.nonces.commit()
+
         self.hold_blocks = False
         self.held_blocks = []
 
     async def catchup_get_blocks(self, catchup_peers: List[Peer], catchup_stop_block: int):
         run_catchup = True
 
+        catchup_started = time.time()
+        blocks_stored = 0
+
         while run_catchup:
             catchup_peers = list(filter(lambda x: x.latest_block_number >= catchup_stop_block, catchup_peers))
             block_catchup_peers = copy.copy(catchup_peers)
@@ -536,7 +589,7 @@ class Node:
                 new_block = response.get("block_info")
                 #self.log.info(new_block)
 
-                if new_block is None or not verify_block(block=new_block):
+                if new_block is None or not self.verified_blocks.verify(block=new_block):
                     self.log.warning(f'Block received from peer {catchup_peer.server_vk} did not pass verify.')
                     block_catchup_peers = remove_peer(block_catchup_peers, catchup_peer.server_vk)
                     continue
@@ -561,17 +614,18 @@ class Node:
                     if len(self.held_blocks) > 0 and self.held_blocks[0].get('number') == new_block_number:
                         pass
                     else:
-                        # Apply state to DB
-                        self.apply_state_changes_from_block(block=new_block)
+                        with storage.state_write(self.driver.driver):
+                            # Apply state to DB
+                            self.apply_state_changes_from_block(block=new_block)
 
-                        # Store the block in the block db
-                        encoded_block = encode(new_block)
-                        encoded_block = json.loads(encoded_block)
+                            # Store the block in the block db
+                            encoded_block = encode(new_block)
+                            encoded_block = json.loads(encoded_block)
 
-                        self.blocks.store_block(block=deepcopy(encoded_block))
+                            self.blocks.store_block(block=deepcopy(encoded_block))
 
-                        # Set the current block hash and height
-                        self.update_block_db(block=encoded_block)
+                            # Set the current block hash and height
+                            self.update_block_db(block=encoded_block)
 
                         if new_block_number != 0:
                             # Save Nonce from block
@@ -583,15 +637,21 @@ class Node:
                             data=encoded_block
                         ))
 
+                        CATCHUP_BLOCKS.inc()
+                        blocks_stored += 1
+
                 # Exit from loop when the block receive is greater than the catchup_stop_block
                 if new_block_number >= catchup_stop_block:
+                    CATCHUP_RATE.set(blocks_stored / max(time.time() - catchup_started, 0.001))
+
+                    # Write the nonces of the caught up blocks to disk once
+                    self.nonces.commit()
                     return
 
             if len(block_catchup_peers) == 0:
                 raise ConnectionError("Could not catchup from network.")
 
     def save_nonce_from_block(self, block: dict):
-        self.log.info({'block': block})
         payload = block['processed']['transaction']['payload']
 
         nonce = self.nonces.get_nonce(
@@ -671,17 +731,31 @@ class Node:
         while self.running and not self.pause_tx_queue_checking:
             if len(self.tx_queue) > 0:
                 self.log.debug("Calling Check TX File Queue")
-                tx_from_file = self.tx_queue.pop(0)
-                # TODO sometimes the tx info taken off the filequeue is None, investigate
-                self.log.info(f'GOT TX FROM FILE {tx_from_file}')
-                if tx_from_file is not None:
-                    tx_message = self.make_tx_message(tx=tx_from_file)
+                txs_from_file = [self.tx_queue.pop(0)]
+
+                # The rest of a batch file is handed out in the same pass
+                while len(self.tx_queue.pending) > 0:
+                    txs_from_file.append(self.tx_queue.pop(0))
+
+                TXS_FROM_FILE.inc(len(txs_from_file))
 
-                    # send the tx to the rest of the network
-                    asyncio.ensure_future(self.network.publisher.async_publish(topic_str=WORK_SERVICE, msg_dict=tx_message))
+                hlc_timestamps = self.hlc_clock.reserve_hlc_timestamps(len(txs_from_file))
+
+                for tx_from_file, hlc_timestamp in zip(txs_from_file, hlc_timestamps):
+                    # TODO sometimes the tx info taken off the filequeue is None, investigate
+                    self.log.info(f'GOT TX FROM FILE {tx_from_file}')
+                    if tx_from_file is not None:
+                        tx_message = self.make_tx_message(tx=tx_from_file, hlc_timestamp=hlc_timestamp)
+                        tracing.record(tx_message['hlc_timestamp'], tracing.INTAKE)
+
+                        # send the tx to the rest of the network, peers hash the transaction themselves
+                        asyncio.ensure_future(self.network.publisher.async_publish(
+                            topic_str=WORK_SERVICE, msg_dict=without_tx_hash(tx_message)
+                        ))
+                        tracing.record(tx_message['hlc_timestamp'], tracing.PUBLISHED)
 
-                    # add this tx the processing queue so we can process it
-                    self.main_processing_queue.append(tx=tx_message)
+                        # add this tx the processing queue so we can process it
+                        self.main_processing_queue.append(tx=tx_message)
 
             self.debug_loop_counter['file_check'] = self.debug_loop_counter['file_check'] + 1
             await asyncio.sleep(0.1)
@@ -760,6 +834,7 @@ class Node:
             processing_results=processing_results
         )
         self.send_solution_to_network(processing_results=processing_results)
+        tracing.record(processing_results.get('hlc_timestamp'), tracing.SOLUTION_SENT)
 
         self.validation_queue.append(
             processing_results=processing_results
@@ -783,8 +858,8 @@ class Node:
         except Exception as err:
             self.log.error(err)
 
-    def make_tx_message(self, tx):
-        hlc_timestamp = self.hlc_clock.get_new_hlc_timestamp()
+    def make_tx_message(self, tx, hlc_timestamp=None):
+        hlc_timestamp = hlc_timestamp or self.hlc_clock.get_new_hlc_timestamp()
         tx_hash = tx_hash_from_tx(tx=tx)
 
         signature = self.wallet.sign(f'{tx_hash}{hlc_timestamp}')
@@ -793,7 +868,8 @@ class Node:
             'tx': tx,
             'hlc_timestamp': hlc_timestamp,
             'signature': signature,
-            'sender': self.wallet.verifying_key
+            'sender': self.wallet.verifying_key,
+            'tx_hash': tx_hash
         }
 
     def update_block_db(self, block):
@@ -852,14 +928,15 @@ class Node:
             # Get any blocks that have been commited that are later than this hlc_timestamp
             later_blocks = self.blocks.get_later_blocks(hlc_timestamp=hlc_timestamp)
 
-            if len(later_blocks) == 0:
-                # Apply the state changes from the block to the db
-                self.apply_state_changes_from_block(block)
+            with storage.state_write(self.driver.driver):
+                if len(later_blocks) == 0:
+                    # Apply the state changes from the block to the db
+                    self.apply_state_changes_from_block(block)
 
-                self.hard_apply_store_block(block=block)
-                self.hard_apply_block_finish(block=block)
-            else:
-                self.hard_apply_has_later_blocks(later_blocks=later_blocks, block=block)
+                    self.hard_apply_store_block(block=block, received=True)
+                    self.hard_apply_block_finish(block=block)
+                else:
+                    self.hard_apply_has_later_blocks(later_blocks=later_blocks, block=block)
 
             return block
 
@@ -878,10 +955,13 @@ class Node:
             later_blocks = self.blocks.get_later_blocks(hlc_timestamp=hlc_timestamp)
 
             # If there are later blocks then we need to process them
-            if len(later_blocks) == 0:
-                block = self.hard_apply_processing_results(processing_results=processing_results)
-            else:
-                block = self.hard_apply_has_later_blocks(later_blocks=later_blocks, processing_results=processing_results)
+            with storage.state_write(self.driver.driver):
+                if len(later_blocks) == 0:
+                    block = self.hard_apply_processing_results(processing_results=processing_results)
+                else:
+                    block = self.hard_apply_has_later_blocks(later_blocks=later_blocks, processing_results=processing_results)
+
+            tracing.record(hlc_timestamp, tracing.HARD_APPLIED, reorg=len(later_blocks) > 0)
 
             return block
 
@@ -925,6 +1005,7 @@ class Node:
 
         # Store the new block in the block db
         self.blocks.store_block(new_block)
+        (BLOCKS_MINTED if block is None else BLOCKS_RECEIVED).inc()
 
         # Emit a block reorg event
 
@@ -947,6 +1028,7 @@ class Node:
                 self.held_blocks.append(encoded_block)
             else:
                 self.blocks.store_block(block)
+                BLOCKS_REORGED.inc()
 
                 # create a NEW_BLOCK_REORG_EVENT
                 encoded_block = encode(block)
@@ -990,7 +1072,7 @@ class Node:
 
         return new_block
 
-    def hard_apply_store_block(self, block: dict):
+    def hard_apply_store_block(self, block: dict, received: bool = False):
         self.log.info(f'[HARD APPLY] {block.get("number")}')
 
         # Store the block in the block db
@@ -1002,6 +1084,8 @@ class Node:
             self.held_blocks.append(encoded_block)
         else:
             self.blocks.store_block(copy.copy(encoded_block))
+            (BLOCKS_RECEIVED if received else BLOCKS_MINTED).inc()
+            tracing.record(block.get('hlc_timestamp'), tracing.STORED, number=encoded_block.get('number'))
 
             # Set the current block hash and height
             self.update_block_db(block=encoded_block)
@@ -1011,6 +1095,10 @@ class Node:
                 topics=[NEW_BLOCK_EVENT],
                 data=encoded_block
             ))
+            tracing.record(block.get('hlc_timestamp'), tracing.EVENT_EMITTED)
+
+            # Write the nonces received since the last block to disk
+            self.nonces.commit()
 
     def hard_apply_block_finish(self, block: dict):
         state_changes = self.get_state_changes_from_block(block=block)
@@ -1320,7 +1408,8 @@ class Node:
 
         return [
             block.get('block_info') for block in blocks
-            if block and block.get('success') and block.get('block_info') is not None and verify_block(block.get('block_info'))
+            if block and block.get('success') and block.get('block_info') is not None
+            and self.verified_blocks.verify(block=block.get('block_info'))
         ]
 
     # Put into 'super driver'
@@ -1,4 +1,4 @@
-from contracting.db.encoder import decode
+from contracting.db.encoder import encode, decode
 from lamden.logger.base import get_logger
 from pathlib import Path
 import os
@@ -10,6 +10,7 @@ STORAGE_HOME = pathlib.Path().home().joinpath('.lamden')
 
 class FileQueue:
     EXTENSION = '.tx'
+    BATCH_EXTENSION = '.txb'
 
     def __init__(self, root=None, write_bytes=True):
         self.log = get_logger("TX QUEUE")
@@ -18,6 +19,9 @@ class FileQueue:
         self.txq = self.root.joinpath('txq')
         self.temp_txq = self.root.joinpath('temp_txq')
 
+        # Transactions read from a batch file that have not been popped yet
+        self.pending = []
+
         self.__build_directories()
         self.log.debug(f'Created TX queue at \'{self.root}\'')
 
@@ -34,7 +38,25 @@ class FileQueue:
 
         os.rename(temp_filepath, final_filepath)
 
+    def extend(self, txs: list):
+        # Writes all the transactions to one file, pop hands them out one at a time
+        if not txs:
+            return
+
+        # The number of transactions is part of the name so the queue can be counted without reading the files
+        filename = f'{uuid.uuid4()}_{len(txs)}{self.BATCH_EXTENSION}'
+        temp_filepath = self.temp_txq.joinpath(filename)
+        final_filepath = self.txq.joinpath(filename)
+
+        with open(temp_filepath, 'w') as f:
+            f.write(encode(txs))
+
+        os.rename(temp_filepath, final_filepath)
+
     def pop(self, idx):
+        if len(self.pending) > 0:
+            return self.pending.pop(idx)
+
         files = sorted(self.txq.iterdir(), key=os.path.getmtime)
         try:
             file = files.pop(idx)
@@ -42,14 +64,32 @@ class FileQueue:
             self.log.debug(err)
             return None
 
-        with open(file) as f:
-            data = decode(f.read())
+        data = self.__read(file)
 
         os.remove(file)
 
+        if file.suffix == self.BATCH_EXTENSION:
+            self.pending = data or []
+            return self.pending.pop(0) if len(self.pending) > 0 else None
+
         return data
 
+    def __read(self, file):
+        with open(file) as f:
+            return decode(f.read())
+
+    def __count(self, file):
+        if file.suffix != self.BATCH_EXTENSION:
+            return 1
+
+        try:
+            return int(file.stem.rsplit('_', 1)[1])
+        except (IndexError, ValueError):
+            return len(self.__read(file) or [])
+
     def flush(self):
+        self.pending = []
+
         if self.txq.is_dir():
             shutil.rmtree(self.txq)
         if self.temp_txq.is_dir():
@@ -60,18 +100,34 @@ class FileQueue:
 
     def __len__(self):
         try:
-            return len(list(self.txq.iterdir()))
+            return len(self.pending) + sum(self.__count(file) for file in self.txq.iterdir())
         except FileNotFoundError:
-            return 0
+            return len(self.pending)
 
     def __getitem__(self, key):
-        files = sorted(self.txq.iterdir(), key=os.path.getmtime)
-        file = files[key]
+        if isinstance(key, slice):
+            return [self[index] for index in range(*key.indices(len(self)))]
 
-        with open(file) as f:
-            data = decode(f.read())
+        if key < 0:
+            key += len(self)
+        if key < 0:
+            raise IndexError('queue index out of range')
 
-        return data
+        if key < len(self.pending):
+            return self.pending[key]
+        key -= len(self.pending)
+
+        # Only the file that holds the transaction is read
+        for file in sorted(self.txq.iterdir(), key=os.path.getmtime):
+            count = self.__count(file)
+            if key >= count:
+                key -= count
+                continue
+
+            data = self.__read(file)
+            return data[key] if file.suffix == self.BATCH_EXTENSION else data
+
+        raise IndexError('queue index out of range')
 
     def __build_directories(self):
         self.root.mkdir(parents=True, exist_ok=True)
@@ -1,10 +1,12 @@
-from lamden.hlcpy import HLC
+from lamden.hlcpy import HLC, Formatter, format_hlc, parse_hlc
 from lamden.logger.base import get_logger
 
 class HLC_Clock():
-    def __init__(self, processing_delay=3):
-        self.hlc_clock = HLC()
+    def __init__(self, processing_delay=3, single_loop=False):
+        # A clock used from a single event loop needs no lock and can keep the last rendered second
+        self.hlc_clock = HLC(threadsafe=not single_loop)
         self.hlc_clock.sync()
+        self.format = Formatter().format if single_loop else format_hlc
 
         self.processing_delay = processing_delay
 
@@ -12,7 +14,10 @@ class HLC_Clock():
 
     def get_new_hlc_timestamp(self):
         self.hlc_clock.sync()
-        return str(self.hlc_clock)
+        return self.format(*self.hlc_clock.tuple())
+
+    def reserve_hlc_timestamps(self, amount):
+        return [self.format(nanos, logical) for nanos, logical in self.hlc_clock.reserve(amount)]
 
     def timestamp_to_hlc(self, timestamp):
         return HLC.from_str(timestamp)
@@ -21,9 +26,7 @@ class HLC_Clock():
         self.hlc_clock.merge(self.timestamp_to_hlc(event_timestamp))
 
     def check_timestamp_age(self, timestamp):
-        # Convert timestamp to HLC clock then to nanoseconds
-        temp_hlc = self.timestamp_to_hlc(timestamp)
-        timestamp_nanoseconds, _ = temp_hlc.tuple()
+        timestamp_nanoseconds, _ = parse_hlc(timestamp)
 
         # sync out clock and then get its nanoseconds
         self.hlc_clock.sync()
@@ -33,9 +36,7 @@ class HLC_Clock():
         return internal_nanoseconds - timestamp_nanoseconds
 
     def get_nanos(self, timestamp):
-        # Convert timestamp to HLC clock then to nanoseconds
-        temp_hlc = self.timestamp_to_hlc(timestamp)
-        timestamp_nanoseconds, _ = temp_hlc.tuple()
+        timestamp_nanoseconds, _ = parse_hlc(timestamp)
         return timestamp_nanoseconds
 
     def check_expired(self, timestamp):
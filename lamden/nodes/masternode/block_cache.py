@@ -0,0 +1,178 @@
+from collections import OrderedDict
+from contracting.db.encoder import encode
+
+MAX_CACHED_BLOCKS = 1000
+
+
+def block_etag(block_hash: str) -> str:
+    return f'"{block_hash}"'
+
+
+class CachedResponse:
+    def __init__(self, body: bytes, etag: str):
+        self.body = body
+        self.etag = etag
+
+
+class BlockResponseCache:
+    '''
+        Holds pre-encoded JSON bodies for the block endpoints, keyed by block number, block hash and "latest".
+
+        Blocks only change when they are re-ordered, so the cache is kept correct by the event service: new_block
+        events refresh "latest" and block_reorg events drop everything. The cache is only enabled while the
+        webserver is connected to the event service, otherwise it could miss a reorg.
+    '''
+    def __init__(self, max_blocks: int = MAX_CACHED_BLOCKS):
+        self.max_blocks = max_blocks
+        self.enabled = False
+
+        self.blocks = OrderedDict()
+        self.numbers = {}
+        self.hashes = {}
+
+        self.latest_height = None
+        self.latest_block = None
+        self.latest_number = None
+        self.latest_hash = None
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.blocks)
+
+    def enable(self):
+        self.clear()
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+        self.clear()
+
+    def clear(self):
+        self.blocks.clear()
+        self.numbers.clear()
+        self.hashes.clear()
+
+        self.latest_height = None
+        self.latest_block = None
+        self.latest_number = None
+        self.latest_hash = None
+
+    def get_by_number(self, number: int):
+        if not self.enabled:
+            return None
+
+        response = self.blocks.get(number)
+        if response is None:
+            self.misses += 1
+            return None
+
+        self.blocks.move_to_end(number)
+        self.hits += 1
+        return response
+
+    def get_by_hash(self, block_hash: str):
+        if not self.enabled:
+            return None
+
+        number = self.hashes.get(block_hash)
+        if number is None:
+            self.misses += 1
+            return None
+
+        return self.get_by_number(number)
+
+    def get_latest(self):
+        if not self.enabled:
+            return None
+
+        if self.latest_block is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return self.latest_block
+
+    def get_latest_number(self):
+        if not self.enabled:
+            return None
+
+        if self.latest_number is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return self.latest_number
+
+    def get_latest_hash(self):
+        if not self.enabled:
+            return None
+
+        if self.latest_hash is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return self.latest_hash
+
+    def store(self, block: dict) -> CachedResponse:
+        block_hash = block.get('hash')
+        response = CachedResponse(body=encode(block).encode(), etag=block_etag(block_hash))
+
+        number = int(block.get('number'))
+
+        # the genesis block is served trimmed from WebServer.CACHED_GENESIS_BLOCK
+        if not self.enabled or number == 0:
+            return response
+
+        self.__remove(number)
+        self.blocks[number] = response
+        self.numbers[number] = block_hash
+        self.hashes[block_hash] = number
+
+        while len(self.blocks) > self.max_blocks:
+            self.__remove(next(iter(self.blocks)))
+
+        return response
+
+    def __remove(self, number: int):
+        self.blocks.pop(number, None)
+
+        block_hash = self.numbers.pop(number, None)
+        if block_hash is not None and self.hashes.get(block_hash) == number:
+            del self.hashes[block_hash]
+
+    def store_latest(self, block: dict) -> CachedResponse:
+        response = self.store(block)
+
+        if not self.enabled:
+            return response
+
+        number = int(block.get('number'))
+        if self.latest_height is not None and number < self.latest_height:
+            return response
+
+        self.latest_height = number
+        self.latest_block = response
+        self.latest_number = CachedResponse(
+            body=encode({'latest_block_number': number}).encode(), etag=response.etag
+        )
+        self.latest_hash = CachedResponse(
+            body=encode({'latest_block_hash': block.get('hash')}).encode(), etag=response.etag
+        )
+
+        return response
+
+    def new_block(self, block: dict):
+        if not self.enabled or not block or block.get('hash') is None or block.get('number') is None:
+            return
+
+        self.store_latest(block)
+
+    def block_reorg(self):
+        if not self.enabled:
+            return
+
+        # every block after the re-ordered one gets a new hash, so nothing we hold can be trusted
+        self.clear()
@@ -0,0 +1,89 @@
+import zlib
+
+DEFAULT_RANGE_LIMIT = 100
+MAX_RANGE_LIMIT = 1000
+STREAM_CHUNK_SIZE = 64 * 1024
+GZIP_WBITS = zlib.MAX_WBITS | 16
+
+
+class BlockStreamError(Exception):
+    pass
+
+
+def accepts_gzip(headers) -> bool:
+    accept_encoding = headers.get('Accept-Encoding') or ''
+    return 'gzip' in [encoding.split(';')[0].strip() for encoding in accept_encoding.split(',')]
+
+
+def parse_block_number(value, name: str, default=None):
+    if value is None:
+        return default
+
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise BlockStreamError(f'{name} must be a block number.')
+
+    if number < 0:
+        raise BlockStreamError(f'{name} must be a block number.')
+
+    return number
+
+
+def parse_range_args(args) -> tuple:
+    start = parse_block_number(args.get('start'), name='start', default=0)
+
+    limit = args.get('limit')
+    if limit is None:
+        return start, DEFAULT_RANGE_LIMIT
+
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise BlockStreamError(f'limit must be between 1 and {MAX_RANGE_LIMIT}.')
+
+    if limit < 1 or limit > MAX_RANGE_LIMIT:
+        raise BlockStreamError(f'limit must be between 1 and {MAX_RANGE_LIMIT}.')
+
+    return start, limit
+
+
+class BlockStreamWriter:
+    '''
+        Buffers encoded blocks and writes them to a Sanic StreamingHTTPResponse in chunks, gzip compressed if the
+        client accepts it. Only one chunk is held in memory at a time, so any number of blocks can be streamed.
+    '''
+    def __init__(self, response, compress: bool = False, chunk_size: int = STREAM_CHUNK_SIZE):
+        self.response = response
+        self.chunk_size = chunk_size
+        self.compressor = zlib.compressobj(wbits=GZIP_WBITS) if compress else None
+
+        self.buffer = []
+        self.buffered = 0
+
+    async def write(self, data: str):
+        self.buffer.append(data)
+        self.buffered += len(data)
+
+        if self.buffered >= self.chunk_size:
+            await self.flush()
+
+    async def flush(self):
+        if not self.buffer:
+            return
+
+        chunk = ''.join(self.buffer).encode()
+        self.buffer = []
+        self.buffered = 0
+
+        if self.compressor is not None:
+            chunk = self.compressor.compress(chunk)
+
+        if chunk:
+            await self.response.write(chunk)
+
+    async def close(self):
+        await self.flush()
+
+        if self.compressor is not None:
+            await self.response.write(self.compressor.flush())
@@ -0,0 +1,93 @@
+from collections import OrderedDict
+from contracting.compilation import parser
+from lamden.nodes.masternode.subscriptions import block_state, contract_from_key
+
+MAX_CACHED_CONTRACTS = 1000
+CODE_KEY_SUFFIX = '.__code__'
+
+
+class ContractMetadata:
+    def __init__(self, code: str):
+        self.code = code
+
+        self.__methods = None
+        self.__variables = None
+
+    @property
+    def methods(self) -> list:
+        if self.__methods is None:
+            self.__methods = parser.methods_for_contract(self.code)
+        return self.__methods
+
+    @property
+    def variables(self) -> dict:
+        if self.__variables is None:
+            self.__variables = parser.variables_for_contract(self.code)
+        return self.__variables
+
+
+class ContractMetadataCache:
+    '''
+        Holds the parsed methods and variables of contracts for the /methods and /variables routes.
+
+        Entries are keyed by contract name and checked against the code they were parsed from, so a changed
+        contract is always parsed again. Blocks that write a contract's __code__ drop its entry right away.
+    '''
+    def __init__(self, max_contracts: int = MAX_CACHED_CONTRACTS):
+        self.max_contracts = max_contracts
+        self.contracts = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.contracts)
+
+    def get(self, contract: str, code: str) -> ContractMetadata:
+        metadata = self.contracts.get(contract)
+
+        if metadata is not None and metadata.code == code:
+            self.contracts.move_to_end(contract)
+            self.hits += 1
+            return metadata
+
+        self.misses += 1
+
+        metadata = ContractMetadata(code=code)
+        self.contracts[contract] = metadata
+        self.contracts.move_to_end(contract)
+
+        while len(self.contracts) > self.max_contracts:
+            self.contracts.popitem(last=False)
+
+        return metadata
+
+    def get_methods(self, contract: str, code: str) -> list:
+        return self.get(contract=contract, code=code).methods
+
+    def get_variables(self, contract: str, code: str) -> dict:
+        return self.get(contract=contract, code=code).variables
+
+    def invalidate(self, contract: str):
+        self.contracts.pop(contract, None)
+
+    def invalidate_block(self, block: dict):
+        if not isinstance(block, dict):
+            return
+
+        for entry in block_state(block):
+            key = entry.get('key') if isinstance(entry, dict) else None
+            if isinstance(key, str) and key.endswith(CODE_KEY_SUFFIX):
+                self.invalidate(contract_from_key(key))
+
+    def clear(self):
+        self.contracts.clear()
+
+    def precompute(self, contracts: dict):
+        for contract, code in contracts.items():
+            if code is None:
+                continue
+
+            metadata = self.get(contract=contract, code=code)
+            metadata.methods
+            metadata.variables
@@ -0,0 +1,89 @@
+from contracting.db.driver import FSDriver, FILE_EXT
+from lamden.nodes.masternode.subscriptions import block_state
+import heapq
+import os
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+class KeyIndexError(Exception):
+    pass
+
+
+def block_writes(block: dict) -> list:
+    if not isinstance(block, dict):
+        return []
+
+    writes = list(block_state(block))
+    writes.extend(block.get('rewards') or [])
+
+    return [write for write in writes if isinstance(write, dict) and isinstance(write.get('key'), str)]
+
+
+def parse_page_size(limit) -> int:
+    if limit is None:
+        return DEFAULT_PAGE_SIZE
+
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise KeyIndexError(f'limit must be between 1 and {MAX_PAGE_SIZE}.')
+
+    if limit < 1 or limit > MAX_PAGE_SIZE:
+        raise KeyIndexError(f'limit must be between 1 and {MAX_PAGE_SIZE}.')
+
+    return limit
+
+
+class KeyIndex:
+    '''
+        Pages through the keys stored under a prefix (e.g. "currency.balances:") in key order, used to iterate a Hash.
+
+        Nothing is kept between requests. Every page streams the keys under the prefix and keeps only the limit + 1
+        smallest ones after start_after, so memory is bounded by the page size and not by the number of keys. For a
+        FSDriver the keys are read from the prefix's directory, other drivers are asked with iter(prefix=...).
+    '''
+    def __init__(self, driver):
+        self.driver = driver
+
+    def prefix_directory(self, prefix: str) -> str:
+        # FSDriver stores contract.variable:key as contract/variable/key.d
+        if not isinstance(self.driver, FSDriver):
+            return None
+
+        return os.path.join(self.driver.root, prefix.rstrip(':').replace(':', '/').replace('.', '/'))
+
+    def scan_directory(self, directory: str):
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        yield from self.scan_directory(entry.path)
+                    elif entry.name.endswith(FILE_EXT):
+                        yield self.driver.path_to_key(entry.path[len(self.driver.root):])
+        except (FileNotFoundError, NotADirectoryError):
+            return
+
+    def keys_under(self, prefix: str):
+        directory = self.prefix_directory(prefix)
+        keys = self.driver.iter(prefix=prefix) if directory is None else self.scan_directory(directory)
+
+        return (key for key in keys if key.startswith(prefix))
+
+    def page(self, prefix: str, start_after: str = None, limit: int = DEFAULT_PAGE_SIZE) -> tuple:
+        '''
+            Returns up to limit keys that sort after start_after, and the cursor for the next page (None if this is
+            the last page).
+        '''
+        keys = self.keys_under(prefix)
+        if start_after is not None:
+            keys = (key for key in keys if key > start_after)
+
+        # One key more than the page tells whether there is a next page
+        keys = heapq.nsmallest(limit + 1, keys)
+
+        page = keys[:limit]
+        next_cursor = page[-1] if len(keys) > limit else None
+
+        return page, next_cursor
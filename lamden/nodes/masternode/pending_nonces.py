@@ -0,0 +1,184 @@
+import time
+
+from lamden import storage
+
+MAX_RESERVATION = 1000
+RESERVATION_TTL = 60
+
+
+class Reservation:
+    def __init__(self, start: int, end: int, expires_at: float):
+        self.start = start
+        self.end = end
+        self.expires_at = expires_at
+
+        # nonce -> transaction accepted ahead of a nonce before it, queued once the nonces before it arrive
+        self.held = {}
+
+    def expired(self, now: float = None) -> bool:
+        return self.expires_at < (now if now is not None else time.time())
+
+
+class PendingNonces:
+    '''
+        Tracks nonces handed out by this masternode's webserver so high rate senders can pipeline transactions.
+
+        A sender can reserve a range of nonces in one request and sign all of them locally. Accepted nonces are kept
+        in the (memory backed) NonceStorage, so the nonce check in transaction_is_valid is a dict lookup.
+
+        Nonces of a reservation can arrive in any order. Each one is accepted once, and the stored nonce only moves
+        up over nonces without gaps. A transaction that arrives ahead of a nonce before it is held and handed back,
+        in nonce order, once the gap is filled, so the nodes see the sender's nonces increasing. When a reservation
+        expires whatever it still holds is handed back by prune. When a block from this processor is confirmed the
+        stored nonce is reconciled and finished reservations are dropped.
+    '''
+    def __init__(self, nonces: storage.NonceStorage, processor: str, max_reservation: int = MAX_RESERVATION,
+                 reservation_ttl: int = RESERVATION_TTL):
+        self.nonces = nonces
+        self.processor = processor
+        self.max_reservation = max_reservation
+        self.reservation_ttl = reservation_ttl
+
+        # sender -> Reservation
+        self.reservations = {}
+
+    def __len__(self):
+        return len(self.reservations)
+
+    def get_reservation(self, sender: str):
+        reservation = self.reservations.get(sender)
+        if reservation is None:
+            return None
+
+        # Expired reservations that still hold transactions are kept until prune hands them back
+        if reservation.expired() and len(reservation.held) == 0:
+            del self.reservations[sender]
+            return None
+
+        return reservation
+
+    def get_next_nonce(self, sender: str) -> int:
+        next_nonce = self.nonces.get_next_nonce(sender=sender, processor=self.processor)
+
+        reservation = self.get_reservation(sender=sender)
+        if reservation is not None and reservation.end >= next_nonce:
+            next_nonce = reservation.end + 1
+
+        return next_nonce
+
+    def reserve(self, sender: str, count: int = 1) -> tuple:
+        if not isinstance(count, int) or count < 1 or count > self.max_reservation:
+            raise ValueError(f'Reservation count must be between 1 and {self.max_reservation}.')
+
+        start = self.get_next_nonce(sender=sender)
+        end = start + count - 1
+        expires_at = time.time() + self.reservation_ttl
+
+        # A second reservation extends the first so what it already accepted is kept
+        reservation = self.get_reservation(sender=sender)
+        if reservation is None:
+            self.reservations[sender] = Reservation(start=start, end=end, expires_at=expires_at)
+        else:
+            reservation.end = end
+            reservation.expires_at = expires_at
+
+        return start, end
+
+    def check(self, sender: str, nonce: int) -> bool:
+        # Whether a nonce can still be accepted from the sender
+        current_nonce = self.nonces.get_nonce(sender=sender, processor=self.processor)
+        if current_nonce is not None and nonce <= current_nonce:
+            return False
+
+        reservation = self.get_reservation(sender=sender)
+        return reservation is None or nonce not in reservation.held
+
+    def accept(self, sender: str, nonce: int, tx: dict = None) -> list:
+        '''
+            Records a nonce that check has allowed and returns the transactions that can be queued now, in nonce
+            order. That is tx itself unless it is ahead of a reserved nonce that has not arrived yet.
+        '''
+        reservation = self.get_reservation(sender=sender)
+
+        if reservation is not None and reservation.start <= nonce <= reservation.end:
+            reservation.held[nonce] = tx
+            return self.release(sender=sender, reservation=reservation)
+
+        # Outside a reservation nonces only have to go up, a sender moving past its reservation gives up on the gaps
+        ready = []
+        if reservation is not None and nonce > reservation.end:
+            ready = [reservation.held[held] for held in sorted(reservation.held)]
+            del self.reservations[sender]
+
+        current_nonce = self.nonces.get_nonce(sender=sender, processor=self.processor)
+        if current_nonce is None or nonce > current_nonce:
+            self.nonces.set_nonce(sender=sender, processor=self.processor, value=nonce)
+
+        ready.append(tx)
+
+        return [tx for tx in ready if tx is not None]
+
+    def release(self, sender: str, reservation: Reservation) -> list:
+        current_nonce = self.nonces.get_nonce(sender=sender, processor=self.processor)
+        expected = reservation.start if current_nonce is None else max(reservation.start, current_nonce + 1)
+
+        ready = []
+        while expected in reservation.held:
+            ready.append(reservation.held.pop(expected))
+            expected += 1
+
+        if len(ready) > 0:
+            self.nonces.set_nonce(sender=sender, processor=self.processor, value=expected - 1)
+
+        if expected > reservation.end and len(reservation.held) == 0:
+            del self.reservations[sender]
+
+        return [tx for tx in ready if tx is not None]
+
+    def confirm_block(self, block: dict) -> list:
+        try:
+            payload = block['processed']['transaction']['payload']
+        except (KeyError, TypeError):
+            return []
+
+        if payload.get('processor') != self.processor:
+            return []
+
+        sender = payload['sender']
+        nonce = payload['nonce']
+
+        current_nonce = self.nonces.get_nonce(sender=sender, processor=self.processor)
+        if current_nonce is None or nonce > current_nonce:
+            self.nonces.set_nonce(sender=sender, processor=self.processor, value=nonce)
+
+        reservation = self.get_reservation(sender=sender)
+        if reservation is None:
+            return []
+
+        # Held transactions the network has moved past can not be processed anymore
+        for held in [held for held in reservation.held if held <= nonce]:
+            del reservation.held[held]
+
+        return self.release(sender=sender, reservation=reservation)
+
+    def prune(self) -> list:
+        '''
+            Drops expired reservations and returns what they still hold, in nonce order. The nodes accept nonces with
+            gaps as long as they go up.
+        '''
+        now = time.time()
+        ready = []
+
+        for sender, reservation in list(self.reservations.items()):
+            if not reservation.expired(now):
+                continue
+
+            del self.reservations[sender]
+
+            if len(reservation.held) == 0:
+                continue
+
+            self.nonces.set_nonce(sender=sender, processor=self.processor, value=max(reservation.held))
+            ready.extend(reservation.held[nonce] for nonce in sorted(reservation.held))
+
+        return [tx for tx in ready if tx is not None]
@@ -0,0 +1,173 @@
+from collections import OrderedDict
+from contracting.stdlib.bridge.decimal import ContractingDecimal
+from lamden.nodes.masternode.key_index import block_writes
+from lamden.storage import LATEST_BLOCK_HASH_KEY, LATEST_BLOCK_HEIGHT_KEY, get_state_version
+
+MAX_STATE_READS = 1000
+SNAPSHOT_ATTEMPTS = 5
+SNAPSHOT_RETRY_DELAY = 0.01
+MAX_CACHED_KEYS = 10_000
+CODE_KEY = '__code__'
+
+# Cached marker for keys that are not set, so missing keys are cached too
+MISSING = object()
+
+
+class StateReadError(Exception):
+    pass
+
+
+class StateChangedError(StateReadError):
+    pass
+
+
+def height_from_value(value) -> int:
+    if value is None:
+        return -1
+
+    if type(value) == ContractingDecimal:
+        value = value._d
+
+    return int(value)
+
+
+def keys_from_reads(reads, make_key) -> list:
+    '''
+        Turns a list of (contract, variable, keys) reads into driver keys. keys is a list where every entry is a
+        single key or a list of keys for a multi-hash. A read without keys returns the Variable itself.
+    '''
+    if not isinstance(reads, list) or len(reads) == 0:
+        raise StateReadError('Request body must be a list of (contract, variable, keys) reads.')
+
+    driver_keys = []
+
+    for read in reads:
+        if isinstance(read, dict):
+            contract, variable, keys = read.get('contract'), read.get('variable'), read.get('keys')
+        elif isinstance(read, list) and len(read) in (2, 3):
+            contract, variable, keys = (read + [None])[:3]
+        else:
+            raise StateReadError('Every read must be (contract, variable, keys).')
+
+        if not isinstance(contract, str) or not isinstance(variable, str):
+            raise StateReadError('contract and variable must be strings.')
+
+        if keys is None or keys == []:
+            driver_keys.append(make_key(contract=contract, variable=variable, args=None))
+            continue
+
+        if not isinstance(keys, list):
+            raise StateReadError('keys must be a list.')
+
+        for key in keys:
+            args = key if isinstance(key, list) else [key]
+            driver_keys.append(make_key(contract=contract, variable=variable, args=args))
+
+    if len(driver_keys) > MAX_STATE_READS:
+        raise StateReadError(f'A request can read at most {MAX_STATE_READS} keys.')
+
+    return driver_keys
+
+
+def read_snapshot(driver, keys: list, attempts: int = SNAPSHOT_ATTEMPTS) -> tuple:
+    '''
+        Reads all keys straight from the storage driver and returns them with the block height they were read at.
+
+        The node bumps the state version before and after it writes a block (see storage.state_write). The version
+        is read before and after the keys, and the keys are read again if it was odd or changed in between, so all
+        returned values belong to the same block.
+    '''
+    for _ in range(attempts):
+        version = get_state_version(driver)
+        if version % 2 == 1:
+            continue
+
+        height = height_from_value(driver.get(LATEST_BLOCK_HEIGHT_KEY))
+        values = {key: driver.get(key) for key in keys}
+
+        if get_state_version(driver) == version:
+            return height, values
+
+    raise StateChangedError('State changed while it was being read. Try again.')
+
+
+def make_key(contract: str, variable: str, args: list = None) -> str:
+    key = '.'.join((contract, variable))
+    if args:
+        return ':'.join((key, *[str(arg) for arg in args]))
+    return key
+
+
+class StateReader:
+    '''
+        Read-only access to the state for the webserver, with its own bounded LRU cache of values.
+
+        Values only change when a block is hard applied, so while the webserver receives block events (live is True)
+        cached values are kept until a new block writes their key in its state or rewards. The latest block hash
+        and height are dropped on every new block and everything is dropped on a reorg. Without block events
+        nothing is cached and every read goes to the storage driver.
+    '''
+    def __init__(self, driver, max_keys: int = MAX_CACHED_KEYS):
+        self.driver = driver
+        self.max_keys = max_keys
+        self.live = False
+
+        self.cache = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.cache)
+
+    def set_live(self, live: bool):
+        self.live = live
+        self.clear()
+
+    def clear(self):
+        self.cache.clear()
+
+    def get(self, key: str):
+        if not self.live:
+            return self.driver.get(key)
+
+        value = self.cache.get(key)
+        if value is not None:
+            self.cache.move_to_end(key)
+            self.hits += 1
+            return None if value is MISSING else value
+
+        self.misses += 1
+
+        value = self.driver.get(key)
+
+        self.cache[key] = MISSING if value is None else value
+        if len(self.cache) > self.max_keys:
+            self.cache.popitem(last=False)
+
+        return value
+
+    def get_var(self, contract: str, variable: str, arguments: list = None):
+        return self.get(make_key(contract=contract, variable=variable, args=arguments))
+
+    def get_contract(self, name: str):
+        return self.get_var(contract=name, variable=CODE_KEY)
+
+    def get_latest_block_height(self) -> int:
+        return height_from_value(self.get(LATEST_BLOCK_HEIGHT_KEY))
+
+    def get_latest_block_hash(self) -> str:
+        latest_hash = self.get(LATEST_BLOCK_HASH_KEY)
+        if latest_hash is None:
+            return '0' * 64
+        return latest_hash
+
+    def update_block(self, block: dict):
+        if not self.live:
+            return
+
+        self.cache.pop(LATEST_BLOCK_HASH_KEY, None)
+        self.cache.pop(LATEST_BLOCK_HEIGHT_KEY, None)
+
+        for write in block_writes(block):
+            self.cache.pop(write['key'], None)
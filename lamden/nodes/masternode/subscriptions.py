@@ -0,0 +1,272 @@
+'''
+Server side filtering for the webserver websocket.
+
+Clients that never subscribe keep receiving every event. A client can narrow its feed by sending:
+
+{
+    "action": "subscribe",
+    "filters": {
+        "contract": "currency",
+        "function": "transfer",
+        "sender": "<vk>",
+        "key_prefix": "currency.balances:<vk>"
+    },
+    "trim": true
+}
+
+All supplied filters must match for a block to be delivered. "trim" drops proofs, signatures, rewards and
+any state entries outside of "key_prefix" from the delivered block.
+
+Every subscription is indexed under its most selective filter so an incoming block is only checked against the
+subscriptions that could possibly match it.
+'''
+import json
+
+from contracting.db.encoder import encode
+
+FILTER_KEYS = ('contract', 'function', 'sender', 'key_prefix')
+
+SUBSCRIBE_ACTION = 'subscribe'
+UNSUBSCRIBE_ACTION = 'unsubscribe'
+
+SUBSCRIBED_EVENT = 'subscribed'
+UNSUBSCRIBED_EVENT = 'unsubscribed'
+ERROR_EVENT = 'error'
+
+BLOCK_KEEP_KEYS = ('hash', 'number', 'hlc_timestamp', 'previous')
+PROCESSED_KEEP_KEYS = ('hash', 'result', 'stamps_used', 'status')
+
+
+class SubscriptionError(Exception):
+    pass
+
+
+def contract_from_key(key: str) -> str:
+    return key.split('.', 1)[0]
+
+
+def block_payload(block: dict) -> dict:
+    processed = block.get('processed')
+    if not isinstance(processed, dict):
+        return {}
+
+    transaction = processed.get('transaction') or {}
+    return transaction.get('payload') or {}
+
+
+def block_state(block: dict) -> list:
+    if block.get('genesis') is not None:
+        return block.get('genesis') or []
+
+    processed = block.get('processed')
+    if not isinstance(processed, dict):
+        return []
+
+    return processed.get('state') or []
+
+
+def is_block_event(data) -> bool:
+    return isinstance(data, dict) and (isinstance(data.get('processed'), dict) or data.get('genesis') is not None)
+
+
+class Subscription:
+    def __init__(self, contract: str = None, function: str = None, sender: str = None, key_prefix: str = None,
+                 trim: bool = False):
+        self.contract = contract
+        self.function = function
+        self.sender = sender
+        self.key_prefix = key_prefix
+        self.trim = trim
+
+    @classmethod
+    def from_message(cls, message: dict):
+        filters = message.get('filters') or {}
+
+        if not isinstance(filters, dict):
+            raise SubscriptionError('Filters must be an object.')
+
+        for key, value in filters.items():
+            if key not in FILTER_KEYS:
+                raise SubscriptionError(f'Unknown filter "{key}".')
+            if value is not None and not isinstance(value, str):
+                raise SubscriptionError(f'Filter "{key}" must be a string.')
+
+        if all(filters.get(key) is None for key in FILTER_KEYS):
+            raise SubscriptionError('At least one filter must be provided.')
+
+        return cls(trim=bool(message.get('trim', False)), **filters)
+
+    @property
+    def filters(self) -> dict:
+        return {key: getattr(self, key) for key in FILTER_KEYS if getattr(self, key) is not None}
+
+    def matches(self, payload: dict, state: list) -> bool:
+        if self.contract is not None and payload.get('contract') != self.contract:
+            return False
+
+        if self.function is not None and payload.get('function') != self.function:
+            return False
+
+        if self.sender is not None and payload.get('sender') != self.sender:
+            return False
+
+        if self.key_prefix is not None:
+            return any(entry.get('key', '').startswith(self.key_prefix) for entry in state)
+
+        return True
+
+    def trim_block(self, block: dict) -> dict:
+        trimmed = {key: block.get(key) for key in BLOCK_KEEP_KEYS if key in block}
+
+        state = block_state(block)
+        if self.key_prefix is not None:
+            state = [entry for entry in state if entry.get('key', '').startswith(self.key_prefix)]
+
+        if block.get('genesis') is not None:
+            trimmed['genesis'] = state
+            return trimmed
+
+        processed = block.get('processed')
+        trimmed_processed = {key: processed.get(key) for key in PROCESSED_KEEP_KEYS if key in processed}
+        trimmed_processed['state'] = state
+        trimmed_processed['transaction'] = {'payload': block_payload(block)}
+        trimmed['processed'] = trimmed_processed
+
+        return trimmed
+
+
+class SubscriptionIndex:
+    def __init__(self):
+        self.subscriptions = {}
+
+        self.by_sender = {}
+        self.by_contract = {}
+        self.by_function = {}
+        self.by_key_contract = {}
+
+        # key prefixes that do not name a full contract can't be bucketed, these are scanned on every block
+        self.prefix_scan = set()
+
+    def __len__(self):
+        return len(self.subscriptions)
+
+    def __index_for(self, subscription: Subscription):
+        if subscription.sender is not None:
+            return self.by_sender, subscription.sender
+        if subscription.contract is not None:
+            return self.by_contract, subscription.contract
+        if subscription.function is not None:
+            return self.by_function, subscription.function
+        if '.' in subscription.key_prefix:
+            return self.by_key_contract, contract_from_key(subscription.key_prefix)
+        return None, None
+
+    def subscribe(self, client, subscription: Subscription):
+        self.unsubscribe(client)
+
+        index, key = self.__index_for(subscription)
+        if index is None:
+            self.prefix_scan.add(client)
+        else:
+            index.setdefault(key, set()).add(client)
+
+        self.subscriptions[client] = subscription
+
+    def unsubscribe(self, client):
+        subscription = self.subscriptions.pop(client, None)
+        if subscription is None:
+            return
+
+        index, key = self.__index_for(subscription)
+        if index is None:
+            self.prefix_scan.discard(client)
+            return
+
+        clients = index.get(key)
+        if clients is not None:
+            clients.discard(client)
+            if len(clients) == 0:
+                del index[key]
+
+    def is_subscribed(self, client) -> bool:
+        return client in self.subscriptions
+
+    def matching_clients(self, block: dict) -> set:
+        payload = block_payload(block)
+        state = block_state(block)
+
+        candidates = set(self.prefix_scan)
+
+        for index, key in ((self.by_sender, payload.get('sender')),
+                           (self.by_contract, payload.get('contract')),
+                           (self.by_function, payload.get('function'))):
+            if key is not None:
+                candidates.update(index.get(key, ()))
+
+        if len(self.by_key_contract) > 0:
+            for contract in {contract_from_key(entry.get('key', '')) for entry in state}:
+                candidates.update(self.by_key_contract.get(contract, ()))
+
+        return {client for client in candidates if self.subscriptions[client].matches(payload, state)}
+
+    def messages_for_event(self, event: dict, clients) -> list:
+        '''
+            Returns a list of (client, encoded message) for every client that should receive this event. Each
+            distinct message body is only encoded once.
+        '''
+        data = event.get('data')
+
+        full_message = None
+        filtered = len(self.subscriptions) > 0 and is_block_event(data)
+        matched = self.matching_clients(data) if filtered else set()
+        trimmed_messages = {}
+
+        messages = []
+        for client in clients:
+            subscription = self.subscriptions.get(client) if filtered else None
+
+            if subscription is not None and client not in matched:
+                continue
+
+            if subscription is not None and subscription.trim:
+                message = trimmed_messages.get(subscription.key_prefix)
+                if message is None:
+                    message = encode({'event': event.get('event'), 'data': subscription.trim_block(data)})
+                    trimmed_messages[subscription.key_prefix] = message
+            else:
+                if full_message is None:
+                    full_message = encode(event)
+                message = full_message
+
+            messages.append((client, message))
+
+        return messages
+
+    def handle_message(self, client, raw_message) -> dict:
+        '''
+            Applies a subscribe / unsubscribe request from a client and returns the acknowledgement to send back.
+        '''
+        try:
+            message = json.loads(raw_message)
+        except (TypeError, ValueError):
+            return {'event': ERROR_EVENT, 'data': {'error': 'Malformed message.'}}
+
+        if not isinstance(message, dict):
+            return {'event': ERROR_EVENT, 'data': {'error': 'Malformed message.'}}
+
+        action = message.get('action')
+
+        if action == SUBSCRIBE_ACTION:
+            try:
+                subscription = Subscription.from_message(message)
+            except SubscriptionError as err:
+                return {'event': ERROR_EVENT, 'data': {'error': str(err)}}
+
+            self.subscribe(client, subscription)
+            return {'event': SUBSCRIBED_EVENT, 'data': {'filters': subscription.filters, 'trim': subscription.trim}}
+
+        if action == UNSUBSCRIBE_ACTION:
+            self.unsubscribe(client)
+            return {'event': UNSUBSCRIBED_EVENT, 'data': {}}
+
+        return {'event': ERROR_EVENT, 'data': {'error': f'Unknown action "{action}".'}}
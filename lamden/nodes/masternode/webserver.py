@@ -1,18 +1,27 @@
 from sanic import Sanic
 from sanic import response
+from sanic.websocket import WebSocketProtocol
 from lamden.logger.base import get_logger
 import json as _json
 from contracting.client import ContractingClient
 from contracting.db.encoder import encode, decode
 from contracting.db.driver import ContractDriver
-from contracting.compilation import parser
-from lamden import storage
+from lamden import storage, metrics
 from lamden.crypto.canonical import tx_hash_from_tx
 from lamden.crypto.transaction import TransactionException
 from lamden.crypto.wallet import Wallet
 
 from contracting.stdlib.bridge.decimal import ContractingDecimal
 from lamden.nodes.base import FileQueue
+from lamden.nodes.masternode.subscriptions import SubscriptionIndex
+from lamden.nodes.masternode.pending_nonces import PendingNonces
+from lamden.nodes.masternode.block_cache import BlockResponseCache
+from lamden.nodes.masternode.contract_cache import ContractMetadataCache
+from lamden.nodes.masternode.key_index import KeyIndex, KeyIndexError, parse_page_size
+from lamden.nodes.masternode.state_reader import StateReader, StateReadError, StateChangedError, keys_from_reads, \
+    read_snapshot, SNAPSHOT_ATTEMPTS, SNAPSHOT_RETRY_DELAY
+from lamden.nodes.masternode.block_stream import BlockStreamWriter, BlockStreamError, accepts_gzip, \
+    parse_block_number, parse_range_args
 
 import ssl
 import asyncio
@@ -28,6 +37,31 @@ import os
 
 log = get_logger("MN-WebServer")
 
+MAX_TX_SIZE = 32_000
+MAX_BATCH_SIZE = 100
+
+
+class SizeLimitedHttpProtocol(WebSocketProtocol):
+    '''
+        REQUEST_MAX_SIZE is set to the size of the largest batch. Requests to any other path are limited to
+        MAX_TX_SIZE, so a larger Content-Length is answered with 413 before the body is read.
+    '''
+    LARGE_BODY_PATHS = (b'/batch', )
+
+    def on_header(self, name, value):
+        if self.url is not None:
+            large = self.url.split(b'?', 1)[0] in self.LARGE_BODY_PATHS
+            self.request_max_size = self.app.config.REQUEST_MAX_SIZE if large else MAX_TX_SIZE
+
+        super().on_header(name, value)
+
+TX_SUBMISSIONS = metrics.counter('lamden_webserver_tx_submissions_total',
+                                 'Transactions submitted to the webserver, by whether they were queued.', ('result', ))
+TXS_ACCEPTED = TX_SUBMISSIONS.labels('accepted')
+TXS_REJECTED = TX_SUBMISSIONS.labels('rejected')
+CACHE_LOOKUPS = metrics.counter('lamden_webserver_cache_lookups_total', 'Lookups of the webserver caches.',
+                                ('cache', 'result'))
+
 class NonceEncoder(_json.JSONEncoder):
     def default(self, o, *args, **kwargs):
         if isinstance(o, dict):
@@ -60,28 +94,37 @@ class WebServer:
                  workers=2, debug=True, access_log=False,
                  max_queue_len=10_000,
                  event_service_port=8000,
-                 topics=[]):
+                 topics=[],
+                 nonce_commit_interval=1,
+                 precompute_contracts=False):
 
         # Setup base Sanic class and CORS
         self.app = Sanic(__name__)
         self.app.config.update({
-            'REQUEST_MAX_SIZE': 32_000,
+            'REQUEST_MAX_SIZE': MAX_TX_SIZE * MAX_BATCH_SIZE,
             'REQUEST_TIMEOUT': 10,
             'KEEP_ALIVE': False,
         })
         self.cors = None
 
         self.CACHED_GENESIS_BLOCK = None
+        self.block_cache = BlockResponseCache()
+        self.contract_cache = ContractMetadataCache()
+        self.precompute_contracts = precompute_contracts
 
         # Initialize the backend data interfaces
         self.client = contracting_client
         self.driver = driver
-        self.nonces = nonces if nonces is not None else storage.NonceStorage()
+        self.nonces = nonces if nonces is not None else storage.NonceStorage(write_back=True)
+        self.nonce_commit_interval = nonce_commit_interval
         self.blocks = blocks
+        self.key_index = KeyIndex(driver=self.client.raw_driver.driver)
+        self.state_reader = StateReader(driver=self.client.raw_driver.driver)
 
         self.static_headers = {}
 
         self.wallet = wallet
+        self.pending_nonces = PendingNonces(nonces=self.nonces, processor=self.wallet.verifying_key)
         self.queue = queue if queue is not None else FileQueue()
         self.max_queue_len = max_queue_len
 
@@ -103,9 +146,11 @@ class WebServer:
 
         # Add Routes
         self.app.add_route(self.submit_transaction, '/', methods=['POST', 'OPTIONS'])
+        self.app.add_route(self.submit_transactions, '/batch', methods=['POST', 'OPTIONS'])
         self.app.add_route(self.ping, '/ping', methods=['GET', 'OPTIONS'])
         self.app.add_route(self.get_id, '/id', methods=['GET'])
         self.app.add_route(self.get_nonce, '/nonce/<vk>', methods=['GET'])
+        self.app.add_route(self.reserve_nonces, '/nonce/<vk>/reserve', methods=['POST', 'OPTIONS'])
 
         # State Routes
         self.app.add_route(self.get_methods, '/contracts/<contract>/methods', methods=['GET'])
@@ -114,7 +159,8 @@ class WebServer:
         self.app.add_route(self.get_contracts, '/contracts', methods=['GET'])
         self.app.add_route(self.get_contract, '/contracts/<contract>', methods=['GET'])
         self.app.add_route(self.get_constitution, '/constitution', methods=['GET'])
-        # self.app.add_route(self.iterate_variable, '/contracts/<contract>/<variable>/iterate')
+        self.app.add_route(self.read_state, '/state', methods=['POST', 'OPTIONS'])
+        self.app.add_route(self.iterate_variable, '/contracts/<contract>/<variable>/iterate', methods=['GET'])
 
         # Latest Block Routes
         self.app.add_route(self.get_latest_block, '/latest_block', methods=['GET', 'OPTIONS', ])
@@ -123,10 +169,15 @@ class WebServer:
 
         # General Block Route
         self.app.add_route(self.get_block, '/blocks', methods=['GET'])
+        self.app.add_route(self.get_block_range, '/blocks/range', methods=['GET'])
+        self.app.add_route(self.export_blocks, '/blocks/export', methods=['GET'])
 
         # TX Route
         self.app.add_route(self.get_tx, '/tx', methods=['GET'])
 
+        self.app.add_route(self.get_metrics, '/metrics', methods=['GET'])
+        CACHE_LOOKUPS.set_function(self.cache_lookups)
+
         self.coroutine = None
 
         self.topics = topics
@@ -137,18 +188,23 @@ class WebServer:
         self.__register_app_listeners()
 
         self.ws_clients = set()
+        self.subscriptions = SubscriptionIndex()
         self.app.add_websocket_route(self.ws_handler, '/')
     
     def __setup_sio_event_handlers(self):
         @self.sio.event
         async def connect():
             log.debug("CONNECTED TO EVENT SERVER")
+            self.block_cache.enable()
+            self.state_reader.set_live(True)
             for topic in self.topics:
                 await self.sio.emit('join', {'room': topic})
 
         @self.sio.event
         async def disconnect():
             log.debug("DISCONNECTED FROM EVENT SERVER")
+            self.block_cache.disable()
+            self.state_reader.set_live(False)
             for topic in self.topics:
                 await self.sio.emit('leave', {'room': topic})
 
@@ -158,10 +214,32 @@ class WebServer:
 
         @self.sio.event
         async def event(data):
-            for client in self.ws_clients:
-                await client.send(encode(data))
+            if data.get('event') == 'new_block':
+                self.queue.extend(self.pending_nonces.confirm_block(data.get('data') or {}))
+                self.block_cache.new_block(data.get('data'))
+                self.contract_cache.invalidate_block(data.get('data'))
+                self.state_reader.update_block(data.get('data'))
+            elif data.get('event') == 'block_reorg':
+                self.block_cache.block_reorg()
+                self.contract_cache.clear()
+                self.state_reader.clear()
+
+            for client, message in self.subscriptions.messages_for_event(event=data, clients=list(self.ws_clients)):
+                try:
+                    await client.send(message)
+                except Exception as err:
+                    log.error(err)
 
     def __register_app_listeners(self):
+        @self.app.listener('after_server_start')
+        async def start_committing_nonces(app, loop):
+            loop.create_task(self.commit_nonces_periodically())
+
+        @self.app.listener('after_server_start')
+        async def start_precomputing_contracts(app, loop):
+            if self.precompute_contracts:
+                loop.create_task(self.precompute_contract_metadata())
+
         @self.app.listener('after_server_start')
         async def connect_to_event_service(app, loop):
             try:
@@ -170,14 +248,39 @@ class WebServer:
             except:
                 pass
 
+        @self.app.listener('before_server_stop')
+        async def commit_nonces(app, loop):
+            self.nonces.commit()
+
+    async def precompute_contract_metadata(self):
+        self.client.raw_driver.clear_pending_state()
+
+        for contract in self.client.get_contracts():
+            try:
+                self.contract_cache.precompute({contract: self.state_reader.get_contract(contract)})
+            except Exception as err:
+                log.error(f'Could not parse contract {contract}: {err}')
+
+            # Give requests a chance to run between contracts
+            await asyncio.sleep(0)
+
+        log.info(f'Precomputed metadata for {len(self.contract_cache)} contracts.')
+
+    async def commit_nonces_periodically(self):
+        while True:
+            await asyncio.sleep(self.nonce_commit_interval)
+            try:
+                self.nonces.commit()
+                self.queue.extend(self.pending_nonces.prune())
+            except Exception as err:
+                log.error(err)
+
     async def ws_handler(self, request, ws):
         self.ws_clients.add(ws)
 
         try:
-            self.driver.clear_pending_state()
-
             # send the connecting socket the latest block
-            num = storage.get_latest_block_height(self.driver)
+            num = self.state_reader.get_latest_block_height()
 
             if int(num) == 0 and self.CACHED_GENESIS_BLOCK is not None:
                 block = self.CACHED_GENESIS_BLOCK
@@ -197,9 +300,10 @@ class WebServer:
                 log.error(err)
 
             async for message in ws:
-                pass
+                await ws.send(encode(self.subscriptions.handle_message(client=ws, raw_message=message)))
         finally:
             self.ws_clients.remove(ws)
+            self.subscriptions.unsubscribe(ws)
 
     async def start(self):
         # Start server with SSL enabled or not
@@ -211,6 +315,7 @@ class WebServer:
                     debug=self.debug,
                     access_log=self.access_log,
                     ssl=self.context,
+                    protocol=SizeLimitedHttpProtocol,
                     return_asyncio_server=True
                 )
             )
@@ -221,6 +326,7 @@ class WebServer:
                     port=self.port,
                     debug=self.debug,
                     access_log=self.access_log,
+                    protocol=SizeLimitedHttpProtocol,
                     return_asyncio_server=True
                 )
             )
@@ -240,39 +346,46 @@ class WebServer:
             return response.json({'error': "Queue full. Resubmit shortly."}, status=503,
                                  headers={'Access-Control-Allow-Origin': '*'})
 
+        # Servers started without SizeLimitedHttpProtocol allow every route the batch size
+        if len(request.body) > MAX_TX_SIZE:
+            return response.json({'error': 'Request body too large.'}, status=413,
+                                 headers={'Access-Control-Allow-Origin': '*'})
+
         # Check that the payload is valid JSON
         tx = decode(request.body)
         if tx is None:
             return response.json({'error': 'Malformed request body.'}, headers={'Access-Control-Allow-Origin': '*'})
 
-        tx_raw = _json.loads(request.body)
-        log.error(tx_raw)
-
         # Check that the TX is correctly formatted
         try:
             transaction.transaction_is_valid(
                 transaction=tx,
                 expected_processor=self.wallet.verifying_key,
                 client=self.client,
-                nonces=self.nonces
+                nonces=self.nonces,
+                pending_nonces=self.pending_nonces
+            )
+
+            ready = self.pending_nonces.accept(
+                sender=tx['payload']['sender'],
+                nonce=tx['payload']['nonce'],
+                tx=tx
             )
 
         except TransactionException as e:
             log.error(f'Tx has error: {type(e)}')
             log.error(tx)
+            TXS_REJECTED.inc()
             return response.json(
                 transaction.EXCEPTION_MAP[type(e)], headers={'Access-Control-Allow-Origin': '*'}
             )
 
-        self.nonces.set_nonce(
-            sender=tx['payload']['sender'],
-            processor=tx['payload']['processor'],
-            value=tx['payload']['nonce']
-        )
-
-        # Add TX to the processing queue
-        self.queue.append(request.body)
-        log.error('Added to q')
+        # Add TX to the processing queue, with any reserved ones it was holding back
+        if ready == [tx]:
+            self.queue.append(request.body)
+        else:
+            self.queue.extend(ready)
+        TXS_ACCEPTED.inc()
 
         # Return the TX hash to the user so they can track it
         tx_hash = tx_hash_from_tx(tx)
@@ -282,6 +395,95 @@ class WebServer:
             'hash': tx_hash
         }, headers={'Access-Control-Allow-Origin': '*'})
 
+    # Submit many TXs in one request. Each TX gets its own result, valid ones are queued even if others fail.
+    async def submit_transactions(self, request):
+        if request.method == "OPTIONS":
+            return response.text("", headers={
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Headers': "origin, content-type"
+            })
+
+        if len(self.queue) >= self.max_queue_len:
+            return response.json({'error': "Queue full. Resubmit shortly."}, status=503,
+                                 headers={'Access-Control-Allow-Origin': '*'})
+
+        txs = decode(request.body)
+        if not isinstance(txs, list) or len(txs) == 0:
+            return response.json({'error': 'Request body must be a list of transactions.'}, status=400,
+                                 headers={'Access-Control-Allow-Origin': '*'})
+
+        if len(txs) > MAX_BATCH_SIZE:
+            return response.json({'error': f'A batch can have at most {MAX_BATCH_SIZE} transactions.'}, status=400,
+                                 headers={'Access-Control-Allow-Origin': '*'})
+
+        if len(self.queue) + len(txs) > self.max_queue_len:
+            return response.json({'error': "Queue full. Resubmit shortly."}, status=503,
+                                 headers={'Access-Control-Allow-Origin': '*'})
+
+        results = []
+        accepted = 0
+        queued = []
+
+        # Balances and the stamp rate are only read once per batch
+        state_cache = {}
+
+        for tx in txs:
+            try:
+                if not isinstance(tx, dict):
+                    raise transaction.TransactionFormattingError
+
+                transaction.transaction_is_valid(
+                    transaction=tx,
+                    expected_processor=self.wallet.verifying_key,
+                    client=self.client,
+                    nonces=self.nonces,
+                    state_cache=state_cache,
+                    pending_nonces=self.pending_nonces
+                )
+
+                ready = self.pending_nonces.accept(
+                    sender=tx['payload']['sender'],
+                    nonce=tx['payload']['nonce'],
+                    tx=tx
+                )
+
+            except TransactionException as e:
+                log.error(f'Tx has error: {type(e)}')
+                results.append(transaction.EXCEPTION_MAP[type(e)])
+                continue
+
+            accepted += 1
+            queued.extend(ready)
+            results.append({
+                'success': 'Transaction successfully submitted to the network.',
+                'hash': tx_hash_from_tx(tx)
+            })
+
+        self.queue.extend(queued)
+
+        TXS_ACCEPTED.inc(accepted)
+        TXS_REJECTED.inc(len(txs) - accepted)
+
+        return response.json({
+            'results': results,
+            'accepted': accepted,
+            'rejected': len(txs) - accepted
+        }, headers={'Access-Control-Allow-Origin': '*'})
+
+    # Prometheus metrics of this process
+    async def get_metrics(self, request):
+        return response.text(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+    def cache_lookups(self) -> dict:
+        return {
+            ('blocks', 'hit'): self.block_cache.hits,
+            ('blocks', 'miss'): self.block_cache.misses,
+            ('contracts', 'hit'): self.contract_cache.hits,
+            ('contracts', 'miss'): self.contract_cache.misses,
+            ('state', 'hit'): self.state_reader.hits,
+            ('state', 'miss'): self.state_reader.misses
+        }
+
     # Network Status
     async def ping(self, request):
         return response.json({'status': 'online'}, headers={'Access-Control-Allow-Origin': '*'})
@@ -292,7 +494,7 @@ class WebServer:
 
     # Get the Nonce of a VK
     async def get_nonce(self, request, vk):
-        next_nonce = self.nonces.get_next_nonce(sender=vk, processor=self.wallet.verifying_key)
+        next_nonce = self.pending_nonces.get_next_nonce(sender=vk)
 
         try:
             next_nonce = int(next_nonce)
@@ -305,6 +507,30 @@ class WebServer:
             'sender': vk
         }, headers={'Access-Control-Allow-Origin': '*'})
 
+    # Reserve a range of Nonces for a VK so it can sign many transactions without asking for each nonce
+    async def reserve_nonces(self, request, vk):
+        if request.method == "OPTIONS":
+            return response.text("", headers={
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Headers': "origin, content-type"
+            })
+
+        try:
+            start, end = self.pending_nonces.reserve(sender=vk, count=int(request.args.get('count', 1)))
+        except (TypeError, ValueError):
+            return response.json(
+                {'error': f'Count must be a number between 1 and {self.pending_nonces.max_reservation}.'},
+                status=400, headers={'Access-Control-Allow-Origin': '*'}
+            )
+
+        return response.json({
+            'start': start,
+            'end': end,
+            'expires_in': self.pending_nonces.reservation_ttl,
+            'processor': self.wallet.verifying_key,
+            'sender': vk
+        }, headers={'Access-Control-Allow-Origin': '*'})
+
     # Get all Contracts in State (list of names)
     async def get_contracts(self, request):
         self.client.raw_driver.clear_pending_state()
@@ -314,9 +540,7 @@ class WebServer:
 
     # Get the source code of a specific contract
     async def get_contract(self, request, contract):
-        self.client.raw_driver.clear_pending_state()
-
-        contract_code = self.client.raw_driver.get_contract(contract)
+        contract_code = self.state_reader.get_contract(contract)
 
         if contract_code is None:
             return response.json({'error': '{} does not exist'.format(contract)}, status=404,
@@ -325,35 +549,29 @@ class WebServer:
                              headers={'Access-Control-Allow-Origin': '*'})
 
     async def get_methods(self, request, contract):
-        self.client.raw_driver.clear_pending_state()
-
-        contract_code = self.client.raw_driver.get_contract(contract)
+        contract_code = self.state_reader.get_contract(contract)
 
         if contract_code is None:
             return response.json({'error': '{} does not exist'.format(contract)}, status=404,
                                  headers={'Access-Control-Allow-Origin': '*'})
 
-        funcs = parser.methods_for_contract(contract_code)
+        funcs = self.contract_cache.get_methods(contract=contract, code=contract_code)
 
         return response.json({'methods': funcs}, status=200, headers={'Access-Control-Allow-Origin': '*'})
 
     async def get_variables(self, request, contract):
-        self.client.raw_driver.clear_pending_state()
-
-        contract_code = self.client.raw_driver.get_contract(contract)
+        contract_code = self.state_reader.get_contract(contract)
 
         if contract_code is None:
             return response.json({'error': '{} does not exist'.format(contract)}, status=404,
                                  headers={'Access-Control-Allow-Origin': '*'})
 
-        variables = parser.variables_for_contract(contract_code)
+        variables = self.contract_cache.get_variables(contract=contract, code=contract_code)
 
         return response.json(variables, headers={'Access-Control-Allow-Origin': '*'})
 
     async def get_variable(self, request, contract, variable):
-        self.client.raw_driver.clear_pending_state()
-
-        contract_code = self.client.raw_driver.get_contract(contract)
+        contract_code = self.state_reader.get_contract(contract)
 
         if contract_code is None:
             return response.json({'error': '{} does not exist'.format(contract)}, status=404,
@@ -363,8 +581,7 @@ class WebServer:
         if key is not None:
             key = key.split(',')
 
-        k = self.client.raw_driver.make_key(contract=contract, variable=variable, args=key)
-        value = self.client.raw_driver.get(k)
+        value = self.state_reader.get_var(contract=contract, variable=variable, arguments=key)
 
         if value is None:
             return response.json({'value': None}, status=404, headers={'Access-Control-Allow-Origin': '*'})
@@ -372,42 +589,89 @@ class WebServer:
             return response.json({'value': value}, status=200, dumps=encode,
                                  headers={'Access-Control-Allow-Origin': '*'})
 
-    # async def iterate_variable(self, request, contract, variable):
-    #     contract_code = self.client.raw_driver.get_contract(contract)
-    #
-    #     if contract_code is None:
-    #         return response.json({'error': '{} does not exist'.format(contract)}, status=404)
-    #
-    #     key = request.args.get('key')
-    #     # if key is not None:
-    #     #     key = key.split(',')
-    #
-    #     k = self.client.raw_driver.make_key(contract=contract, variable=variable, args=key)
-    #
-    #     values = self.client.raw_driver.driver.iter(k, length=500)
-    #
-    #     if len(values) == 0:
-    #         return response.json({'values': None}, status=404)
-    #     return response.json({'values': values, 'next': values[-1]}, status=200)
+    # Read many keys in one request. All values are read at the same block height.
+    async def read_state(self, request):
+        if request.method == "OPTIONS":
+            return response.text("", headers={
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Headers': "origin, content-type"
+            })
+
+        try:
+            keys = keys_from_reads(decode(request.body), make_key=self.client.raw_driver.make_key)
+        except StateReadError as err:
+            return response.json({'error': str(err)}, status=400, headers={'Access-Control-Allow-Origin': '*'})
+
+        # Give a block the node is writing time to finish between attempts
+        for attempt in range(SNAPSHOT_ATTEMPTS):
+            try:
+                height, values = read_snapshot(driver=self.client.raw_driver.driver, keys=keys, attempts=1)
+                break
+            except StateChangedError as err:
+                if attempt == SNAPSHOT_ATTEMPTS - 1:
+                    return response.json({'error': str(err)}, status=503,
+                                         headers={'Access-Control-Allow-Origin': '*'})
+                await asyncio.sleep(SNAPSHOT_RETRY_DELAY)
+
+        return response.json({'block_height': height, 'values': values}, status=200, dumps=encode,
+                             headers={'Access-Control-Allow-Origin': '*'})
+
+    # Page through the keys of a Hash, e.g. /contracts/currency/balances/iterate?start_after=<vk>&limit=100
+    async def iterate_variable(self, request, contract, variable):
+        if self.state_reader.get_contract(contract) is None:
+            return response.json({'error': '{} does not exist'.format(contract)}, status=404,
+                                 headers={'Access-Control-Allow-Origin': '*'})
+
+        try:
+            limit = parse_page_size(request.args.get('limit'))
+        except KeyIndexError as err:
+            return response.json({'error': str(err)}, status=400, headers={'Access-Control-Allow-Origin': '*'})
+
+        prefix = self.client.raw_driver.make_key(contract=contract, variable=variable) + ':'
+
+        start_after = request.args.get('start_after')
+        if start_after is not None:
+            start_after = prefix + start_after
+
+        keys, next_key = self.key_index.page(prefix=prefix, start_after=start_after, limit=limit)
+
+        values = [
+            {'key': key[len(prefix):], 'value': self.state_reader.get(key)} for key in keys
+        ]
+
+        return response.json({
+            'values': values,
+            'next': next_key[len(prefix):] if next_key is not None else None
+        }, status=200, dumps=encode, headers={'Access-Control-Allow-Origin': '*'})
 
     async def get_latest_block(self, request):
-        self.driver.clear_pending_state()
+        cached = self.block_cache.get_latest()
+        if cached is not None:
+            return self.cached_response(request, cached)
 
-        num = storage.get_latest_block_height(self.driver)
+        num = self.state_reader.get_latest_block_height()
         block = self.blocks.get_block(int(num))
-        return response.json(block, dumps=encode, headers={'Access-Control-Allow-Origin': '*'})
+
+        if block is None:
+            return response.json(block, dumps=encode, headers={'Access-Control-Allow-Origin': '*'})
+
+        return self.cached_response(request, self.block_cache.store_latest(block))
 
     async def get_latest_block_number(self, request):
-        self.driver.clear_pending_state()
+        cached = self.block_cache.get_latest_number()
+        if cached is not None:
+            return self.cached_response(request, cached)
 
-        num = storage.get_latest_block_height(self.driver)
+        num = self.state_reader.get_latest_block_height()
 
         return response.json({'latest_block_number': num}, headers={'Access-Control-Allow-Origin': '*'})
 
     async def get_latest_block_hash(self, request):
-        self.driver.clear_pending_state()
+        cached = self.block_cache.get_latest_hash()
+        if cached is not None:
+            return self.cached_response(request, cached)
 
-        return response.json({'latest_block_hash': storage.get_latest_block_hash(self.driver)},
+        return response.json({'latest_block_hash': self.state_reader.get_latest_block_hash()},
                              headers={'Access-Control-Allow-Origin': '*'})
 
     async def get_block(self, request):
@@ -418,12 +682,20 @@ class WebServer:
             if int(num) == 0 and self.CACHED_GENESIS_BLOCK is not None:
                 block = self.CACHED_GENESIS_BLOCK
             else:
+                cached = self.block_cache.get_by_number(int(num))
+                if cached is not None:
+                    return self.cached_response(request, cached)
+
                 block = self.blocks.get_block(int(num))
 
         elif _hash is not None:
             if self.CACHED_GENESIS_BLOCK is not None and self.CACHED_GENESIS_BLOCK.get('hash') == _hash:
                 block = self.CACHED_GENESIS_BLOCK
             else:
+                cached = self.block_cache.get_by_hash(_hash)
+                if cached is not None:
+                    return self.cached_response(request, cached)
+
                 block = self.blocks.get_block(_hash)
 
         else:
@@ -435,7 +707,85 @@ class WebServer:
                                  headers={'Access-Control-Allow-Origin': '*'})
 
         self.cache_genesis_block(block)
-        return response.json(block, dumps=encode, headers={'Access-Control-Allow-Origin': '*'})
+        return self.cached_response(request, self.block_cache.store(block))
+
+    def cached_response(self, request, cached):
+        headers = {'Access-Control-Allow-Origin': '*', 'ETag': cached.etag}
+
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match is not None:
+            etags = [etag.strip() for etag in if_none_match.split(',')]
+            if cached.etag in etags or '*' in etags:
+                return response.empty(status=304, headers=headers)
+
+        return response.raw(cached.body, headers=headers, content_type='application/json')
+
+    async def get_block_range(self, request):
+        try:
+            start, limit = parse_range_args(request.args)
+        except BlockStreamError as err:
+            return response.json({'error': str(err)}, status=400, headers={'Access-Control-Allow-Origin': '*'})
+
+        block_numbers, next_number = self.blocks.get_block_range(start=start, limit=limit)
+        compress = accepts_gzip(request.headers)
+
+        async def stream_blocks(res):
+            writer = BlockStreamWriter(res, compress=compress)
+
+            await writer.write('{"blocks": [')
+
+            separator = ''
+            for number in block_numbers:
+                block = self.read_block(number)
+                if block is None:
+                    continue
+
+                await writer.write(separator + encode(block))
+                separator = ', '
+
+            await writer.write(f'], "next": {_json.dumps(next_number)}}}')
+            await writer.close()
+
+        return response.stream(stream_blocks, content_type='application/json', headers=self.stream_headers(compress))
+
+    async def export_blocks(self, request):
+        try:
+            start = parse_block_number(request.args.get('start'), name='start', default=0)
+            end = parse_block_number(request.args.get('end'), name='end')
+        except BlockStreamError as err:
+            return response.json({'error': str(err)}, status=400, headers={'Access-Control-Allow-Origin': '*'})
+
+        block_numbers, _ = self.blocks.get_block_range(start=start, end=end)
+        compress = accepts_gzip(request.headers)
+
+        async def stream_blocks(res):
+            writer = BlockStreamWriter(res, compress=compress)
+
+            for number in block_numbers:
+                block = self.read_block(number)
+                if block is not None:
+                    await writer.write(encode(block) + '\n')
+
+            await writer.close()
+
+        return response.stream(stream_blocks, content_type='application/x-ndjson',
+                               headers=self.stream_headers(compress))
+
+    def read_block(self, number: int):
+        if number == 0 and self.CACHED_GENESIS_BLOCK is not None:
+            return self.CACHED_GENESIS_BLOCK
+
+        block = self.blocks.get_block(number)
+        self.cache_genesis_block(block)
+
+        return block
+
+    def stream_headers(self, compress: bool) -> dict:
+        headers = {'Access-Control-Allow-Origin': '*', 'Vary': 'Accept-Encoding'}
+        if compress:
+            headers['Content-Encoding'] = 'gzip'
+
+        return headers
 
     async def get_tx(self, request):
         _hash = request.args.get('hash')
@@ -458,9 +808,7 @@ class WebServer:
         return response.json(tx, dumps=encode, headers={'Access-Control-Allow-Origin': '*'})
 
     async def get_constitution(self, request):
-        self.client.raw_driver.clear_pending_state()
-
-        masternodes = self.client.get_var(
+        masternodes = self.state_reader.get_var(
             contract='masternodes',
             variable='S',
             arguments=['members']
@@ -512,4 +860,5 @@ if __name__ == '__main__':
         topics=topics
     )
 
-    webserver.app.run(host='0.0.0.0', port=webserver.port, debug=webserver.debug, access_log=webserver.access_log)
+    webserver.app.run(host='0.0.0.0', port=webserver.port, debug=webserver.debug, access_log=webserver.access_log,
+                      protocol=SizeLimitedHttpProtocol)
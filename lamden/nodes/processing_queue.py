@@ -7,8 +7,9 @@ from contracting.stdlib.bridge.time import Datetime
 from contracting.db.encoder import encode, safe_repr, convert_dict
 from contracting.execution.executor import Executor
 
+from lamden import metrics, tracing
 from lamden.rewards import RewardManager
-from lamden.crypto.canonical import tx_hash_from_tx, hash_from_results, format_dictionary, tx_result_hash_from_tx_result_object
+from lamden.crypto.canonical import tx_hash_from_tx, tx_hash_from_tx_message, hash_from_results, format_dictionary, tx_result_hash_from_tx_result_object
 from lamden.logger.base import get_logger
 from lamden.nodes.queue_base import ProcessingQueue
 from datetime import datetime
@@ -18,6 +19,16 @@ from threading import Lock
 
 GLOBAL_LOCK = Lock()
 
+QUEUE_DEPTHS = metrics.InstanceValues(len)
+QUEUE_DEPTH = metrics.gauge('lamden_processing_queue_depth',
+                            'Transactions waiting in the main processing queue, by node.', ('node', ))
+QUEUE_DEPTH.set_function(QUEUE_DEPTHS)
+HOLD_TIME = metrics.histogram('lamden_processing_queue_hold_seconds',
+                              'Time transactions spent in the main processing queue before being processed.')
+EXECUTION_TIME = metrics.histogram('lamden_tx_execution_seconds', 'Time to execute a transaction and sign its result.')
+ROLLBACKS = metrics.counter('lamden_rollbacks_total', 'Rollbacks to reprocess a transaction that arrived late.')
+ROLLBACK_TIME = metrics.histogram('lamden_rollback_seconds', 'Time taken by a rollback and reprocessing.')
+
 class TxProcessingQueue(ProcessingQueue):
     def __init__(self, client, driver, wallet, hlc_clock, processing_delay, stop_node, check_if_already_has_consensus,
                  get_last_hlc_in_consensus, pause_all_queues, unpause_all_queues, reprocess, metering=False, testing=False, debug=False):
@@ -56,6 +67,8 @@ class TxProcessingQueue(ProcessingQueue):
         self.append_history = []
         self.currently_processing_hlc = ""
 
+        QUEUE_DEPTHS.add(self, self.wallet.verifying_key)
+
     def append(self, tx):
         if not self.allow_append:
             return
@@ -81,6 +94,8 @@ class TxProcessingQueue(ProcessingQueue):
             super().append(tx)
             self.sort_queue()
 
+            tracing.record(hlc_timestamp, tracing.QUEUED)
+
     def flush(self):
         super().flush()
 
@@ -126,17 +141,6 @@ class TxProcessingQueue(ProcessingQueue):
 
         # If the transaction has been held for enough time then process it.
         if time_in_queue > time_delay:
-            '''
-            if self.debug:
-                self.log.debug(json.dumps({
-                    'type': 'tx_lifecycle',
-                    'file': 'processing_queue',
-                    'event': 'currently_processing_hlc',
-                    'hlc_timestamp': self.currently_processing_hlc,
-                    'system_time': time.time()
-                }))
-            '''
-
             if self.currently_processing_hlc < self.last_processed_hlc:
                 self.log.error(f"ROLLING BACK to {self.currently_processing_hlc}")
                 await self.node_rollback(tx=tx)
@@ -144,7 +148,10 @@ class TxProcessingQueue(ProcessingQueue):
                 # Process it to get the results
                 try:
                     del tx['timestamp']
+                    HOLD_TIME.observe(time_in_queue)
+
                     processing_results = self.process_tx(tx=tx)
+                    tracing.record(self.currently_processing_hlc, tracing.EXECUTED, hold=time_in_queue)
 
                 except Exception as err:
                     self.log.error(err)
@@ -174,6 +181,8 @@ class TxProcessingQueue(ProcessingQueue):
             return processing_delay['base']
 
     def process_tx(self, tx):
+        started = time.perf_counter()
+
         # TODO better error handling of anything in here
         # Get the environment
         environment = self.get_environment(tx=tx)
@@ -196,7 +205,8 @@ class TxProcessingQueue(ProcessingQueue):
         tx_result = self.process_tx_output(
             output=output,
             transaction=transaction,
-            stamp_cost=stamp_cost
+            stamp_cost=stamp_cost,
+            tx_hash=tx_hash_from_tx_message(tx)
         )
 
         # self.driver.soft_apply(hcl=hlc_timestamp)
@@ -212,6 +222,8 @@ class TxProcessingQueue(ProcessingQueue):
         # Create merkle
         sign_info = self.sign_tx_results(tx_result=tx_result, hlc_timestamp=hlc_timestamp, rewards=rewards)
 
+        EXECUTION_TIME.observe(time.perf_counter() - started)
+
         # Return a sub block
         return {
             'tx_result': tx_result,
@@ -254,7 +266,7 @@ class TxProcessingQueue(ProcessingQueue):
             })
             self.stop_node()
 
-    def process_tx_output(self, output, transaction, stamp_cost):
+    def process_tx_output(self, output, transaction, stamp_cost, tx_hash=None):
         # Clear pending writes, stu said to comment this out
         # self.executor.driver.pending_writes.clear()
 
@@ -265,7 +277,8 @@ class TxProcessingQueue(ProcessingQueue):
                            f'{len(output["writes"])} writes.'
                            f' Result = {output["result"]}')
 
-        tx_hash = tx_hash_from_tx(transaction)
+        if tx_hash is None:
+            tx_hash = tx_hash_from_tx(transaction)
 
         writes = self.determine_writes_from_output(
             status_code=output['status_code'],
@@ -382,6 +395,8 @@ class TxProcessingQueue(ProcessingQueue):
             self.log.info('reprocess')
             await self.reprocess(tx=tx)
             self.log.info(f'Reprocessing took { time.time() - start_time} seconds.')
+            ROLLBACKS.inc()
+            ROLLBACK_TIME.observe(time.time() - start_time)
             self.log.info('unpause_all_queues')
             self.unpause_all_queues()
         except Exception as err:
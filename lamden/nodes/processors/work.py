@@ -4,7 +4,7 @@ from lamden.crypto.wallet import verify
 from lamden.crypto.canonical import tx_hash_from_tx
 from contracting.db.driver import ContractDriver
 from lamden.crypto.transaction import check_nonce
-from lamden import storage
+from lamden import storage, tracing
 
 BAD_MESSAGE_PAYLOAD = "BAD MESSAGE PAYLOAD"
 MASTERNODE_NOT_KNOWN = 'MASTERNODE NOT KNOWN'
@@ -84,6 +84,8 @@ class WorkValidator(Processor):
             self.log.debug(f'[WORK] {msg}')
             return
 
+        tracing.record(msg['hlc_timestamp'], tracing.RECEIVED, sender=msg['sender'])
+
         if not self.known_masternode(msg=msg):
             self.log.error(f' {MASTERNODE_NOT_KNOWN}')
             print(f'[WORK] {MASTERNODE_NOT_KNOWN}')
@@ -129,6 +131,9 @@ class WorkValidator(Processor):
         tx_hash = tx_hash_from_tx(tx=message['tx'])
         msg = f'{tx_hash}{message["hlc_timestamp"]}'
 
+        # Whatever hash the peer sent is replaced, the processing queue reuses the one the signature is checked with
+        message['tx_hash'] = tx_hash
+
         try:
             return verify(vk=message['sender'], msg=msg, signature=message['signature'])
         except Exception:
@@ -0,0 +1,249 @@
+'''
+    Profiler that can be switched on in a running node for a fixed window.
+
+    In 'collapsed' mode a background thread samples the stack of the event loop thread every interval seconds and
+    the samples are written in the collapsed stack format used by flamegraph.pl and speedscope. In 'pstats' mode
+    cProfile runs on the event loop thread for the window and its stats are dumped for pstats / snakeviz.
+
+    In both modes event loop lag, the time between when a sleep was scheduled to wake and when it actually woke, is
+    measured during the window and written next to the profile. Blocking calls on the loop, like synchronous disk
+    I/O, show up there even when they are too short to be caught by a sample. The LoopWatchdog keeps track of the
+    worst of them all the time.
+
+    A profile is started with
+        LAMDEN_PROFILE_SECONDS=30           when the node starts
+        kill -USR1 <pid>                    profiles for LAMDEN_PROFILE_SECONDS or DEFAULT_SECONDS
+        GET /profile?seconds=30&mode=pstats on the node's metrics server, if started with --profile_endpoint
+'''
+from collections import Counter
+from lamden.logger.base import get_logger
+import asyncio
+import cProfile
+import json
+import os
+import pathlib
+import signal
+import sys
+import threading
+import time
+
+PROFILES_HOME = pathlib.Path().home().joinpath('.lamden').joinpath('profiles')
+
+COLLAPSED = 'collapsed'
+PSTATS = 'pstats'
+MODES = (COLLAPSED, PSTATS)
+
+DEFAULT_SECONDS = 30
+MAX_SECONDS = 600
+DEFAULT_INTERVAL = 0.005
+LAG_INTERVAL = 0.01
+
+
+def frame_name(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get('__name__') or os.path.basename(code.co_filename)
+    return f'{module}:{code.co_name}'
+
+
+def collapse_stack(frame) -> str:
+    names = []
+    while frame is not None:
+        names.append(frame_name(frame))
+        frame = frame.f_back
+
+    names.reverse()
+    return ';'.join(names)
+
+
+def percentile(values: list, fraction: float) -> float:
+    if len(values) == 0:
+        return 0
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def summarize(values: list) -> dict:
+    return {
+        'mean': round(sum(values) / len(values), 6) if values else 0,
+        'p50': round(percentile(values, 0.5), 6),
+        'p90': round(percentile(values, 0.9), 6),
+        'p99': round(percentile(values, 0.99), 6),
+        'max': round(max(values, default=0), 6)
+    }
+
+
+class StackSampler(threading.Thread):
+    def __init__(self, thread_id: int, interval: float = DEFAULT_INTERVAL):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+
+        self.samples = Counter()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.samples[collapse_stack(frame)] += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+class Profiler:
+    def __init__(self, root=PROFILES_HOME, interval: float = DEFAULT_INTERVAL, lag_interval: float = LAG_INTERVAL):
+        self.root = pathlib.Path(root)
+        self.interval = interval
+        self.lag_interval = lag_interval
+
+        self.log = get_logger('PROFILER')
+
+        self.loop = None
+        self.mode = None
+        self.name = None
+        self.started = None
+
+        self.sampler = None
+        self.profile = None
+        self.lag_task = None
+        self.stop_handle = None
+        self.lags = []
+
+    @property
+    def running(self) -> bool:
+        return self.started is not None
+
+    def install(self, loop=None, signum=signal.SIGUSR1):
+        '''
+            Starts a profile now if LAMDEN_PROFILE_SECONDS is set and on every signum afterwards.
+        '''
+        self.loop = loop or asyncio.get_event_loop()
+
+        seconds = os.getenv('LAMDEN_PROFILE_SECONDS')
+        if seconds:
+            self.start(seconds=float(seconds))
+
+        try:
+            self.loop.add_signal_handler(signum, lambda: self.start(
+                seconds=float(os.getenv('LAMDEN_PROFILE_SECONDS') or DEFAULT_SECONDS))
+            )
+        except (NotImplementedError, RuntimeError, ValueError) as err:
+            self.log.warning(f'Cannot profile on signal {signum}: {err}')
+
+    def start(self, seconds: float = DEFAULT_SECONDS, mode: str = COLLAPSED) -> dict:
+        '''
+            Starts profiling the event loop thread for seconds. Has to be called from the event loop thread.
+        '''
+        if self.running:
+            return self.status()
+
+        if mode not in MODES:
+            raise ValueError(f'mode must be one of {", ".join(MODES)}.')
+
+        # Also false for NaN, which call_later would never fire for
+        if not 0 < seconds <= MAX_SECONDS:
+            raise ValueError(f'seconds must be between 0 and {MAX_SECONDS}.')
+
+        self.loop = self.loop or asyncio.get_event_loop()
+        self.mode = mode
+        self.name = time.strftime('%Y%m%d-%H%M%S')
+        self.started = time.time()
+        self.lags = []
+
+        if mode == COLLAPSED:
+            self.sampler = StackSampler(thread_id=threading.get_ident(), interval=self.interval)
+            self.sampler.start()
+        else:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+
+        self.lag_task = asyncio.ensure_future(self.measure_lag())
+        self.stop_handle = self.loop.call_later(seconds, self.stop)
+
+        self.log.info(f'Profiling the event loop for {seconds} seconds ({mode}).')
+
+        return self.status()
+
+    async def measure_lag(self):
+        while True:
+            scheduled = self.loop.time() + self.lag_interval
+            await asyncio.sleep(self.lag_interval)
+
+            self.lags.append(max(self.loop.time() - scheduled, 0))
+
+    def stop(self) -> list:
+        if not self.running:
+            return []
+
+        if self.stop_handle is not None:
+            self.stop_handle.cancel()
+            self.stop_handle = None
+
+        self.lag_task.cancel()
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        files = []
+
+        if self.sampler is not None:
+            self.sampler.stop()
+
+            path = self.root.joinpath(f'{self.name}.collapsed')
+            with open(path, 'w') as f:
+                for stack, count in self.sampler.samples.most_common():
+                    f.write(f'{stack} {count}\n')
+            files.append(str(path))
+
+            self.sampler = None
+
+        if self.profile is not None:
+            self.profile.disable()
+
+            path = self.root.joinpath(f'{self.name}.pstats')
+            self.profile.dump_stats(str(path))
+            files.append(str(path))
+
+            self.profile = None
+
+        path = self.root.joinpath(f'{self.name}.lag.json')
+        with open(path, 'w') as f:
+            json.dump(self.lag_summary(), f, indent=4)
+        files.append(str(path))
+
+        self.started = None
+        self.log.info(f'Wrote profile to {", ".join(files)}')
+
+        return files
+
+    def lag_summary(self) -> dict:
+        return {
+            'mode': self.mode,
+            'seconds': round(time.time() - self.started, 3),
+            'interval': self.lag_interval,
+            'samples': len(self.lags),
+            'mean': sum(self.lags) / len(self.lags) if self.lags else 0,
+            'p50': percentile(self.lags, 0.5),
+            'p99': percentile(self.lags, 0.99),
+            'max': max(self.lags, default=0)
+        }
+
+    def status(self) -> dict:
+        return {
+            'running': self.running,
+            'mode': self.mode if self.running else None,
+            'started': self.started,
+            'root': str(self.root)
+        }
+
+    def handle_request(self, args: dict) -> str:
+        '''
+            Handler for the /profile route of the metrics server. Starts a profile for ?seconds= in ?mode= and
+            returns the profiler's status.
+        '''
+        try:
+            seconds = float(args.get('seconds', DEFAULT_SECONDS))
+        except ValueError:
+            raise ValueError('seconds must be a number.')
+
+        return json.dumps(self.start(seconds=seconds, mode=args.get('mode', COLLAPSED)))
@@ -0,0 +1,177 @@
+'''
+    Replays the transactions of a chain offline through TxProcessingQueue.process_tx.
+
+    Blocks are streamed from a BlockStorage in order and every block's transaction is executed against the state the
+    replay has built so far, with the environment the minting node derived from the block's HLC timestamp and origin
+    signature. The produced state writes and result hash are compared with the ones stored in the block, then the
+    writes are hard applied like a node does for a new block.
+
+    Replaying from the genesis block into empty state rebuilds the chain's state. Verification can be skipped to
+    measure execution alone.
+'''
+from contracting.client import ContractingClient
+from contracting.db.driver import ContractDriver
+from contracting.db.encoder import encode, convert_dict
+from lamden.crypto.canonical import tx_result_hash_from_tx_result_object
+from lamden.crypto.wallet import Wallet
+from lamden.logger.base import get_logger
+from lamden.nodes.hlc import HLC_Clock
+from lamden.nodes.processing_queue import TxProcessingQueue
+from lamden.storage import BlockStorage
+import time
+
+MAX_MISMATCHES_KEPT = 100
+LOG_EVERY = 1000
+
+STATE_MISMATCH = 'state'
+RESULT_HASH_MISMATCH = 'result_hash'
+
+
+class ReplayError(Exception):
+    pass
+
+
+def changed_keys(produced: list, expected: list) -> list:
+    produced = {write['key']: encode(write['value']) for write in produced or []}
+    expected = {write['key']: encode(write['value']) for write in expected or []}
+
+    return sorted(key for key in produced.keys() | expected.keys() if produced.get(key) != expected.get(key))
+
+
+class Replayer:
+    def __init__(self, blocks: BlockStorage, driver: ContractDriver, verify: bool = True, metering: bool = True,
+                 max_mismatches: int = MAX_MISMATCHES_KEPT):
+        self.blocks = blocks
+        self.driver = driver
+        self.verify = verify
+        self.max_mismatches = max_mismatches
+
+        self.log = get_logger('REPLAY')
+
+        self.client = ContractingClient(driver=self.driver, submission_filename=None)
+
+        self.processing_queue = TxProcessingQueue(
+            client=self.client,
+            driver=self.driver,
+            wallet=Wallet(),
+            hlc_clock=HLC_Clock(),
+            metering=metering,
+            processing_delay=lambda: {'base': 0, 'self': 0},
+            get_last_hlc_in_consensus=lambda: '0',
+            check_if_already_has_consensus=lambda hlc_timestamp: None,
+            stop_node=self.stop_node,
+            reprocess=self.reprocess,
+            pause_all_queues=self.pause_all_queues,
+            unpause_all_queues=lambda: None
+        )
+
+        self.blocks_replayed = 0
+        self.txs_replayed = 0
+        self.execution_seconds = 0
+        self.mismatches = 0
+        self.first_mismatches = []
+
+    def stop_node(self):
+        raise ReplayError('The executor could not run the transaction.')
+
+    async def reprocess(self, tx):
+        return
+
+    async def pause_all_queues(self):
+        return
+
+    def hard_apply(self, hlc_timestamp: str):
+        self.driver.soft_apply(hcl=hlc_timestamp)
+        pending_delta = self.driver.hard_apply_one(hlc=hlc_timestamp)
+        self.driver.bust_cache(writes=pending_delta.get('writes'))
+
+    def replay_genesis_block(self, block: dict):
+        for state_change in block.get('genesis', []):
+            value = state_change['value']
+            self.driver.set(state_change['key'], convert_dict(value) if type(value) is dict else value)
+
+        self.hard_apply(hlc_timestamp=block['hlc_timestamp'])
+
+    def replay_block(self, block: dict) -> dict:
+        '''
+            Executes the block's transaction and hard applies its writes. Returns the processing results.
+        '''
+        if self.blocks.is_genesis_block(block):
+            self.replay_genesis_block(block=block)
+            self.blocks_replayed += 1
+            return None
+
+        hlc_timestamp = block['hlc_timestamp']
+        tx = {
+            'tx': block['processed']['transaction'],
+            'hlc_timestamp': hlc_timestamp,
+            'signature': block['origin']['signature'],
+            'sender': block['origin']['sender']
+        }
+
+        started = time.perf_counter()
+        processing_results = self.processing_queue.process_tx(tx=tx)
+        self.execution_seconds += time.perf_counter() - started
+
+        if self.verify:
+            self.check_block(block=block, processing_results=processing_results)
+
+        self.hard_apply(hlc_timestamp=hlc_timestamp)
+
+        self.blocks_replayed += 1
+        self.txs_replayed += 1
+
+        return processing_results
+
+    def check_block(self, block: dict, processing_results: dict):
+        hlc_timestamp = block['hlc_timestamp']
+        expected = block['processed']
+        produced = processing_results['tx_result']
+
+        keys = changed_keys(produced=produced.get('state'), expected=expected.get('state'))
+        if keys:
+            self.add_mismatch(block=block, reason=STATE_MISMATCH, keys=keys)
+            return
+
+        expected_hash = tx_result_hash_from_tx_result_object(tx_result=expected, hlc_timestamp=hlc_timestamp,
+                                                             rewards=block.get('rewards'))
+        produced_hash = tx_result_hash_from_tx_result_object(tx_result=produced, hlc_timestamp=hlc_timestamp,
+                                                             rewards=processing_results['rewards'])
+        if expected_hash != produced_hash:
+            self.add_mismatch(block=block, reason=RESULT_HASH_MISMATCH, keys=[])
+
+    def add_mismatch(self, block: dict, reason: str, keys: list):
+        self.mismatches += 1
+        self.log.error(f'Block {block.get("number")} did not replay to the stored result ({reason}).')
+
+        if len(self.first_mismatches) < self.max_mismatches:
+            self.first_mismatches.append({
+                'number': block.get('number'),
+                'hlc_timestamp': block.get('hlc_timestamp'),
+                'hash': block.get('hash'),
+                'reason': reason,
+                'keys': keys
+            })
+
+    def run(self, start: int = 0, end: int = None, limit: int = None) -> dict:
+        started = time.time()
+
+        for block in self.blocks.iter_blocks(start=start, end=end, limit=limit):
+            self.replay_block(block=block)
+
+            if self.blocks_replayed % LOG_EVERY == 0:
+                self.log.info(f'Replayed {self.blocks_replayed} blocks, up to {block.get("number")}.')
+
+        return self.summary(seconds=time.time() - started)
+
+    def summary(self, seconds: float) -> dict:
+        return {
+            'blocks': self.blocks_replayed,
+            'txs': self.txs_replayed,
+            'seconds': round(seconds, 3),
+            'txs_per_second': round(self.txs_replayed / seconds, 2) if seconds > 0 else 0,
+            'execution_seconds': round(self.execution_seconds, 3),
+            'verified': self.verify,
+            'mismatches': self.mismatches,
+            'first_mismatches': self.first_mismatches
+        }
@@ -1,3 +1,4 @@
+from lamden import metrics, tracing
 from lamden.logger.base import get_logger
 from lamden.nodes.queue_base import ProcessingQueue
 from lamden.nodes.determine_consensus import DetermineConsensus
@@ -6,6 +7,13 @@ from lamden.storage import BlockStorage
 from lamden.crypto.wallet import Wallet
 import time
 
+QUEUE_DEPTHS = metrics.InstanceValues(len)
+QUEUE_DEPTH = metrics.gauge('lamden_validation_queue_depth', 'HLC timestamps waiting for consensus, by node.',
+                            ('node', ))
+QUEUE_DEPTH.set_function(QUEUE_DEPTHS)
+CONSENSUS_TIME = metrics.histogram('lamden_consensus_seconds',
+                                   'Time from the first solution for an HLC timestamp to its block being committed.')
+
 class ValidationQueue(ProcessingQueue):
     def __init__(self, driver, consensus_percent, wallet, hard_apply_block, stop_node, get_block_by_hlc,
                  get_block_from_network, blocks, testing=False, debug=False):
@@ -16,6 +24,9 @@ class ValidationQueue(ProcessingQueue):
         # The main dict for storing results from other nodes
         self.validation_results = dict()
 
+        # When the first solution for each hlc_timestamp was received
+        self.first_solution_times = dict()
+
         # Store confirmed solutions that I haven't got to yet
         self.last_hlc_in_consensus = ""
         self.max_hlc_in_consensus = ""
@@ -52,6 +63,8 @@ class ValidationQueue(ProcessingQueue):
 
         self.checking = False
 
+        QUEUE_DEPTHS.add(self, self.wallet.verifying_key)
+
     def append(self, processing_results):
         if not self.allow_append:
             return
@@ -69,6 +82,7 @@ class ValidationQueue(ProcessingQueue):
         # self.log.debug(f'ADDING {node_vk[:8]}\'s BLOCK INFO {block_info["hash"][:8]} TO NEEDS VALIDATION RESULTS STORE')
         # Store data about the tx so it can be processed for consensus later.
         if hlc_timestamp not in self.validation_results:
+            self.first_solution_times.setdefault(hlc_timestamp, time.time())
             self.validation_results[hlc_timestamp] = {}
             self.validation_results[hlc_timestamp]['solutions'] = {}
             self.validation_results[hlc_timestamp]['proofs'] = {}
@@ -86,18 +100,8 @@ class ValidationQueue(ProcessingQueue):
             # Is just returning an okay move?
             return
 
-        '''
-        if self.debug:
-            self.log.debug(json.dumps({
-                'type': 'tx_lifecycle',
-                'file': 'validation_queue',
-                'event': 'got_solution',
-                'from': node_vk,
-                'solution': block_info['hash'],
-                'hlc_timestamp': hlc_timestamp,
-                'system_time': time.time()
-            }))
-        '''
+        tracing.record(hlc_timestamp, tracing.SOLUTION_RECEIVED, node_vk=node_vk,
+                       tx_result_hash=processing_results["proof"].get('tx_result_hash'))
 
         # check if this node already gave us information
         if self.validation_results[hlc_timestamp]['solutions'].get(node_vk, None):
@@ -415,7 +419,9 @@ class ValidationQueue(ProcessingQueue):
                 'tx': processing_results['tx_result'].get('transaction'),
                 'hlc_timestamp': hlc_timestamp,
                 'signature': processing_results['tx_message'].get('signature'),
-                'sender': processing_results['tx_message'].get('sender')
+                'sender': processing_results['tx_message'].get('sender'),
+                # Hashed by this node when it processed the transaction
+                'tx_hash': processing_results['tx_result'].get('hash')
             }
         except:
             return None
@@ -431,6 +437,8 @@ class ValidationQueue(ProcessingQueue):
         return my_solution == consensus_solution
 
     async def commit_consensus_block(self, hlc_timestamp: str = None, block: dict = None):
+        tracing.record(hlc_timestamp or block.get('hlc_timestamp'), tracing.CONSENSUS, from_network=block is not None)
+
         if hlc_timestamp is not None:
             # Get the tx results for this timestamp
             processing_results = self.get_consensus_results(hlc_timestamp=hlc_timestamp)
@@ -450,6 +458,10 @@ class ValidationQueue(ProcessingQueue):
             self.log.error(f"Error while minting block HLC: {hlc_timestamp}.")
             return
 
+        first_solution_time = self.first_solution_times.pop(hlc_timestamp, None)
+        if first_solution_time is not None:
+            CONSENSUS_TIME.observe(time.time() - first_solution_time)
+
         self.set_last_hlc_in_consensus(hlc_timestamp=hlc_timestamp)
         self.prune_earlier_results(consensus_hlc_timestamp=self.last_hlc_in_consensus)
 
@@ -493,6 +505,10 @@ class ValidationQueue(ProcessingQueue):
             if hlc_timestamp < consensus_hlc_timestamp:
                 self.validation_results.pop(hlc_timestamp, None)
 
+        for hlc_timestamp in list(self.first_solution_times):
+            if hlc_timestamp <= consensus_hlc_timestamp:
+                self.first_solution_times.pop(hlc_timestamp, None)
+
     def clean_results_lookup(self, hlc_timestamp):
         validation_results = self.validation_results.get(hlc_timestamp)
         for solution in list(validation_results.get('result_lookup').keys()):
@@ -0,0 +1,214 @@
+'''
+    Watchdog that reports what blocks the event loop.
+
+    A heartbeat coroutine wakes every interval seconds and a watchdog thread checks that it keeps doing so. When the
+    heartbeat is more than threshold seconds late the loop is blocked, and the thread captures the stack of the loop
+    thread and the task that is running. Once the loop wakes up again the heartbeat records how long it was blocked
+    against that stack.
+
+    Blockers are aggregated by task and stack, so the report shows which code paths block the loop most often and
+    for longest and should be moved off the loop first. The report is served on /blockers of the node's metrics
+    server.
+
+        LAMDEN_WATCHDOG_THRESHOLD   seconds the loop has to be blocked to be reported, 0 turns the watchdog off
+'''
+from lamden import metrics
+from lamden.logger.base import get_logger
+from lamden.nodes.profiler import frame_name
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+
+DEFAULT_THRESHOLD = 0.1
+DEFAULT_INTERVAL = 0.02
+MAX_BLOCKERS = 1000
+MAX_STACK_DEPTH = 30
+NOT_CAPTURED = 'not captured'
+
+LOOP_LAG = metrics.histogram('lamden_event_loop_lag_seconds',
+                             'How late the event loop woke up from a sleep.',
+                             buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5))
+LOOP_BLOCKED = metrics.counter('lamden_event_loop_blocked_total', 'Times the event loop was blocked over the threshold.')
+
+
+def capture_stack(frame, depth: int = MAX_STACK_DEPTH) -> tuple:
+    names = []
+    while frame is not None and len(names) < depth:
+        names.append(frame_name(frame))
+        frame = frame.f_back
+
+    names.reverse()
+    return tuple(names)
+
+
+def task_name(task) -> str:
+    if task is None:
+        return 'callback'
+
+    coro = task.get_coro()
+    return getattr(coro, '__qualname__', None) or repr(coro)
+
+
+class Blocker:
+    __slots__ = ('task', 'stack', 'count', 'total', 'max', 'last')
+
+    def __init__(self, task: str, stack: tuple):
+        self.task = task
+        self.stack = stack
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self.last = 0
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.last = time.time()
+
+    def to_dict(self) -> dict:
+        return {
+            'task': self.task,
+            'stack': list(self.stack),
+            'count': self.count,
+            'total_seconds': round(self.total, 6),
+            'max_seconds': round(self.max, 6),
+            'last_seen': self.last
+        }
+
+
+class LoopWatchdog:
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, interval: float = DEFAULT_INTERVAL,
+                 max_blockers: int = MAX_BLOCKERS):
+        self.threshold = threshold
+        self.interval = interval
+        self.max_blockers = max_blockers
+
+        self.log = get_logger('WATCHDOG')
+
+        self.loop = None
+        self.loop_thread_id = None
+        self.heartbeat_task = None
+        self.thread = None
+        self.stopped = threading.Event()
+
+        self.last_beat = None
+
+        # (task, stack) captured by the watchdog thread while the loop is blocked
+        self.captured = None
+
+        # (task, stack) -> Blocker
+        self.blockers = {}
+
+    @property
+    def running(self) -> bool:
+        return self.thread is not None
+
+    def start(self, loop=None):
+        '''
+            Starts watching the event loop. Has to be called from the event loop thread.
+        '''
+        if self.running or self.threshold <= 0:
+            return
+
+        self.loop = loop or asyncio.get_event_loop()
+        self.loop_thread_id = threading.get_ident()
+        self.last_beat = time.monotonic()
+        self.stopped.clear()
+
+        self.heartbeat_task = asyncio.ensure_future(self.heartbeat())
+
+        self.thread = threading.Thread(target=self.watch, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if not self.running:
+            return
+
+        self.stopped.set()
+        self.thread.join()
+        self.thread = None
+
+        self.heartbeat_task.cancel()
+        self.heartbeat_task = None
+
+    async def heartbeat(self):
+        while True:
+            scheduled = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+
+            now = time.monotonic()
+            self.last_beat = now
+
+            lag = max(now - scheduled, 0)
+            LOOP_LAG.observe(lag)
+
+            captured, self.captured = self.captured, None
+            if lag >= self.threshold:
+                self.record(captured or (NOT_CAPTURED, ()), lag)
+
+    def watch(self):
+        check_every = min(self.interval, self.threshold / 2)
+
+        while not self.stopped.wait(check_every):
+            if self.captured is not None or time.monotonic() - self.last_beat - self.interval < self.threshold:
+                continue
+
+            frame = sys._current_frames().get(self.loop_thread_id)
+            if frame is None:
+                continue
+
+            try:
+                task = asyncio.current_task(loop=self.loop)
+            except RuntimeError:
+                task = None
+
+            self.captured = (task_name(task), capture_stack(frame))
+
+    def record(self, captured: tuple, seconds: float):
+        LOOP_BLOCKED.inc()
+
+        blocker = self.blockers.get(captured)
+        if blocker is None:
+            if len(self.blockers) >= self.max_blockers:
+                # Drop the blocker that was seen least recently to make room
+                del self.blockers[min(self.blockers, key=lambda key: self.blockers[key].last)]
+
+            blocker = self.blockers[captured] = Blocker(task=captured[0], stack=captured[1])
+
+        blocker.add(seconds)
+
+        self.log.warning(f'Event loop was blocked for {seconds:.3f}s in {captured[0]}: '
+                         f'{captured[1][-1] if captured[1] else NOT_CAPTURED}')
+
+    def top(self, limit: int = 20, by: str = 'total') -> list:
+        if by not in ('total', 'count', 'max'):
+            raise ValueError('by must be one of total, count, max.')
+
+        blockers = sorted(self.blockers.values(), key=lambda blocker: getattr(blocker, by), reverse=True)
+        return [blocker.to_dict() for blocker in blockers[:limit]]
+
+    def clear(self):
+        self.blockers.clear()
+
+    def handle_request(self, args: dict) -> str:
+        '''
+            Handler for the /blockers route of the metrics server. Returns the top ?limit= blockers sorted ?by=
+            total, count or max blocked seconds.
+        '''
+        try:
+            limit = int(args.get('limit', 20))
+        except ValueError:
+            raise ValueError('limit must be a number.')
+
+        return json.dumps({
+            'threshold': self.threshold,
+            'blockers': self.top(limit=limit, by=args.get('by', 'total'))
+        })
+
+
+def from_env() -> LoopWatchdog:
+    return LoopWatchdog(threshold=float(os.getenv('LAMDEN_WATCHDOG_THRESHOLD', DEFAULT_THRESHOLD)))
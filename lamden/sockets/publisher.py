@@ -2,6 +2,7 @@ import zmq
 import zmq.asyncio
 import asyncio
 from lamden.logger.base import get_logger
+from lamden.sockets import traffic
 from contracting.db.encoder import encode
 import json
 
@@ -133,6 +134,7 @@ class Publisher():
             raise TypeError(EXCEPTION_MSG_BYTES_NOT_BYTES)
 
         self.socket.send_multipart([topic_bytes, msg_bytes])
+        traffic.record('publisher', traffic.SENT, traffic.ALL_PEERS, len(topic_bytes) + len(msg_bytes))
 
     def announce_new_peer_connection(self, vk: str, ip: str) -> None:
         self.publish(
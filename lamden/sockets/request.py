@@ -6,6 +6,7 @@ from lamden.logger.base import get_logger
 from lamden.crypto.wallet import Wallet
 from contracting.db.encoder import encode
 from lamden.sockets.monitor import SocketMonitor
+from lamden.sockets import traffic
 from typing import Callable
 
 ATTRIBUTE_ERROR_TO_ADDRESS_NOT_NONE = "to_address property cannot be none."
@@ -120,6 +121,7 @@ class Request():
         if not isinstance(str_msg, str):
             raise TypeError("Message Must be string.")
 
+        traffic.record('request', traffic.SENT, self.to_address, len(str_msg))
         return self.socket.send_string(str_msg)
 
     async def message_waiting(self, poll_time: int) -> bool:
@@ -164,6 +166,7 @@ class Request():
                     if await self.message_waiting(poll_time=timeout):
 
                         response = await self.socket.recv()
+                        traffic.record('request', traffic.RECEIVED, self.to_address, len(response))
 
                         #self.log('info', '%s received: %s' % (self.id, response))
 
@@ -11,6 +11,7 @@ from lamden.crypto.z85 import z85_key
 from typing import Callable
 from lamden.crypto.wallet import Wallet
 from lamden.sockets.monitor import SocketMonitor
+from lamden.sockets import traffic
 
 import uvloop
 asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
@@ -260,6 +261,8 @@ class Router():
                     self.log('error', err)
                     ident_vk_string = None
 
+                traffic.record('router', traffic.RECEIVED, ident_vk_string, len(msg))
+
                 if self.message_callback:
                     asyncio.ensure_future(self.message_callback(
                         ident_vk_bytes=ident_vk_bytes,
@@ -301,7 +304,9 @@ class Router():
 
     async def async_send(self, ident_vk_bytes: bytes, to_vk: str, msg_str: str):
         try:
-            await self.socket.send_multipart([ident_vk_bytes, b'', msg_str.encode("UTF-8")])
+            msg_bytes = msg_str.encode("UTF-8")
+            await self.socket.send_multipart([ident_vk_bytes, b'', msg_bytes])
+            traffic.record('router', traffic.SENT, to_vk, len(msg_bytes))
             self.log('info', f'Sent Message Back to {to_vk}. {msg_str}')
         except Exception as err:
             self.log('error', f'error sending multipart message back to {to_vk}. {ident_vk_bytes} {msg_str}')
@@ -3,6 +3,7 @@ import zmq
 import zmq.asyncio
 
 from lamden.logger.base import get_logger
+from lamden.sockets import traffic
 
 from typing import Callable
 
@@ -145,6 +146,7 @@ class Subscriber():
         while self.running:
             if await self.messages_waiting(timeout=50):
                 data = await self.socket.recv_multipart()
+                traffic.record('subscriber', traffic.RECEIVED, self.address, sum(len(part) for part in data))
 
                 self.log('info', f'Got event from {self.address}. {data}')
 
@@ -0,0 +1,17 @@
+from lamden import metrics
+
+MESSAGES = metrics.counter('lamden_socket_messages_total', 'Messages sent and received per socket and peer.',
+                           ('socket', 'direction', 'peer'))
+BYTES = metrics.counter('lamden_socket_bytes_total', 'Bytes sent and received per socket and peer.',
+                        ('socket', 'direction', 'peer'))
+
+SENT = 'sent'
+RECEIVED = 'received'
+
+# The publisher sends every message to all subscribed peers
+ALL_PEERS = '*'
+
+
+def record(socket: str, direction: str, peer, size: int) -> None:
+    MESSAGES.labels(socket, direction, peer).inc()
+    BYTES.labels(socket, direction, peer).inc(size)
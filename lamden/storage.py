@@ -1,12 +1,17 @@
+from contextlib import contextmanager
 from contracting import config
 from contracting.db.driver import ContractDriver, FSDriver
 from contracting.db.encoder import encode, decode
 from contracting.stdlib.bridge.decimal import ContractingDecimal
+from lamden import metrics
 from lamden.logger.base import get_logger
 from lamden.utils import hlc
+import bisect
 import os
 import pathlib
 import shutil
+import time
+import uuid
 
 # NOTE: move state related stuff out of here. see TODO's below.
 
@@ -59,12 +64,23 @@ import shutil
 
 LATEST_BLOCK_HASH_KEY = '__latest_block.hash'
 LATEST_BLOCK_HEIGHT_KEY = '__latest_block.height'
+STATE_VERSION_KEY = '__latest_block.state_version'
 STORAGE_HOME = pathlib.Path().home().joinpath('.lamden')
 BLOCK_0 = {
     'number': 0,
     'hash': '0' * 64
 }
 
+BLOCK_INDEX_FILENAME = '.block_numbers'
+BLOCK_INDEX_READS = metrics.counter('lamden_block_number_index_reads_total',
+                                    'Reads of the sorted block numbers used to page through blocks, by whether new '
+                                    'numbers were read from the index file, the blocks directory or neither.',
+                                    ('update', ))
+BLOCK_INDEX_UNCHANGED = BLOCK_INDEX_READS.labels('none')
+BLOCK_INDEX_APPENDED = BLOCK_INDEX_READS.labels('index')
+BLOCK_INDEX_SCANNED = BLOCK_INDEX_READS.labels('directory')
+
+
 class BlockStorage:
     def __init__(self, root=None):
         self.log = get_logger('BlockStorage')
@@ -73,6 +89,13 @@ class BlockStorage:
         self.blocks_alias_dir = self.blocks_dir.joinpath('alias')
         self.txs_dir = self.blocks_dir.joinpath('txs')
 
+        # Every stored block number is appended to the index file. Readers keep the numbers sorted in memory and only
+        # read the lines added since their last lookup, so the node and the webserver process share one index.
+        self.index_file = self.root.joinpath(BLOCK_INDEX_FILENAME)
+        self.block_numbers = []
+        self.index_offset = 0
+        self.index_inode = None
+
         self.__build_directories()
         self.log.debug(f'Created block & tx storage at \'{self.root}\'')
 
@@ -106,6 +129,8 @@ class BlockStorage:
         with open(self.blocks_dir.joinpath(name), 'w') as f:
             f.write(encoded_block)
 
+        self.__append_to_index(int(num))
+
         try:
             os.symlink(self.blocks_dir.joinpath(name), self.blocks_alias_dir.joinpath(hash_symlink_name))
         except FileExistsError as err:
@@ -116,6 +141,17 @@ class BlockStorage:
             encoded_tx = encode(tx)
             f.write(encoded_tx)
 
+    def __append_to_index(self, number: int):
+        if not self.index_file.is_file():
+            # Blocks stored before there was an index are added once, before the first new number
+            numbers = sorted(int(name) for name in os.listdir(self.blocks_dir) if self.__is_block_file(name))
+            temp_file = self.index_file.with_name(f'{BLOCK_INDEX_FILENAME}.{os.getpid()}')
+            temp_file.write_text(''.join(f'{n}\n' for n in numbers if n != number))
+            os.replace(temp_file, self.index_file)
+
+        with open(self.index_file, 'a') as f:
+            f.write(f'{number}\n')
+
     def __fill_block(self, block):
         tx_hash = block.get('processed')
         tx = self.get_tx(tx_hash)
@@ -158,6 +194,8 @@ class BlockStorage:
             shutil.rmtree(self.txs_dir)
         if self.blocks_alias_dir.is_dir():
             shutil.rmtree(self.blocks_alias_dir)
+        if self.index_file.is_file():
+            self.index_file.unlink()
 
         self.__build_directories()
         self.log.debug(f'Flushed block & tx storage at \'{self.root}\'')
@@ -241,6 +279,75 @@ class BlockStorage:
 
         return self.get_block(v=next_block)
 
+    def get_block_numbers(self) -> list:
+        try:
+            stat = os.stat(self.index_file)
+        except FileNotFoundError:
+            # No block was stored since the index was added
+            self.block_numbers = sorted(int(name) for name in os.listdir(self.blocks_dir) if self.__is_block_file(name))
+            self.index_offset = 0
+            self.index_inode = None
+            BLOCK_INDEX_SCANNED.inc()
+            return self.block_numbers
+
+        if stat.st_ino != self.index_inode or stat.st_size < self.index_offset:
+            # The index was recreated by a flush or by another process, read it from the start
+            self.block_numbers = []
+            self.index_offset = 0
+            self.index_inode = stat.st_ino
+
+        if stat.st_size == self.index_offset:
+            BLOCK_INDEX_UNCHANGED.inc()
+            return self.block_numbers
+
+        with open(self.index_file, 'rb') as f:
+            f.seek(self.index_offset)
+            added = f.read(stat.st_size - self.index_offset)
+
+        # A line that is still being written is left for the next lookup
+        added = added[:added.rfind(b'\n') + 1]
+        self.index_offset += len(added)
+
+        for number in map(int, added.split()):
+            if len(self.block_numbers) == 0 or number > self.block_numbers[-1]:
+                self.block_numbers.append(number)
+                continue
+
+            position = bisect.bisect_left(self.block_numbers, number)
+            if self.block_numbers[position] != number:
+                self.block_numbers.insert(position, number)
+
+        BLOCK_INDEX_APPENDED.inc()
+        return self.block_numbers
+
+    def get_block_range(self, start: int = 0, limit: int = None, end: int = None):
+        """
+            Returns the numbers of up to limit blocks with start <= number <= end, in order, and the number of the
+            block after them (None if there are no more blocks).
+        """
+        block_numbers = self.get_block_numbers()
+
+        first = bisect.bisect_left(block_numbers, start)
+        last = len(block_numbers) if end is None else bisect.bisect_right(block_numbers, end)
+
+        if limit is not None:
+            last = min(last, first + limit)
+
+        next_number = block_numbers[last] if last < len(block_numbers) else None
+        if end is not None and next_number is not None and next_number > end:
+            next_number = None
+
+        return block_numbers[first:last], next_number
+
+    def iter_blocks(self, start: int = 0, limit: int = None, end: int = None):
+        block_numbers, _ = self.get_block_range(start=start, limit=limit, end=end)
+
+        for number in block_numbers:
+            block = self.get_block(v=number)
+            # the block can be removed by a rollback while we are reading
+            if block is not None:
+                yield block
+
     def get_tx(self, h):
         try:
             f = open(self.txs_dir.joinpath(h))
@@ -279,27 +386,119 @@ class BlockStorage:
 # TODO: move to component responsible for state maintenance.
 NONCE_FILENAME = '__n'
 PENDING_NONCE_FILENAME = '__pn'
+NONCE_VERSION_FILENAME = '.nonces_version'
+NONCE_SYNC_INTERVAL = 1
 class NonceStorage:
-    def __init__(self, root=None):
+    '''
+        Nonces are read on every submitted and every received transaction, so they are kept in memory.
+
+        With write_back enabled, set_nonce only marks the key as dirty and the value is written to disk on commit().
+        Every commit writes a new random version to a file shared by all processes using the same root. The webserver
+        and the node check that file at most once every sync_interval seconds and drop their clean cache entries when
+        another process has committed, so both see each other's nonces without going to disk on every lookup.
+
+        Nonces only move forward, so commit() keeps the higher of the cached and the stored value of each dirty key
+        instead of overwriting what another process committed in the meantime.
+    '''
+    def __init__(self, root=None, write_back=False, sync_interval=NONCE_SYNC_INTERVAL):
         root = root if root is not None else STORAGE_HOME
         self.driver = FSDriver(root=root)
 
+        self.write_back = write_back
+        self.sync_interval = sync_interval
+
+        self.cache = {}
+        self.dirty = set()
+
+        self.version_file = pathlib.Path(root).joinpath(NONCE_VERSION_FILENAME)
+        self.version = self.__read_version()
+        self.last_synced = time.time()
+
+    def __read_version(self):
+        try:
+            return self.version_file.read_text()
+        except FileNotFoundError:
+            return None
+
+    def __bump_version(self):
+        # Timestamps of quick successive writes can be equal, so the version is a random value. It is written to a
+        # temporary file and renamed so readers never see a partly written version.
+        version = uuid.uuid4().hex
+
+        self.version_file.parent.mkdir(parents=True, exist_ok=True)
+        temp_file = self.version_file.with_name(f'{NONCE_VERSION_FILENAME}.{version}')
+        temp_file.write_text(version)
+        os.replace(temp_file, self.version_file)
+
+        self.version = version
+
+    def sync(self, force=False):
+        now = time.time()
+        if not force and now - self.last_synced < self.sync_interval:
+            return
+
+        self.last_synced = now
+
+        version = self.__read_version()
+        if version == self.version:
+            return
+
+        self.version = version
+        self.cache = {key: value for key, value in self.cache.items() if key in self.dirty}
+
+    def __get(self, key):
+        self.sync()
+
+        try:
+            return self.cache[key]
+        except KeyError:
+            value = self.driver.get(key)
+            self.cache[key] = value
+            return value
+
+    def __set(self, key, value):
+        self.cache[key] = value
+
+        if self.write_back:
+            self.dirty.add(key)
+        else:
+            self.driver.set(key, value)
+            self.__bump_version()
+
+    def commit(self):
+        if len(self.dirty) == 0:
+            return
+
+        for key in self.dirty:
+            value = self.cache.get(key)
+
+            stored = self.driver.get(key)
+            if isinstance(value, int) and isinstance(stored, int) and stored > value:
+                self.cache[key] = stored
+                continue
+
+            if value != stored:
+                self.driver.set(key, value)
+
+        self.dirty.clear()
+        self.__bump_version()
+
     # Move this to transaction.py
     def get_nonce(self, sender, processor):
-        return self.driver.get(NONCE_FILENAME + config.INDEX_SEPARATOR + sender + config.DELIMITER + processor)
+        return self.__get(NONCE_FILENAME + config.INDEX_SEPARATOR + sender + config.DELIMITER + processor)
 
     # Move this to transaction.py
     def get_pending_nonce(self, sender, processor):
-        return self.driver.get(PENDING_NONCE_FILENAME + config.INDEX_SEPARATOR + sender + config.DELIMITER + processor)
+        return self.__get(PENDING_NONCE_FILENAME + config.INDEX_SEPARATOR + sender + config.DELIMITER + processor)
 
     def set_nonce(self, sender, processor, value):
-        self.driver.set(
+        self.__set(
             NONCE_FILENAME + config.INDEX_SEPARATOR + sender + config.DELIMITER + processor,
             value
         )
 
     def set_pending_nonce(self, sender, processor, value):
-        self.driver.set(
+        self.__set(
             PENDING_NONCE_FILENAME + config.INDEX_SEPARATOR + sender + config.DELIMITER + processor,
             value
         )
@@ -328,11 +527,18 @@ class NonceStorage:
         return current_nonce + 1
 
     def flush(self):
+        self.cache.clear()
+        self.dirty.clear()
         self.driver.flush_file(NONCE_FILENAME)
         self.driver.flush_file(PENDING_NONCE_FILENAME)
+        self.__bump_version()
 
     def flush_pending(self):
+        pending_prefix = PENDING_NONCE_FILENAME + config.INDEX_SEPARATOR
+        self.cache = {key: value for key, value in self.cache.items() if not key.startswith(pending_prefix)}
+        self.dirty = {key for key in self.dirty if not key.startswith(pending_prefix)}
         self.driver.flush_file(PENDING_NONCE_FILENAME)
+        self.__bump_version()
 
 # TODO: move to component responsible for state maintenance.
 def get_latest_block_hash(driver: ContractDriver):
@@ -360,6 +566,36 @@ def get_latest_block_height(driver: ContractDriver):
 def set_latest_block_height(h, driver: ContractDriver):
     driver.set(LATEST_BLOCK_HEIGHT_KEY, int(h))
 
+def get_state_version(driver) -> int:
+    version = driver.get(STATE_VERSION_KEY)
+    if version is None:
+        return 0
+
+    if type(version) == ContractingDecimal:
+        version = version._d
+
+    return int(version)
+
+
+@contextmanager
+def state_write(driver):
+    '''
+        Seqlock around writing a block's state, hash and height straight to the storage driver. The version is odd
+        while the write is in progress and moves to the next even number when it is done, so readers in other
+        processes (see read_snapshot) retry when the version is odd or changed while they read. Writes must not nest.
+    '''
+    version = get_state_version(driver)
+
+    # A write that was interrupted leaves the version odd
+    version += version % 2
+
+    driver.set(STATE_VERSION_KEY, version + 1)
+    try:
+        yield
+    finally:
+        driver.set(STATE_VERSION_KEY, version + 2)
+
+
 # TODO: implement and move to component responsible for state maintenance.
 def update_state_with_transaction(tx, driver: ContractDriver, nonces: NonceStorage):
     raise NotImplementedError
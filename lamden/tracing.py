@@ -0,0 +1,141 @@
+'''
+    Per transaction lifecycle tracing.
+
+    Every stage a transaction passes through on a node is recorded with the time it happened, keyed by the
+    transaction's HLC timestamp. Whether an HLC timestamp is traced is decided from a hash of the timestamp, so every
+    node samples the same transactions and their traces can be lined up across the network.
+
+    Traces are kept in a bounded buffer where the oldest trace is dropped first. They can be read from the node's
+    metrics server on /traces or written to a file with one JSON trace per line.
+
+        LAMDEN_TRACE_SAMPLE_RATE    fraction of transactions to trace, 0 (default) turns tracing off
+        LAMDEN_TRACE_CAPACITY       number of traces to keep
+        LAMDEN_TRACE_FILE           file the node writes its traces to when it stops
+'''
+from collections import OrderedDict
+import json
+import os
+import pathlib
+import time
+import zlib
+
+INTAKE = 'intake'
+PUBLISHED = 'published'
+RECEIVED = 'received'
+QUEUED = 'queued'
+EXECUTED = 'executed'
+SOLUTION_SENT = 'solution_sent'
+SOLUTION_RECEIVED = 'solution_received'
+CONSENSUS = 'consensus'
+HARD_APPLIED = 'hard_applied'
+STORED = 'stored'
+EVENT_EMITTED = 'event_emitted'
+
+STAGES = (INTAKE, PUBLISHED, RECEIVED, QUEUED, EXECUTED, SOLUTION_SENT, SOLUTION_RECEIVED, CONSENSUS, HARD_APPLIED,
+          STORED, EVENT_EMITTED)
+
+DEFAULT_CAPACITY = 10_000
+MAX_TRACES_RETURNED = 1_000
+SAMPLE_RESOLUTION = 1_000_000
+
+
+class Tracer:
+    def __init__(self, sample_rate: float = 0.0, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.threshold = 0
+        self.set_sample_rate(sample_rate)
+
+        # hlc_timestamp -> list of (stage, time, info)
+        self.traces = OrderedDict()
+
+    def __len__(self):
+        return len(self.traces)
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold > 0
+
+    @property
+    def sample_rate(self) -> float:
+        return self.threshold / SAMPLE_RESOLUTION
+
+    def set_sample_rate(self, sample_rate: float):
+        if sample_rate < 0 or sample_rate > 1:
+            raise ValueError('sample_rate must be between 0 and 1.')
+
+        self.threshold = int(sample_rate * SAMPLE_RESOLUTION)
+
+    def sampled(self, hlc_timestamp: str) -> bool:
+        if self.threshold >= SAMPLE_RESOLUTION:
+            return True
+        return zlib.crc32(hlc_timestamp.encode()) % SAMPLE_RESOLUTION < self.threshold
+
+    def record(self, hlc_timestamp: str, stage: str, **info):
+        if self.threshold == 0 or not isinstance(hlc_timestamp, str):
+            return
+
+        spans = self.traces.get(hlc_timestamp)
+
+        if spans is None:
+            if not self.sampled(hlc_timestamp):
+                return
+
+            spans = self.traces[hlc_timestamp] = []
+            while len(self.traces) > self.capacity:
+                self.traces.popitem(last=False)
+
+        spans.append((stage, time.time(), info))
+
+    def get(self, hlc_timestamp: str) -> dict:
+        spans = self.traces.get(hlc_timestamp)
+        if spans is None:
+            return None
+
+        return {
+            'hlc_timestamp': hlc_timestamp,
+            'spans': [dict(info, stage=stage, time=at) for stage, at, info in spans]
+        }
+
+    def latest(self, limit: int = MAX_TRACES_RETURNED) -> list:
+        hlc_timestamps = list(self.traces)[-limit:] if limit > 0 else []
+        return [self.get(hlc_timestamp) for hlc_timestamp in hlc_timestamps]
+
+    def clear(self):
+        self.traces.clear()
+
+    def dump(self, path) -> int:
+        path = pathlib.Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        traces = self.latest(limit=len(self.traces))
+        with open(path, 'w') as f:
+            for trace in traces:
+                f.write(json.dumps(trace) + '\n')
+
+        return len(traces)
+
+    def handle_request(self, args: dict) -> str:
+        '''
+            Handler for the /traces route of the metrics server. Returns the trace of ?hlc_timestamp= or the latest
+            ?limit= traces.
+        '''
+        hlc_timestamp = args.get('hlc_timestamp')
+        if hlc_timestamp is not None:
+            return json.dumps(self.get(hlc_timestamp))
+
+        try:
+            limit = int(args.get('limit', 100))
+        except ValueError:
+            raise ValueError('limit must be a number.')
+
+        return json.dumps(self.latest(limit=min(limit, MAX_TRACES_RETURNED)))
+
+
+TRACE_FILE = os.getenv('LAMDEN_TRACE_FILE')
+
+TRACER = Tracer(
+    sample_rate=float(os.getenv('LAMDEN_TRACE_SAMPLE_RATE', 0)),
+    capacity=int(os.getenv('LAMDEN_TRACE_CAPACITY', DEFAULT_CAPACITY))
+)
+
+record = TRACER.record
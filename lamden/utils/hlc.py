@@ -1,15 +1,15 @@
-from lamden.hlcpy import HLC
+from lamden.hlcpy import parse_hlc
 
 def nanos_from_hlc_timestamp(hlc_timestamp: str) -> int:
     try:
-        hlc = HLC.from_str(hlc_timestamp)
-        return hlc.nanos
+        nanos, _ = parse_hlc(hlc_timestamp)
+        return nanos
     except:
         return 0
 
 def is_hcl_timestamp(hlc_timestamp: str) -> int:
     try:
-        HLC.from_str(hlc_timestamp)
+        parse_hlc(hlc_timestamp)
         return True
     except:
         return False
\ No newline at end of file
@@ -79,6 +79,20 @@ class TestNode(TestCase):
 
         shutil.rmtree(path)
 
+    def test_profile_route_is_only_served_when_enabled(self):
+        path = Path().cwd().joinpath("temp_storage")
+
+        node = Node(socket_base='', wallet=Wallet(), constitution={}, driver=ContractDriver(driver=FSDriver(root=path)),
+                    event_writer=EventWriter(root=path), metrics_port=19190)
+        self.assertIn('/metrics', node.metrics_server.routes)
+        self.assertNotIn('/profile', node.metrics_server.routes)
+
+        node = Node(socket_base='', wallet=Wallet(), constitution={}, driver=ContractDriver(driver=FSDriver(root=path)),
+                    event_writer=EventWriter(root=path), metrics_port=19190, profile_endpoint=True)
+        self.assertIn('/profile', node.metrics_server.routes)
+
+        shutil.rmtree(path)
+
     def test_start_join_existing_network_bootnode_is_not_reachable(self):
         self.await_async_process(self.local_node_network.stop_all_nodes)
 
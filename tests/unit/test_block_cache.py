@@ -0,0 +1,113 @@
+from contracting.db.encoder import encode
+from lamden.nodes.masternode.block_cache import BlockResponseCache, block_etag
+from unittest import TestCase
+import json
+
+
+def make_block(number, block_hash=None):
+    return {
+        'hash': block_hash or str(number) * 64,
+        'number': str(number),
+        'hlc_timestamp': '2022-07-18T17:04:54.967101696Z_0',
+        'previous': '0' * 64,
+        'processed': {'hash': 'a' * 64, 'state': []}
+    }
+
+
+class TestBlockResponseCache(TestCase):
+    def setUp(self):
+        self.cache = BlockResponseCache(max_blocks=3)
+        self.cache.enable()
+
+    def test_store_returns_encoded_body_and_etag(self):
+        block = make_block(1)
+
+        response = self.cache.store(block)
+
+        self.assertEqual(response.body, encode(block).encode())
+        self.assertEqual(response.etag, block_etag(block['hash']))
+
+    def test_get_by_number_and_hash(self):
+        block = make_block(1)
+        response = self.cache.store(block)
+
+        self.assertIs(self.cache.get_by_number(1), response)
+        self.assertIs(self.cache.get_by_hash(block['hash']), response)
+        self.assertEqual(self.cache.hits, 2)
+
+    def test_miss_returns_none(self):
+        self.assertIsNone(self.cache.get_by_number(1))
+        self.assertIsNone(self.cache.get_by_hash('1' * 64))
+        self.assertEqual(self.cache.misses, 2)
+
+    def test_latest_miss_is_counted(self):
+        self.assertIsNone(self.cache.get_latest())
+        self.assertIsNone(self.cache.get_latest_number())
+        self.assertIsNone(self.cache.get_latest_hash())
+        self.assertEqual(self.cache.misses, 3)
+        self.assertEqual(self.cache.hits, 0)
+
+    def test_disabled_cache_stores_nothing(self):
+        self.cache.disable()
+
+        response = self.cache.store(make_block(1))
+
+        self.assertIsNotNone(response)
+        self.assertIsNone(self.cache.get_by_number(1))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_genesis_block_is_not_stored(self):
+        self.cache.store(make_block(0))
+
+        self.assertEqual(len(self.cache), 0)
+
+    def test_least_recently_used_block_is_evicted(self):
+        for i in range(1, 4):
+            self.cache.store(make_block(i))
+
+        self.cache.get_by_number(1)
+        self.cache.store(make_block(4))
+
+        self.assertIsNotNone(self.cache.get_by_number(1))
+        self.assertIsNone(self.cache.get_by_number(2))
+        self.assertIsNone(self.cache.get_by_hash(make_block(2)['hash']))
+        self.assertEqual(len(self.cache.hashes), 3)
+
+    def test_restoring_a_number_with_a_new_hash_drops_the_old_hash(self):
+        self.cache.store(make_block(1, block_hash='a' * 64))
+        self.cache.store(make_block(1, block_hash='b' * 64))
+
+        self.assertIsNone(self.cache.get_by_hash('a' * 64))
+        self.assertIsNotNone(self.cache.get_by_hash('b' * 64))
+
+    def test_new_block_sets_latest_responses(self):
+        block = make_block(5)
+
+        self.cache.new_block(block)
+
+        self.assertEqual(json.loads(self.cache.get_latest().body), block)
+        self.assertEqual(json.loads(self.cache.get_latest_number().body), {'latest_block_number': 5})
+        self.assertEqual(json.loads(self.cache.get_latest_hash().body), {'latest_block_hash': block['hash']})
+        self.assertEqual(self.cache.get_latest_number().etag, block_etag(block['hash']))
+
+    def test_older_block_does_not_replace_latest(self):
+        self.cache.new_block(make_block(5))
+        self.cache.store_latest(make_block(4))
+
+        self.assertEqual(json.loads(self.cache.get_latest_number().body), {'latest_block_number': 5})
+
+    def test_new_block_ignores_malformed_blocks(self):
+        self.cache.new_block({})
+        self.cache.new_block(None)
+
+        self.assertIsNone(self.cache.get_latest())
+
+    def test_block_reorg_clears_cache(self):
+        self.cache.new_block(make_block(1))
+        self.cache.store(make_block(2))
+
+        self.cache.block_reorg()
+
+        self.assertEqual(len(self.cache), 0)
+        self.assertIsNone(self.cache.get_latest())
+        self.assertIsNone(self.cache.get_by_hash(make_block(2)['hash']))
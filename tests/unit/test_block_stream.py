@@ -0,0 +1,73 @@
+from lamden.nodes.masternode.block_stream import BlockStreamWriter, BlockStreamError, accepts_gzip, \
+    parse_range_args, parse_block_number, DEFAULT_RANGE_LIMIT, MAX_RANGE_LIMIT
+from unittest import TestCase
+import asyncio
+import gzip
+
+
+class MockStreamingResponse:
+    def __init__(self):
+        self.chunks = []
+
+    async def write(self, data):
+        self.chunks.append(data)
+
+    @property
+    def body(self):
+        return b''.join(self.chunks)
+
+
+class TestBlockStreamArgs(TestCase):
+    def test_parse_range_args_defaults(self):
+        self.assertEqual(parse_range_args({}), (0, DEFAULT_RANGE_LIMIT))
+
+    def test_parse_range_args(self):
+        self.assertEqual(parse_range_args({'start': '10', 'limit': '5'}), (10, 5))
+
+    def test_parse_range_args_rejects_bad_limit(self):
+        for limit in ['0', str(MAX_RANGE_LIMIT + 1), 'many']:
+            with self.assertRaises(BlockStreamError):
+                parse_range_args({'limit': limit})
+
+    def test_parse_block_number_rejects_negative_and_non_numbers(self):
+        for value in ['-1', 'abc']:
+            with self.assertRaises(BlockStreamError):
+                parse_block_number(value, name='start')
+
+    def test_accepts_gzip(self):
+        self.assertTrue(accepts_gzip({'Accept-Encoding': 'deflate, gzip;q=1.0'}))
+        self.assertFalse(accepts_gzip({'Accept-Encoding': 'br'}))
+        self.assertFalse(accepts_gzip({}))
+
+
+class TestBlockStreamWriter(TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def write_all(self, writer, data):
+        async def write():
+            for d in data:
+                await writer.write(d)
+            await writer.close()
+
+        self.loop.run_until_complete(write())
+
+    def test_writes_in_chunks(self):
+        res = MockStreamingResponse()
+        writer = BlockStreamWriter(res, chunk_size=10)
+
+        self.write_all(writer, ['a' * 6, 'b' * 6, 'c'])
+
+        self.assertEqual(res.chunks, [b'a' * 6 + b'b' * 6, b'c'])
+
+    def test_compressed_output_is_gzip(self):
+        res = MockStreamingResponse()
+        writer = BlockStreamWriter(res, compress=True, chunk_size=10)
+
+        data = ['{"number": "%d"}\n' % i for i in range(100)]
+        self.write_all(writer, data)
+
+        self.assertEqual(gzip.decompress(res.body).decode(), ''.join(data))
@@ -457,22 +457,48 @@ class TestBlockValidator(TestCase):
     def test_verify_origin_signature__returns_True_if_signature_valid(self):
         self.assertTrue(block_validator.verify_origin_signature(block=self.block))
 
-    def test_verify_proof__returns_True_if_signature_valid(self):
-        tx_result = self.block.get('processed')
-        rewards = self.block.get('rewards')
-        hlc_timestamp = self.block.get('hlc_timestamp')
-
-        proofs = self.block.get('proofs')
-        self.assertTrue(block_validator.verify_proof(
-            proof=proofs[0],
-            tx_result=tx_result,
-            rewards=rewards,
-            hlc_timestamp=hlc_timestamp
-        ))
+    def test_verify_origin_signature__uses_given_tx_hash(self):
+        tx_hash = self.block['processed']['hash']
+        self.assertTrue(block_validator.verify_origin_signature(block=self.block, tx_hash=tx_hash))
+        self.assertFalse(block_validator.verify_origin_signature(block=self.block, tx_hash='a' * 64))
+
+    def test_verify_proofs__returns_True_for_single_valid_proof(self):
+        self.block['proofs'] = self.block['proofs'][:1]
+
+        self.assertTrue(block_validator.verify_proofs(block=self.block))
+
+    def test_verify_proofs__returns_False_if_signature_is_not_of_result(self):
+        self.block['proofs'][-1]['signature'] = self.wallet.sign('TESTING')
+
+        self.assertFalse(block_validator.verify_proofs(block=self.block))
+
+    def test_verify_proofs__returns_False_if_result_changed(self):
+        self.block['processed']['stamps_used'] += 1
+
+        self.assertFalse(block_validator.verify_proofs(block=self.block))
 
     def test_verify_proofs__returns_True_if_all_signatures_are_valid(self):
         self.assertTrue(block_validator.verify_proofs(block=self.block))
 
+    def test_verify_proofs__returns_False_at_first_invalid_proof(self):
+        checked = []
+
+        class Proof(dict):
+            def get(self, key, default=None):
+                checked.append(self)
+                return super().get(key, default)
+
+        proofs = [Proof(proof) for proof in self.block['proofs']]
+        proofs[0]['signature'] = self.wallet.sign('TESTING')
+        self.block['proofs'] = proofs
+
+        self.assertFalse(block_validator.verify_proofs(block=self.block))
+        self.assertEqual({id(proofs[0])}, {id(proof) for proof in checked})
+
+    def test_verify_proofs__returns_False_if_signer_is_unhashable(self):
+        self.block['proofs'][0]['signer'] = [self.block['proofs'][0]['signer']]
+        self.assertFalse(block_validator.verify_proofs(block=self.block))
+
     def test_validate_all_signatures__returns_true_if_all_valid(self):
         self.assertTrue(block_validator.validate_all_signatures(block=self.block))
 
@@ -797,4 +823,53 @@ class TestGenesisBlockValidator(TestCase):
             self.genesis_block['testing'] = True
             block_validator.validate_block_structure(block=self.genesis_block)
 
-        self.assertEqual(BLOCK_EXCEPTIONS['GenesisBlockKeysInvalidNumber'], str(err.exception))
\ No newline at end of file
+        self.assertEqual(BLOCK_EXCEPTIONS['GenesisBlockKeysInvalidNumber'], str(err.exception))
+
+class TestVerifiedBlocks(TestCase):
+    def setUp(self):
+        self.block = deepcopy(BLOCK_V2)
+        self.wallet = Wallet()
+        self.block['minted'] = {
+            'minter': self.wallet.verifying_key,
+            'signature': self.wallet.sign(encode(self.block))
+        }
+
+        self.verified_blocks = block_validator.VerifiedBlocks(max_blocks=2)
+
+    def test_verify__identical_copies_are_verified_once(self):
+        self.assertTrue(self.verified_blocks.verify(block=deepcopy(self.block)))
+        self.assertTrue(self.verified_blocks.verify(block=deepcopy(self.block)))
+
+        self.assertEqual(1, self.verified_blocks.misses)
+        self.assertEqual(1, self.verified_blocks.hits)
+
+    def test_verify__copy_with_other_content_is_verified_again(self):
+        self.assertTrue(self.verified_blocks.verify(block=deepcopy(self.block)))
+
+        tampered = deepcopy(self.block)
+        tampered['processed']['stamps_used'] += 1
+
+        self.assertFalse(self.verified_blocks.verify(block=tampered))
+        self.assertEqual(2, self.verified_blocks.misses)
+
+    def test_verify__failed_blocks_are_not_remembered(self):
+        self.block['minted']['signature'] = 'abc'
+
+        self.assertFalse(self.verified_blocks.verify(block=deepcopy(self.block)))
+        self.assertFalse(self.verified_blocks.verify(block=deepcopy(self.block)))
+        self.assertEqual(0, len(self.verified_blocks))
+        self.assertEqual(0, self.verified_blocks.hits)
+
+    def test_verify__keeps_at_most_max_blocks(self):
+        for number in range(3):
+            wallet = Wallet()
+            block = deepcopy(BLOCK_V2)
+            block['minted'] = {'minter': wallet.verifying_key, 'signature': wallet.sign(encode(block))}
+            self.assertTrue(self.verified_blocks.verify(block=block))
+
+        self.assertEqual(2, len(self.verified_blocks))
+
+    def test_verify__block_that_cannot_be_encoded_is_not_valid(self):
+        self.block['processed']['state'] = object()
+
+        self.assertFalse(self.verified_blocks.verify(block=self.block))
@@ -1,5 +1,10 @@
+from contracting.db.encoder import encode, decode
+from contracting.stdlib.bridge.decimal import ContractingDecimal
+from contracting.stdlib.bridge.time import Datetime
+from copy import deepcopy
 from unittest import TestCase
 from lamden.crypto import canonical
+import random
 
 genesis_block = {
     'hlc_timestamp': '0000-00-00T00:00:00.000000000Z_0',
@@ -47,3 +52,99 @@ class TestCanonicalCoding(TestCase):
         expected_hash = '2bb4e112aca11805538842bd993470f18f337797ec3f2f6ab02c47385caf088e'
         self.assertEqual(expected_hash, hash)
 
+
+    def test_tx_hash_from_tx_message_keeps_hash_in_message(self):
+        tx_message = {'tx': {'payload': {'b': 1, 'a': 2}, 'metadata': {'signature': 'abc'}}}
+
+        tx_hash = canonical.tx_hash_from_tx_message(tx_message)
+
+        self.assertEqual(canonical.tx_hash_from_tx(tx_message['tx']), tx_hash)
+        self.assertEqual(tx_hash, tx_message['tx_hash'])
+        self.assertEqual(tx_hash, canonical.tx_hash_from_tx_message(tx_message))
+
+    def test_without_tx_hash(self):
+        tx_message = {'tx': {}, 'sender': 'abc', 'tx_hash': '123'}
+
+        self.assertEqual({'tx': {}, 'sender': 'abc'}, canonical.without_tx_hash(tx_message))
+        self.assertIn('tx_hash', tx_message)
+
+
+class RandomPayloads:
+    '''
+        Random nested payloads with the values transactions and results carry, including dicts inside lists inside
+        lists, which format_dictionary leaves unsorted.
+    '''
+    def __init__(self, seed):
+        self.random = random.Random(seed)
+
+    def key(self):
+        return ''.join(self.random.choice('abcxyzAZ_:.0129é') for _ in range(self.random.randint(0, 6)))
+
+    def leaf(self):
+        return self.random.choice([
+            lambda: self.random.randint(-2**70, 2**70),
+            lambda: self.random.randint(0, 10),
+            lambda: self.key(),
+            lambda: self.random.random() * 1000,
+            lambda: ContractingDecimal(f'{self.random.randint(0, 10**6)}.{self.random.randint(0, 10**6)}'),
+            lambda: Datetime(2022, self.random.randint(1, 12), self.random.randint(1, 28)),
+            lambda: bytes(self.random.getrandbits(8) for _ in range(4)),
+            lambda: self.random.choice([True, False, None])
+        ])()
+
+    def value(self, depth):
+        kind = self.random.random()
+        if depth <= 0 or kind < 0.4:
+            return self.leaf()
+        if kind < 0.7:
+            return self.dict(depth - 1)
+        if kind < 0.95:
+            return [self.value(depth - 1) for _ in range(self.random.randint(0, 4))]
+        return tuple(self.value(depth - 1) for _ in range(self.random.randint(0, 3)))
+
+    def dict(self, depth):
+        return {self.key(): self.value(depth) for _ in range(self.random.randint(0, 6))}
+
+
+class TestEncodeCanonical(TestCase):
+    def assert_encodes_like_format_dictionary(self, d):
+        expected = encode(canonical.format_dictionary(deepcopy(d)))
+        self.assertEqual(expected, canonical.encode_canonical(d))
+
+    def test_random_payloads_encode_like_format_dictionary(self):
+        for seed in range(500):
+            self.assert_encodes_like_format_dictionary(RandomPayloads(seed).dict(depth=5))
+
+    def test_random_decoded_payloads_encode_like_format_dictionary(self):
+        # Payloads as they come off the wire, without tuples and with decoded special values
+        for seed in range(500):
+            self.assert_encodes_like_format_dictionary(decode(encode(RandomPayloads(seed).dict(depth=5))))
+
+    def test_dicts_in_lists_in_lists_stay_unsorted(self):
+        d = {'b': [[{'z': 1, 'a': 2}], {'z': 1, 'a': 2}], 'a': ({'z': 1, 'a': 2},)}
+
+        self.assertEqual('{"a":[{"z":1,"a":2}],"b":[[{"z":1,"a":2}],{"a":2,"z":1}]}', canonical.encode_canonical(d))
+        self.assert_encodes_like_format_dictionary(d)
+
+    def test_does_not_change_payload(self):
+        d = {'b': {'z': 1, 'a': [{'z': 1, 'a': 2}]}, 'a': [[{'z': 1, 'a': 2}]]}
+        before = deepcopy(d)
+
+        canonical.encode_canonical(d)
+
+        self.assertEqual(list(before['b']), list(d['b']))
+        self.assertEqual(list(before['b']['a'][0]), list(d['b']['a'][0]))
+
+    def test_non_string_keys_raise_like_format_dictionary(self):
+        for d in [{1: 'a'}, {'a': {1: 'a'}}, {'a': [{'b': 1, 2: 'c'}]}]:
+            with self.assertRaises(AssertionError):
+                canonical.format_dictionary(deepcopy(d))
+            with self.assertRaises(AssertionError):
+                canonical.encode_canonical(d)
+
+    def test_tx_hash_from_tx_is_unchanged(self):
+        tx = {'payload': {'sender': 'a', 'kwargs': {'to': 'b', 'amount': ContractingDecimal('1.5')}, 'nonce': 0},
+              'metadata': {'signature': 'c'}}
+
+        expected = canonical.hashlib.sha3_256(encode(canonical.format_dictionary(deepcopy(tx))).encode()).hexdigest()
+        self.assertEqual(expected, canonical.tx_hash_from_tx(tx))
@@ -7,7 +7,7 @@ from lamden.crypto.wallet import Wallet
 from lamden.nodes.events import EventWriter, Event, EventService
 from lamden.nodes.filequeue import FileQueue
 from lamden.nodes.hlc import HLC_Clock
-from lamden.nodes.masternode.webserver import WebServer
+from lamden.nodes.masternode.webserver import WebServer, SizeLimitedHttpProtocol, MAX_TX_SIZE
 from lamden.storage import BlockStorage
 from multiprocessing import Process
 from tests.unit.helpers.mock_blocks import generate_blocks, GENESIS_BLOCK
@@ -16,6 +16,7 @@ from unittest import TestCase
 import asyncio
 import copy
 import json
+import os
 import pathlib
 import shutil
 import time
@@ -99,6 +100,35 @@ class TestClassWebserver(TestCase):
 
         self.assertDictEqual(response.json, expected)
 
+    def test_reserve_nonces_returns_range(self):
+        w2 = Wallet()
+
+        self.ws.nonces.set_nonce(processor=self.node_wallet.verifying_key, sender=w2.verifying_key, value=9)
+
+        _, response = self.ws.app.test_client.post('/nonce/{}/reserve?count=50'.format(w2.verifying_key))
+
+        self.assertEqual(response.json['start'], 10)
+        self.assertEqual(response.json['end'], 59)
+
+        _, response = self.ws.app.test_client.get('/nonce/{}'.format(w2.verifying_key))
+
+        self.assertEqual(response.json['nonce'], 60)
+
+    def test_reserve_nonces_rejects_bad_count(self):
+        w2 = Wallet()
+
+        _, response = self.ws.app.test_client.post('/nonce/{}/reserve?count=0'.format(w2.verifying_key))
+
+        self.assertEqual(response.status, 400)
+
+    def test_reserve_nonces_does_not_return_parse_errors(self):
+        w2 = Wallet()
+
+        _, response = self.ws.app.test_client.post('/nonce/{}/reserve?count=abc'.format(w2.verifying_key))
+
+        self.assertEqual(response.status, 400)
+        self.assertNotIn('abc', response.json['error'])
+
     def test_get_contracts_returns_list_of_contracts(self):
         _, response = self.ws.app.test_client.get('/contracts')
 
@@ -163,6 +193,23 @@ class TestClassWebserver(TestCase):
                 ]
             })
 
+    def test_get_contract_methods_are_parsed_once(self):
+        self.ws.app.test_client.get('/contracts/submission/methods')
+        _, response = self.ws.app.test_client.get('/contracts/submission/variables')
+
+        self.assertEqual(self.ws.contract_cache.misses, 1)
+        self.assertEqual(self.ws.contract_cache.hits, 1)
+        self.assertEqual(response.status, 200)
+
+    def test_contract_metadata_is_dropped_when_block_changes_code(self):
+        self.ws.app.test_client.get('/contracts/submission/methods')
+
+        self.ws.contract_cache.invalidate_block({
+            'processed': {'state': [{'key': 'submission.__code__', 'value': 'new code'}]}
+        })
+
+        self.assertEqual(len(self.ws.contract_cache), 0)
+
     def test_get_contract_method_returns_error_if_does_not_exist(self):
         _, response = self.ws.app.test_client.get('/contracts/blah/methods')
 
@@ -313,6 +360,49 @@ def get():
 
         self.assertDictEqual(response.json, {'value': None})
 
+    def test_read_state_returns_all_values_at_one_height(self):
+        self.ws.client.set_var(contract='currency', variable='balances', arguments=['a'], value=100)
+        self.ws.client.set_var(contract='currency', variable='balances', arguments=['b'], value=200)
+        storage.set_latest_block_height(5, driver=self.ws.driver)
+        self.ws.client.raw_driver.commit()
+
+        _, response = self.ws.app.test_client.post('/state', data=json.dumps([
+            ['currency', 'balances', ['a', 'b', 'c']]
+        ]))
+
+        self.assertDictEqual(response.json, {
+            'block_height': 5,
+            'values': {'currency.balances:a': 100, 'currency.balances:b': 200, 'currency.balances:c': None}
+        })
+
+    def test_read_state_malformed_request_returns_error(self):
+        _, response = self.ws.app.test_client.post('/state', data=json.dumps({'contract': 'currency'}))
+
+        self.assertEqual(response.status, 400)
+        self.assertIn('error', response.json)
+
+    def test_iterate_variable_pages_through_hash(self):
+        for vk, amount in [('a', 1), ('b', 2), ('c', 3)]:
+            self.ws.client.set_var(contract='currency', variable='balances', arguments=[vk], value=amount)
+        self.ws.client.raw_driver.commit()
+
+        _, response = self.ws.app.test_client.get('/contracts/currency/balances/iterate?limit=2')
+
+        self.assertEqual([v['key'] for v in response.json['values']][:1], ['a'])
+        self.assertEqual(len(response.json['values']), 2)
+        self.assertIsNotNone(response.json['next'])
+
+        _, response = self.ws.app.test_client.get(
+            f'/contracts/currency/balances/iterate?limit=2&start_after={response.json["next"]}'
+        )
+
+        self.assertIsNone(response.json['next'])
+
+    def test_iterate_variable_of_missing_contract_returns_error(self):
+        _, response = self.ws.app.test_client.get('/contracts/blah/balances/iterate')
+
+        self.assertDictEqual(response.json, {'error': 'blah does not exist'})
+
     def test_get_latest_block(self):
         blocks = generate_blocks(
             number_of_blocks=2,
@@ -418,6 +508,108 @@ def get():
         _, response = self.ws.app.test_client.get('/blocks')
         self.assertDictEqual(response.json, {'error': 'No number or hash provided.'})
 
+    def test_get_block_returns_etag_and_not_modified_if_it_matches(self):
+        block = generate_blocks(
+            number_of_blocks=1,
+            prev_block_hash='0'*64,
+            prev_block_hlc=HLC_Clock().get_new_hlc_timestamp()
+        )[0]
+
+        self.ws.blocks.store_block(copy.deepcopy(block))
+
+        _, response = self.ws.app.test_client.get(f'/blocks?num={block["number"]}')
+        etag = response.headers.get('ETag')
+        self.assertEqual(etag, f'"{block["hash"]}"')
+
+        _, response = self.ws.app.test_client.get(f'/blocks?num={block["number"]}', headers={'If-None-Match': etag})
+        self.assertEqual(response.status, 304)
+
+    def test_get_block_is_served_from_block_cache_when_enabled(self):
+        block = generate_blocks(
+            number_of_blocks=1,
+            prev_block_hash='0'*64,
+            prev_block_hlc=HLC_Clock().get_new_hlc_timestamp()
+        )[0]
+
+        self.ws.blocks.store_block(copy.deepcopy(block))
+        self.ws.block_cache.enable()
+
+        self.ws.app.test_client.get(f'/blocks?num={block["number"]}')
+        self.assertEqual(self.ws.block_cache.hits, 0)
+
+        _, response = self.ws.app.test_client.get(f'/blocks?hash={block["hash"]}')
+        self.assertDictEqual(response.json, block)
+        self.assertEqual(self.ws.block_cache.hits, 1)
+
+    def test_get_latest_block_is_served_from_block_cache_after_new_block(self):
+        block = generate_blocks(
+            number_of_blocks=1,
+            prev_block_hash='0'*64,
+            prev_block_hlc=HLC_Clock().get_new_hlc_timestamp()
+        )[0]
+
+        self.ws.block_cache.enable()
+        self.ws.block_cache.new_block(copy.deepcopy(block))
+
+        _, response = self.ws.app.test_client.get('/latest_block')
+        self.assertDictEqual(response.json, block)
+
+        _, response = self.ws.app.test_client.get('/latest_block_num')
+        self.assertDictEqual(response.json, {'latest_block_number': int(block['number'])})
+
+        _, response = self.ws.app.test_client.get('/latest_block_hash')
+        self.assertDictEqual(response.json, {'latest_block_hash': block['hash']})
+
+    def test_get_block_range_returns_page_and_next_cursor(self):
+        blocks = generate_blocks(
+            number_of_blocks=3,
+            prev_block_hash='0'*64,
+            prev_block_hlc=HLC_Clock().get_new_hlc_timestamp()
+        )
+        for b in blocks:
+            self.ws.blocks.store_block(copy.deepcopy(b))
+
+        _, response = self.ws.app.test_client.get(f'/blocks/range?start={blocks[0]["number"]}&limit=2')
+
+        self.assertEqual([b['hash'] for b in response.json['blocks']], [b['hash'] for b in blocks[:2]])
+        self.assertEqual(response.json['next'], blocks[2]['number'])
+
+        _, response = self.ws.app.test_client.get(f'/blocks/range?start={response.json["next"]}&limit=2')
+
+        self.assertEqual([b['hash'] for b in response.json['blocks']], [blocks[2]['hash']])
+        self.assertIsNone(response.json['next'])
+
+    def test_get_block_range_returns_no_state_from_genesis_block(self):
+        _, response = self.ws.app.test_client.get('/blocks/range?start=0&limit=1')
+
+        self.assertEqual(response.json['blocks'][0].get('genesis'), [])
+
+    def test_get_block_range_bad_limit_returns_error(self):
+        _, response = self.ws.app.test_client.get('/blocks/range?limit=0')
+
+        self.assertEqual(response.status, 400)
+        self.assertIn('error', response.json)
+
+    def test_export_blocks_streams_ndjson(self):
+        blocks = generate_blocks(
+            number_of_blocks=3,
+            prev_block_hash='0'*64,
+            prev_block_hlc=HLC_Clock().get_new_hlc_timestamp()
+        )
+        for b in blocks:
+            self.ws.blocks.store_block(copy.deepcopy(b))
+
+        _, response = self.ws.app.test_client.get(f'/blocks/export?start={blocks[0]["number"]}')
+
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        self.assertEqual([b['hash'] for b in lines], [b['hash'] for b in blocks])
+
+    def test_export_blocks_is_gzip_compressed_if_accepted(self):
+        _, response = self.ws.app.test_client.get('/blocks/export', headers={'Accept-Encoding': 'gzip'})
+
+        self.assertEqual(response.headers.get('Content-Encoding'), 'gzip')
+        self.assertEqual(int(json.loads(response.text.splitlines()[0])['number']), 0)
+
     def test_bad_transaction_returns_a_TransactionException(self):
         tx = build_transaction(
             wallet=Wallet(),
@@ -503,6 +695,130 @@ def get():
 
         self.assertEqual(len(self.ws.queue), 1)
 
+    def test_batch_of_good_transactions_is_put_into_queue_with_one_file(self):
+        w = Wallet()
+
+        self.ws.client.set_var(
+            contract='currency',
+            variable='balances',
+            arguments=[w.verifying_key],
+            value=1_000_000
+        )
+
+        self.ws.client.set_var(
+            contract='stamp_cost',
+            variable='S',
+            arguments=['value'],
+            value=1_000_000
+        )
+        self.ws.client.raw_driver.commit()
+
+        txs = [json.loads(build_transaction(
+            wallet=w,
+            processor=self.ws.wallet.verifying_key,
+            stamps=6000,
+            nonce=nonce,
+            contract='currency',
+            function='transfer',
+            kwargs={
+                'amount': 123,
+                'to': 'jeff'
+            }
+        )) for nonce in range(3)]
+
+        _, response = self.ws.app.test_client.post('/batch', data=json.dumps(txs))
+
+        self.assertEqual(response.json['accepted'], 3)
+        self.assertEqual(len(response.json['results']), 3)
+        self.assertTrue(all('hash' in result for result in response.json['results']))
+        self.assertEqual(len(os.listdir(self.ws.queue.txq)), 1)
+
+    def test_batch_accepts_reserved_nonces_out_of_order(self):
+        w = Wallet()
+
+        self.ws.client.set_var(contract='currency', variable='balances', arguments=[w.verifying_key], value=1_000_000)
+        self.ws.client.set_var(contract='stamp_cost', variable='S', arguments=['value'], value=1_000_000)
+        self.ws.client.raw_driver.commit()
+
+        self.ws.app.test_client.post('/nonce/{}/reserve?count=3'.format(w.verifying_key))
+
+        txs = [json.loads(build_transaction(
+            wallet=w,
+            processor=self.ws.wallet.verifying_key,
+            stamps=6000,
+            nonce=nonce,
+            contract='currency',
+            function='transfer',
+            kwargs={
+                'amount': 123,
+                'to': 'jeff'
+            }
+        )) for nonce in [2, 0, 1]]
+
+        _, response = self.ws.app.test_client.post('/batch', data=json.dumps(txs))
+
+        self.assertEqual(response.json['accepted'], 3)
+        self.assertEqual([tx['payload']['nonce'] for tx in self.ws.queue[:]], [0, 1, 2])
+
+    def test_batch_returns_result_per_transaction(self):
+        w = Wallet()
+
+        tx = json.loads(build_transaction(
+            wallet=w,
+            processor=self.ws.wallet.verifying_key,
+            stamps=6000,
+            nonce=0,
+            contract='currency',
+            function='transfer',
+            kwargs={
+                'amount': 123,
+                'to': 'jeff'
+            }
+        ))
+
+        _, response = self.ws.app.test_client.post('/batch', data=json.dumps([tx, 'not a tx']))
+
+        self.assertEqual(response.json['accepted'], 0)
+        self.assertEqual(response.json['rejected'], 2)
+        self.assertDictEqual(response.json['results'][0], {'error': 'Transaction sender has too few stamps for this transaction.'})
+        self.assertDictEqual(response.json['results'][1], {'error': 'Transaction is not formatted properly.'})
+        self.assertEqual(len(self.ws.queue), 0)
+
+    def test_batch_must_be_a_list(self):
+        _, response = self.ws.app.test_client.post('/batch', data=json.dumps({'payload': {}}))
+
+        self.assertEqual(response.status, 400)
+        self.assertDictEqual(response.json, {'error': 'Request body must be a list of transactions.'})
+
+    def test_large_body_is_only_accepted_by_batch_route(self):
+        server_kwargs = {'auto_reload': False, 'protocol': SizeLimitedHttpProtocol}
+        body = json.dumps(['a' * MAX_TX_SIZE])
+
+        _, response = self.ws.app.test_client.post('/', data=body, server_kwargs=server_kwargs)
+        self.assertEqual(response.status, 413)
+
+        _, response = self.ws.app.test_client.post('/batch', data=body, server_kwargs=server_kwargs)
+        self.assertEqual(response.status, 200)
+
+    def test_batch_that_does_not_fit_in_queue_is_rejected(self):
+        self.ws.max_queue_len = 2
+
+        _, response = self.ws.app.test_client.post('/batch', data=json.dumps(['not a tx'] * 3))
+
+        self.assertEqual(response.status, 503)
+
+    def test_metrics_count_rejected_submissions_and_cache_lookups(self):
+        _, response = self.ws.app.test_client.post('/batch', data=json.dumps(['not a tx']))
+        self.assertEqual(response.json['rejected'], 1)
+
+        _, response = self.ws.app.test_client.get('/metrics')
+
+        self.assertEqual(response.status, 200)
+        self.assertTrue(response.headers['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertIn('# TYPE lamden_webserver_tx_submissions_total counter', response.text)
+        self.assertIn('lamden_webserver_tx_submissions_total{result="rejected"}', response.text)
+        self.assertIn('lamden_webserver_cache_lookups_total{cache="blocks",result="hit"}', response.text)
+
     def test_fixed_objects_do_not_fail_signature(self):
         self.assertEqual(len(self.ws.queue), 0)
 
@@ -764,4 +1080,31 @@ class TestWebserverWebsockets(TestCase):
 
         block = self.messages[0]['data']
 
-        self.assertTrue(block.get('cached'))
\ No newline at end of file
+        self.assertTrue(block.get('cached'))
+    async def ws_send(self, message):
+        await self.websocket.send(json.dumps(message))
+
+    def test_ws_client_only_receives_events_matching_subscription(self):
+        self.await_async_task(self.ws_connect)
+        self.await_async_task(self.ws_get_next_message)
+
+        self.loop.run_until_complete(self.ws_send({'action': 'subscribe', 'filters': {'contract': 'con_wanted'}}))
+        self.await_async_task(self.ws_get_next_message)
+        self.assertEqual(self.messages[1]['event'], 'subscribed')
+
+        def block_for(contract):
+            return {
+                'number': 101,
+                'hash': 'xoxo',
+                'processed': {
+                    'state': [],
+                    'transaction': {'payload': {'contract': contract, 'function': 'f', 'sender': 'me'}}
+                }
+            }
+
+        EventWriter().write_event(Event(topics=self.ws.topics, data=block_for('con_other')))
+        EventWriter().write_event(Event(topics=self.ws.topics, data=block_for('con_wanted')))
+        self.await_async_task(self.ws_get_next_message)
+
+        self.assertEqual(len(self.messages), 3)
+        self.assertEqual(self.messages[2]['data']['processed']['transaction']['payload']['contract'], 'con_wanted')
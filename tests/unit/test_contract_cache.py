@@ -0,0 +1,84 @@
+from lamden.nodes.masternode.contract_cache import ContractMetadataCache
+from unittest import TestCase
+
+CODE = '''
+balances = Hash(default_value=0)
+owner = Variable()
+
+@export
+def transfer(amount: float, to: str):
+    balances[to] += amount
+'''
+
+NEW_CODE = '''
+balances = Hash(default_value=0)
+
+@export
+def mint(amount: float):
+    balances[ctx.caller] += amount
+'''
+
+
+class TestContractMetadataCache(TestCase):
+    def setUp(self):
+        self.cache = ContractMetadataCache(max_contracts=2)
+
+    def test_get_methods_parses_contract(self):
+        methods = self.cache.get_methods(contract='con_token', code=CODE)
+
+        self.assertEqual(methods[0]['name'], 'transfer')
+        self.assertEqual(self.cache.misses, 1)
+
+    def test_get_variables_parses_contract(self):
+        variables = self.cache.get_variables(contract='con_token', code=CODE)
+
+        self.assertIn('owner', variables['variables'])
+        self.assertIn('balances', variables['hashes'])
+
+    def test_same_code_is_only_parsed_once(self):
+        first = self.cache.get_methods(contract='con_token', code=CODE)
+        second = self.cache.get_methods(contract='con_token', code=str(CODE))
+
+        self.assertIs(first, second)
+        self.assertEqual(self.cache.hits, 1)
+
+    def test_changed_code_is_parsed_again(self):
+        self.cache.get_methods(contract='con_token', code=CODE)
+
+        methods = self.cache.get_methods(contract='con_token', code=NEW_CODE)
+
+        self.assertEqual(methods[0]['name'], 'mint')
+        self.assertEqual(self.cache.contracts['con_token'].code, NEW_CODE)
+        self.assertEqual(self.cache.misses, 2)
+
+    def test_least_recently_used_contract_is_evicted(self):
+        self.cache.get(contract='con_a', code=CODE)
+        self.cache.get(contract='con_b', code=CODE)
+        self.cache.get(contract='con_a', code=CODE)
+        self.cache.get(contract='con_c', code=CODE)
+
+        self.assertListEqual(list(self.cache.contracts.keys()), ['con_a', 'con_c'])
+
+    def test_invalidate_block_drops_contracts_with_new_code(self):
+        self.cache.get(contract='con_a', code=CODE)
+        self.cache.get(contract='con_b', code=CODE)
+
+        self.cache.invalidate_block({
+            'processed': {
+                'state': [
+                    {'key': 'con_a.__code__', 'value': NEW_CODE},
+                    {'key': 'con_b.balances:x', 'value': 1}
+                ]
+            }
+        })
+
+        self.assertNotIn('con_a', self.cache.contracts)
+        self.assertIn('con_b', self.cache.contracts)
+
+    def test_precompute_parses_methods_and_variables(self):
+        self.cache.precompute({'con_a': CODE, 'con_b': None})
+
+        metadata = self.cache.contracts['con_a']
+        self.assertIsNotNone(metadata._ContractMetadata__methods)
+        self.assertIsNotNone(metadata._ContractMetadata__variables)
+        self.assertNotIn('con_b', self.cache.contracts)
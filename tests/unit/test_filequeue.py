@@ -6,6 +6,7 @@ import json
 import os
 import pathlib
 import shutil
+import time
 
 class TestProcessingQueue(TestCase):
     def setUp(self):
@@ -75,4 +76,72 @@ class TestProcessingQueue(TestCase):
 
         self.assertIsNotNone(file_tx)
         self.assertEqual(len(self.tx_queue), 0)
-        self.assertEqual(file_tx['metadata'].get('signature'), file_signature)
\ No newline at end of file
+        self.assertEqual(file_tx['metadata'].get('signature'), file_signature)
+    def test_extend_writes_one_file_and_pops_each_tx(self):
+        node_wallet = Wallet()
+
+        txs = [json.loads(transaction.build_transaction(
+            wallet=Wallet(),
+            contract='currency',
+            function='transfer',
+            kwargs={
+                'to': Wallet().verifying_key,
+                'amount': {'__fixed__': '100.5'}
+            },
+            stamps=100,
+            processor=node_wallet.verifying_key,
+            nonce=1
+        )) for _ in range(3)]
+
+        self.tx_queue.extend(txs)
+
+        self.assertTrue(len(os.listdir(self.tx_queue.txq)) == 1)
+        self.assertEqual(len(self.tx_queue), 3)
+        self.assertEqual(self.tx_queue[2]['metadata'].get('signature'), txs[2]['metadata'].get('signature'))
+
+        for index, tx in enumerate(txs):
+            file_tx = self.tx_queue.pop(0)
+            self.assertEqual(file_tx['metadata'].get('signature'), tx['metadata'].get('signature'))
+            self.assertEqual(len(self.tx_queue), len(txs) - index - 1)
+
+        self.assertEqual(len(self.tx_queue), 0)
+        self.assertIsNone(self.tx_queue.pop(0))
+
+    def test_getitem_reads_across_pending_batch_and_single_files(self):
+        node_wallet = Wallet()
+
+        txs = [json.loads(transaction.build_transaction(
+            wallet=Wallet(),
+            contract='currency',
+            function='transfer',
+            kwargs={
+                'to': Wallet().verifying_key,
+                'amount': {'__fixed__': '100.5'}
+            },
+            stamps=100,
+            processor=node_wallet.verifying_key,
+            nonce=1
+        )) for _ in range(5)]
+
+        self.tx_queue.extend(txs[:3])
+        time.sleep(0.01)
+        self.tx_queue.append(tx=json.dumps(txs[3]).encode())
+        time.sleep(0.01)
+        self.tx_queue.extend(txs[4:])
+
+        # The rest of the first batch is held in memory after this
+        self.tx_queue.pop(0)
+
+        signatures = [tx['metadata'].get('signature') for tx in txs[1:]]
+
+        self.assertEqual(len(self.tx_queue), 4)
+        self.assertListEqual([self.tx_queue[i]['metadata'].get('signature') for i in range(4)], signatures)
+        self.assertEqual(self.tx_queue[-1]['metadata'].get('signature'), signatures[-1])
+
+        with self.assertRaises(IndexError):
+            self.tx_queue[4]
+
+    def test_extend_with_no_txs_writes_nothing(self):
+        self.tx_queue.extend([])
+
+        self.assertEqual(len(self.tx_queue), 0)
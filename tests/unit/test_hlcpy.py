@@ -1,6 +1,8 @@
+import random
 import time
 from unittest import TestCase
-from lamden.hlcpy import HLC, iso8601_to_nanos, nanos_to_iso8601
+from lamden.hlcpy import HLC, Formatter, iso8601_to_nanos, nanos_to_iso8601, parse_hlc, format_hlc, hlc_key
+from lamden.nodes.hlc import HLC_Clock
 
 class TestUtilsHLC(TestCase):
     def get_nanoseconds(self):
@@ -117,3 +119,100 @@ class TestUtilsHLC(TestCase):
         s = '2020-11-23T14:29:19.0011Z'
         nanos = 1606141759001100000
         self.assertEqual( iso8601_to_nanos(s), nanos)
+
+    def test_reserve_returns_increasing_ticks_with_their_own_nanos(self):
+        h1 = HLC()
+        h1.sync()
+        before = h1.tuple()
+
+        ticks = h1.reserve(100)
+
+        self.assertEqual(100, len(ticks))
+        self.assertLess(before, ticks[0])
+        self.assertEqual(ticks, sorted(ticks))
+        self.assertEqual(100, len({nanos for nanos, _ in ticks}))
+        self.assertEqual(ticks[-1], h1.tuple())
+
+    def test_reserve_after_a_future_event(self):
+        h1 = HLC()
+        future_nanos = self.get_nanoseconds() + int(10e9)
+        h1.merge(HLC(future_nanos, 3))
+
+        ticks = h1.reserve(2)
+
+        self.assertEqual([(future_nanos + 1, 0), (future_nanos + 2, 0)], ticks)
+
+    def test_reserve_nothing(self):
+        h1 = HLC(5, 1)
+        self.assertEqual([], h1.reserve(0))
+        self.assertEqual((5, 1), h1.tuple())
+
+    def test_without_lock(self):
+        h1 = HLC(threadsafe=False)
+        self.assertIsNone(h1.lock)
+
+        h1.sync()
+        h1.merge(HLC.from_now())
+        self.assertGreater(h1.nanos, 0)
+
+
+class TestHLCCodec(TestCase):
+    def test_parse_hlc_matches_iso8601_parser(self):
+        rng = random.Random(7)
+        for _ in range(1000):
+            nanos = rng.randrange(0, 4102444800 * 10**9)
+            logical = rng.randrange(0, 2**16)
+            s = format_hlc(nanos, logical)
+
+            self.assertEqual((iso8601_to_nanos(s.split('_')[0]), logical), parse_hlc(s))
+            self.assertEqual((nanos, logical), parse_hlc(s))
+
+    def test_parse_hlc_without_logical(self):
+        self.assertEqual((1658163894967101696, 0), parse_hlc('2022-07-18T17:04:54.967101696Z'))
+
+    def test_parse_hlc_falls_back_for_other_shapes(self):
+        self.assertEqual((1606141759001100000, 0), parse_hlc('2020-11-23T14:29:19.0011Z'))
+        self.assertEqual((1606141759001100000, 3), parse_hlc('2020-11-23T14:29:19.0011+00:00_3'))
+
+    def test_parse_hlc_raises_for_invalid_timestamps(self):
+        for s in ['', '1', '0000-00-00T00:00:00.000000000Z_0', '2022-13-18T17:04:54.967101696Z_0',
+                  '2022-07-18T24:04:54.967101696Z_0', '2022-07-18T17:04:54.967101696Z_x',
+                  '2022-07-18T17:04:54.967101696Z_65536']:
+            with self.assertRaises(ValueError):
+                parse_hlc(s)
+
+    def test_format_hlc_is_str(self):
+        h1 = HLC(1606141759001001001, 12)
+        self.assertEqual(str(h1), format_hlc(1606141759001001001, 12))
+        self.assertEqual('2020-11-23T14:29:19.001001001Z_12', format_hlc(1606141759001001001, 12))
+
+    def test_hlc_key_orders_by_nanos_then_logical(self):
+        timestamps = [format_hlc(nanos, logical) for nanos, logical in [(5, 10), (5, 9), (4, 65535), (6, 0)]]
+
+        ordered = sorted(timestamps, key=hlc_key)
+
+        self.assertEqual([format_hlc(4, 65535), format_hlc(5, 9), format_hlc(5, 10), format_hlc(6, 0)], ordered)
+        self.assertEqual(HLC(5, 9).key(), hlc_key(format_hlc(5, 9)))
+
+    def test_formatter_matches_format_hlc(self):
+        formatter = Formatter()
+        for nanos, logical in [(1606141759001001001, 0), (1606141759999999999, 4), (1606141760000000000, 0),
+                               (1606141759 * 1e9, 1)]:
+            self.assertEqual(format_hlc(nanos, logical), formatter.format(nanos, logical))
+
+
+class TestHLCClock(TestCase):
+    def test_single_loop_clock_timestamps_increase(self):
+        clock = HLC_Clock(single_loop=True)
+
+        timestamps = [clock.get_new_hlc_timestamp() for _ in range(10)]
+        timestamps += clock.reserve_hlc_timestamps(10)
+        timestamps.append(clock.get_new_hlc_timestamp())
+
+        self.assertEqual(sorted(timestamps, key=hlc_key), timestamps)
+        self.assertEqual(len(timestamps), len(set(timestamps)))
+
+    def test_reserve_hlc_timestamps_parse_back(self):
+        clock = HLC_Clock()
+        for timestamp in clock.reserve_hlc_timestamps(3):
+            self.assertEqual(timestamp, str(HLC.from_str(timestamp)))
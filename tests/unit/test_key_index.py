@@ -0,0 +1,101 @@
+from lamden.nodes.masternode.key_index import KeyIndex, KeyIndexError, parse_page_size, MAX_PAGE_SIZE
+from contracting.db.driver import FSDriver
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+PREFIX = 'currency.balances:'
+
+
+class MockDriver:
+    def __init__(self, keys):
+        self.keys = keys
+        self.iterations = 0
+
+    def iter(self, prefix=''):
+        self.iterations += 1
+        return [key for key in self.keys if key.startswith(prefix)]
+
+
+class TestKeyIndex(TestCase):
+    def setUp(self):
+        self.driver = MockDriver([PREFIX + k for k in ['d', 'b', 'a', 'c']] + ['currency.allowances:a'])
+        self.index = KeyIndex(driver=self.driver)
+
+    def test_page_returns_sorted_keys_and_cursor(self):
+        page, next_key = self.index.page(prefix=PREFIX, limit=3)
+
+        self.assertListEqual(page, [PREFIX + 'a', PREFIX + 'b', PREFIX + 'c'])
+        self.assertEqual(next_key, PREFIX + 'c')
+
+        page, next_key = self.index.page(prefix=PREFIX, start_after=next_key, limit=3)
+
+        self.assertListEqual(page, [PREFIX + 'd'])
+        self.assertIsNone(next_key)
+
+    def test_exact_last_page_has_no_cursor(self):
+        _, next_key = self.index.page(prefix=PREFIX, limit=4)
+
+        self.assertIsNone(next_key)
+
+    def test_start_after_between_keys(self):
+        page, next_key = self.index.page(prefix=PREFIX, start_after=PREFIX + 'bb', limit=10)
+
+        self.assertListEqual(page, [PREFIX + 'c', PREFIX + 'd'])
+        self.assertIsNone(next_key)
+
+    def test_every_page_reads_from_the_driver(self):
+        self.index.page(prefix=PREFIX)
+        self.driver.keys.append(PREFIX + 'e')
+
+        page, _ = self.index.page(prefix=PREFIX, start_after=PREFIX + 'd')
+
+        self.assertListEqual(page, [PREFIX + 'e'])
+        self.assertEqual(self.driver.iterations, 2)
+
+    def test_other_prefixes_are_not_returned(self):
+        page, _ = self.index.page(prefix='currency.allowances:')
+
+        self.assertListEqual(page, ['currency.allowances:a'])
+
+
+class TestKeyIndexFSDriver(TestCase):
+    def setUp(self):
+        self.temp_dir = TemporaryDirectory()
+        self.driver = FSDriver(root=self.temp_dir.name)
+
+        for key in ['d', 'b', 'a', 'c', 'a:x']:
+            self.driver.set(PREFIX + key, 1)
+        self.driver.set('currency.allowances:a', 1)
+
+        self.index = KeyIndex(driver=self.driver)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_pages_through_prefix_directory_in_key_order(self):
+        page, next_key = self.index.page(prefix=PREFIX, limit=3)
+
+        self.assertListEqual(page, [PREFIX + 'a', PREFIX + 'a:x', PREFIX + 'b'])
+        self.assertEqual(next_key, PREFIX + 'b')
+
+        page, next_key = self.index.page(prefix=PREFIX, start_after=next_key, limit=3)
+
+        self.assertListEqual(page, [PREFIX + 'c', PREFIX + 'd'])
+        self.assertIsNone(next_key)
+
+    def test_deleted_keys_are_not_returned(self):
+        self.driver.delete(PREFIX + 'b')
+
+        page, _ = self.index.page(prefix=PREFIX)
+
+        self.assertNotIn(PREFIX + 'b', page)
+
+    def test_missing_prefix_is_empty(self):
+        self.assertEqual(self.index.page(prefix='currency.missing:'), ([], None))
+
+    def test_parse_page_size(self):
+        self.assertEqual(parse_page_size('10'), 10)
+
+        for limit in ['0', str(MAX_PAGE_SIZE + 1), 'x']:
+            with self.assertRaises(KeyIndexError):
+                parse_page_size(limit)
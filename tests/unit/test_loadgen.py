@@ -0,0 +1,206 @@
+from aiohttp import web
+from contracting.db.encoder import encode
+from lamden.cli.loadgen import LoadGenerator, interleave, sign_transactions
+from lamden.crypto.wallet import Wallet, verify
+from collections import Counter
+from unittest import TestCase
+import asyncio
+import json
+import time
+
+PORT = 19097
+URL = f'http://127.0.0.1:{PORT}'
+
+
+class StubWebserver:
+    # Answers like a masternode webserver, transactions with an odd nonce are rejected
+    def __init__(self, answer_delay: float = 0):
+        self.processor = Wallet()
+        self.answer_delay = answer_delay
+        self.received = []
+
+        # sender -> requests being answered, and the most seen at once
+        self.in_flight = Counter()
+        self.max_in_flight = 0
+
+        self.app = web.Application()
+        self.app.router.add_get('/id', self.get_id)
+        self.app.router.add_get('/nonce/{vk}', self.get_nonce)
+        self.app.router.add_post('/', self.submit_transaction)
+
+        self.runner = web.AppRunner(self.app)
+
+    async def start(self):
+        await self.runner.setup()
+        await web.TCPSite(self.runner, '127.0.0.1', PORT).start()
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+    async def get_id(self, request):
+        return web.json_response({'verifying_key': self.processor.verifying_key})
+
+    async def get_nonce(self, request):
+        return web.json_response({'nonce': 4})
+
+    async def submit_transaction(self, request):
+        tx = json.loads(await request.text())
+        self.received.append(tx)
+
+        sender = tx['payload']['sender']
+        self.in_flight[sender] += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight[sender])
+        try:
+            # Later requests are answered first, like a busy webserver might
+            await asyncio.sleep(self.answer_delay or 0.01 / (1 + len(self.received)))
+        finally:
+            self.in_flight[sender] -= 1
+
+        if tx['payload']['nonce'] % 2:
+            return web.json_response({'error': 'Transaction nonce is invalid.'})
+        return web.json_response({'success': 'Transaction successfully submitted to the network.', 'hash': 'a' * 64})
+
+
+class TestInterleave(TestCase):
+    def test_round_robin_over_batches(self):
+        self.assertEqual([1, 'a', 2, 'b', 3, 'c'], interleave([[1, 2, 3], ['a', 'b', 'c']]))
+
+    def test_uneven_batches(self):
+        self.assertEqual([1, 'a', 'x', 2, 'b', 3], interleave([[1, 2, 3], ['a', 'b'], ['x']]))
+
+    def test_empty_batches(self):
+        self.assertEqual([], interleave([]))
+        self.assertEqual([1], interleave([[], [1]]))
+
+
+class TestSignTransactions(TestCase):
+    def test_consecutive_nonces_from_start_nonce(self):
+        wallet = Wallet()
+        processor = Wallet().verifying_key
+
+        txs = sign_transactions(wallet.signing_key, processor, 7, 3, 'currency', 'transfer',
+                                {'amount': 1, 'to': 'a' * 64}, 50)
+
+        self.assertEqual(3, len(txs))
+
+        for nonce, tx in zip(range(7, 10), txs):
+            tx = json.loads(tx)
+            payload = tx['payload']
+
+            self.assertEqual(nonce, payload['nonce'])
+            self.assertEqual(wallet.verifying_key, payload['sender'])
+            self.assertEqual(processor, payload['processor'])
+            self.assertEqual(50, payload['stamps_supplied'])
+            self.assertEqual({'amount': 1, 'to': 'a' * 64}, payload['kwargs'])
+            self.assertTrue(verify(wallet.verifying_key, encode(payload), tx['metadata']['signature']))
+
+    def test_nothing_to_sign(self):
+        self.assertEqual([], sign_transactions(Wallet().signing_key, Wallet().verifying_key, 0, 0, 'currency',
+                                               'transfer', {}, 50))
+
+
+class TestLoadGenerator(TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.server = None
+
+    def tearDown(self):
+        if self.server is not None:
+            self.loop.run_until_complete(self.server.stop())
+        self.loop.close()
+
+    def start_server(self, answer_delay: float = 0):
+        self.server = StubWebserver(answer_delay=answer_delay)
+        self.loop.run_until_complete(self.server.start())
+
+    def run_generator(self, generator: LoadGenerator, **kwargs) -> dict:
+        return self.loop.run_until_complete(generator.run(**kwargs))
+
+    def test_closed_loop_counts_accepted_and_rejects(self):
+        self.start_server()
+        generator = LoadGenerator(urls=[URL], wallets=[Wallet(), Wallet()], workers=1, concurrency=4)
+
+        results = self.run_generator(generator, num_of_txs=8)
+
+        # Nonces start at 4, so every second transaction of each wallet is rejected
+        self.assertEqual(8, results['sent'])
+        self.assertEqual(4, results['accepted'])
+        self.assertEqual(4, results['rejected'])
+        self.assertEqual({'Transaction nonce is invalid.': 4}, results['rejects'])
+        self.assertEqual({}, results['errors'])
+        self.assertEqual(8, len(generator.latencies))
+        self.assertGreater(results['latency_seconds']['max'], 0)
+
+    def test_open_loop_sends_every_transaction(self):
+        self.start_server()
+        generator = LoadGenerator(urls=[URL], wallets=[Wallet(), Wallet()], workers=1)
+
+        results = self.run_generator(generator, num_of_txs=6, rate=100)
+
+        self.assertEqual(6, len(self.server.received))
+        self.assertEqual(6, results['sent'])
+        self.assertEqual(4, results['accepted'])
+        self.assertEqual({'Transaction nonce is invalid.': 2}, results['rejects'])
+        self.assertEqual(100, results['target_rate'])
+
+        # Consecutive transactions come from different wallets
+        senders = [tx['payload']['sender'] for tx in self.server.received]
+        self.assertNotEqual(senders[0], senders[1])
+
+    def test_open_loop_latency_is_measured_from_schedule(self):
+        self.start_server(answer_delay=0.05)
+        generator = LoadGenerator(urls=[URL], wallets=[Wallet()], workers=1)
+
+        self.run_generator(generator, num_of_txs=2, rate=100)
+
+        self.assertEqual(2, len(generator.latencies))
+        self.assertTrue(all(latency >= 0.05 for latency in generator.latencies))
+
+    def test_open_loop_cancels_unanswered_after_grace(self):
+        self.start_server(answer_delay=60)
+        generator = LoadGenerator(urls=[URL], wallets=[Wallet(), Wallet(), Wallet()], workers=1, grace=0.2)
+
+        started = time.time()
+        results = self.run_generator(generator, num_of_txs=3, rate=100)
+
+        self.assertLess(time.time() - started, 10)
+        self.assertEqual(3, results['sent'])
+        self.assertEqual(0, results['accepted'])
+        self.assertEqual({'Unanswered': 3}, results['errors'])
+        self.assertEqual([], generator.latencies)
+
+    def test_open_loop_stops_at_duration(self):
+        self.start_server()
+        generator = LoadGenerator(urls=[URL], wallets=[Wallet()], workers=1)
+
+        results = self.run_generator(generator, num_of_txs=20, rate=10, duration=0.25)
+
+        self.assertLess(results['sent'], 20)
+        self.assertEqual(results['sent'], len(self.server.received))
+
+    def nonces_by_sender(self) -> dict:
+        nonces = {}
+        for tx in self.server.received:
+            nonces.setdefault(tx['payload']['sender'], []).append(tx['payload']['nonce'])
+        return nonces
+
+    def test_closed_loop_sends_each_sender_in_nonce_order(self):
+        self.start_server()
+        generator = LoadGenerator(urls=[URL], wallets=[Wallet(), Wallet()], workers=1, concurrency=10)
+
+        self.run_generator(generator, num_of_txs=20)
+
+        for nonces in self.nonces_by_sender().values():
+            self.assertEqual(nonces, list(range(4, 14)))
+        self.assertEqual(1, self.server.max_in_flight)
+
+    def test_open_loop_sends_each_sender_in_nonce_order(self):
+        self.start_server()
+        generator = LoadGenerator(urls=[URL], wallets=[Wallet(), Wallet()], workers=1)
+
+        self.run_generator(generator, num_of_txs=20, rate=1000)
+
+        for nonces in self.nonces_by_sender().values():
+            self.assertEqual(nonces, list(range(4, 14)))
+        self.assertEqual(1, self.server.max_in_flight)
@@ -0,0 +1,201 @@
+from lamden import metrics
+from lamden.metrics import Registry, MetricsServer
+from unittest import TestCase
+import asyncio
+
+
+class Queue:
+    def __init__(self, items):
+        self.items = items
+
+    def __len__(self):
+        return len(self.items)
+
+
+class TestRegistry(TestCase):
+    def setUp(self):
+        self.registry = Registry()
+
+    def test_counter_renders_help_type_and_value(self):
+        counter = self.registry.counter('test_total', 'A test counter.')
+        counter.inc()
+        counter.inc(2)
+
+        self.assertEqual(self.registry.render(), '# HELP test_total A test counter.\n'
+                                                 '# TYPE test_total counter\n'
+                                                 'test_total 3\n')
+
+    def test_labelled_counter_renders_one_line_per_child(self):
+        counter = self.registry.counter('test_total', 'A test counter.', ('result', ))
+        counter.labels('miss').inc()
+        counter.labels('hit').inc(5)
+
+        lines = self.registry.render().splitlines()
+
+        self.assertEqual(lines[2:], ['test_total{result="hit"} 5', 'test_total{result="miss"} 1'])
+
+    def test_labels_requires_every_label(self):
+        counter = self.registry.counter('test_total', 'A test counter.', ('socket', 'peer'))
+
+        with self.assertRaises(ValueError):
+            counter.labels('router')
+
+    def test_label_values_are_escaped(self):
+        counter = self.registry.counter('test_total', 'A test counter.', ('peer', ))
+        counter.labels('a"b\\c\nd').inc()
+
+        self.assertIn('test_total{peer="a\\"b\\\\c\\nd"} 1', self.registry.render())
+
+    def test_gauge_set_and_dec(self):
+        gauge = self.registry.gauge('test_depth', 'A test gauge.')
+        gauge.set(10)
+        gauge.dec(3)
+
+        self.assertEqual(gauge.value, 7)
+        self.assertIn('# TYPE test_depth gauge', self.registry.render())
+
+    def test_gauge_function_is_read_when_rendered(self):
+        queue = []
+        gauge = self.registry.gauge('test_depth', 'A test gauge.')
+        gauge.set_function(lambda: len(queue))
+
+        queue.extend([1, 2])
+
+        self.assertIn('test_depth 2', self.registry.render())
+
+    def test_labelled_function_returns_dict(self):
+        counter = self.registry.counter('test_total', 'A test counter.', ('cache', 'result'))
+        counter.set_function(lambda: {('blocks', 'hit'): 4, ('blocks', 'miss'): 1})
+
+        lines = self.registry.render().splitlines()
+
+        self.assertEqual(lines[2:], ['test_total{cache="blocks",result="hit"} 4',
+                                     'test_total{cache="blocks",result="miss"} 1'])
+
+    def test_instance_values_renders_one_line_per_instance(self):
+        first, second = Queue([1]), Queue([1, 2])
+        depths = metrics.InstanceValues(len)
+        depths.add(first, 'node_1')
+        depths.add(second, 'node_2')
+
+        gauge = self.registry.gauge('test_depth', 'A test gauge.', ('node', ))
+        gauge.set_function(depths)
+
+        lines = self.registry.render().splitlines()
+
+        self.assertEqual(lines[2:], ['test_depth{node="node_1"} 1', 'test_depth{node="node_2"} 2'])
+
+    def test_instance_values_does_not_keep_instances_alive(self):
+        queue = Queue([])
+        depths = metrics.InstanceValues(len)
+        depths.add(queue, 'node_1')
+
+        del queue
+
+        self.assertEqual(len(depths), 0)
+        self.assertDictEqual(depths(), {})
+
+    def test_metric_must_define_its_children(self):
+        with self.assertRaises(TypeError):
+            metrics.Metric('test_total', 'A test metric.')
+
+    def test_failing_function_renders_no_samples(self):
+        gauge = self.registry.gauge('test_depth', 'A test gauge.')
+        gauge.set_function(lambda: 1 / 0)
+
+        self.assertEqual(len(self.registry.render().splitlines()), 2)
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = self.registry.histogram('test_seconds', 'A test histogram.', buckets=(0.1, 1))
+        histogram.observe(0.05)
+        histogram.observe(0.1)
+        histogram.observe(0.5)
+        histogram.observe(3)
+
+        lines = self.registry.render().splitlines()
+
+        self.assertEqual(lines[2:], [
+            'test_seconds_bucket{le="0.1"} 2',
+            'test_seconds_bucket{le="1"} 3',
+            'test_seconds_bucket{le="+Inf"} 4',
+            'test_seconds_count 4',
+            'test_seconds_sum 3.65'
+        ])
+
+    def test_register_twice_returns_the_same_metric(self):
+        first = self.registry.counter('test_total', 'A test counter.')
+        second = self.registry.counter('test_total', 'A test counter.')
+
+        self.assertIs(first, second)
+        self.assertEqual(len(self.registry), 1)
+
+    def test_register_twice_with_other_type_raises(self):
+        self.registry.counter('test_total', 'A test counter.')
+
+        with self.assertRaises(ValueError):
+            self.registry.gauge('test_total', 'A test gauge.')
+
+    def test_clear_resets_values(self):
+        counter = self.registry.counter('test_total', 'A test counter.')
+        counter.inc()
+
+        self.registry.clear()
+
+        self.assertEqual(counter.value, 0)
+
+
+class TestMetricsServer(TestCase):
+    def setUp(self):
+        self.registry = Registry()
+        self.registry.counter('test_total', 'A test counter.').inc()
+
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+        self.server = MetricsServer(registry=self.registry, host='127.0.0.1', port=19095)
+        self.loop.run_until_complete(self.server.start())
+
+    def tearDown(self):
+        self.loop.run_until_complete(self.server.stop())
+        self.loop.close()
+
+    def get(self, path):
+        async def request():
+            reader, writer = await asyncio.open_connection('127.0.0.1', 19095)
+            writer.write(f'GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode())
+            res = await reader.read()
+            writer.close()
+            return res.decode()
+
+        return self.loop.run_until_complete(request())
+
+    def test_serves_rendered_registry(self):
+        res = self.get('/metrics')
+
+        self.assertTrue(res.startswith('HTTP/1.1 200 OK'))
+        self.assertIn(f'Content-Type: {metrics.CONTENT_TYPE}', res)
+        self.assertTrue(res.endswith(self.registry.render()))
+
+    def test_other_paths_are_not_found(self):
+        self.assertTrue(self.get('/').startswith('HTTP/1.1 404 Not Found'))
+
+    def test_added_route_gets_query_args(self):
+        self.server.add_route('/echo', lambda args: args['value'])
+
+        res = self.get('/echo?value=abc')
+
+        self.assertIn('Content-Type: application/json', res)
+        self.assertTrue(res.endswith('abc'))
+
+    def test_handler_value_error_is_bad_request(self):
+        def handler(args):
+            raise ValueError('bad')
+
+        self.server.add_route('/bad', handler)
+
+        self.assertTrue(self.get('/bad').startswith('HTTP/1.1 400 Bad Request'))
+
+    def test_stop_closes_server(self):
+        self.loop.run_until_complete(self.server.stop())
+
+        self.assertFalse(self.server.is_running)
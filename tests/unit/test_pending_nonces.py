@@ -0,0 +1,182 @@
+from lamden.nodes.masternode.pending_nonces import PendingNonces
+from lamden.storage import NonceStorage
+from pathlib import Path
+from unittest import TestCase
+import shutil
+
+PROCESSOR = 'p' * 64
+SENDER = 's' * 64
+
+
+class TestPendingNonces(TestCase):
+    def setUp(self):
+        self.temp_storage_dir = Path.cwd().joinpath('temp_pending_nonces')
+        if self.temp_storage_dir.is_dir():
+            shutil.rmtree(self.temp_storage_dir)
+
+        self.nonces = NonceStorage(root=self.temp_storage_dir, write_back=True)
+        self.pending_nonces = PendingNonces(nonces=self.nonces, processor=PROCESSOR)
+
+    def tearDown(self):
+        if self.temp_storage_dir.is_dir():
+            shutil.rmtree(self.temp_storage_dir)
+
+    def test_get_next_nonce_is_zero_for_new_sender(self):
+        self.assertEqual(self.pending_nonces.get_next_nonce(sender=SENDER), 0)
+
+    def test_get_next_nonce_follows_stored_nonce(self):
+        self.nonces.set_nonce(sender=SENDER, processor=PROCESSOR, value=4)
+
+        self.assertEqual(self.pending_nonces.get_next_nonce(sender=SENDER), 5)
+
+    def test_reserve_returns_consecutive_ranges(self):
+        self.assertEqual(self.pending_nonces.reserve(sender=SENDER, count=10), (0, 9))
+        self.assertEqual(self.pending_nonces.reserve(sender=SENDER, count=5), (10, 14))
+        self.assertEqual(self.pending_nonces.get_next_nonce(sender=SENDER), 15)
+
+    def test_reserve_rejects_bad_counts(self):
+        with self.assertRaises(ValueError):
+            self.pending_nonces.reserve(sender=SENDER, count=0)
+
+        with self.assertRaises(ValueError):
+            self.pending_nonces.reserve(sender=SENDER, count=self.pending_nonces.max_reservation + 1)
+
+    def test_expired_reservation_is_ignored(self):
+        self.pending_nonces.reservation_ttl = -1
+        self.pending_nonces.reserve(sender=SENDER, count=10)
+
+        self.assertEqual(self.pending_nonces.get_next_nonce(sender=SENDER), 0)
+        self.assertEqual(len(self.pending_nonces), 0)
+
+    def test_accept_records_increasing_nonces(self):
+        start, end = self.pending_nonces.reserve(sender=SENDER, count=3)
+
+        for nonce in range(start, end + 1):
+            self.pending_nonces.accept(sender=SENDER, nonce=nonce)
+
+        self.assertEqual(self.nonces.get_nonce(sender=SENDER, processor=PROCESSOR), 2)
+
+    def test_using_last_reserved_nonce_releases_reservation(self):
+        self.pending_nonces.reserve(sender=SENDER, count=2)
+        self.pending_nonces.accept(sender=SENDER, nonce=0)
+        self.assertEqual(len(self.pending_nonces), 1)
+
+        self.pending_nonces.accept(sender=SENDER, nonce=1)
+        self.assertEqual(len(self.pending_nonces), 0)
+
+    def test_confirm_block_reconciles_stored_nonce(self):
+        self.pending_nonces.reserve(sender=SENDER, count=3)
+
+        self.pending_nonces.confirm_block({
+            'processed': {'transaction': {'payload': {'processor': PROCESSOR, 'sender': SENDER, 'nonce': 2}}}
+        })
+
+        self.assertEqual(self.nonces.get_nonce(sender=SENDER, processor=PROCESSOR), 2)
+        self.assertEqual(len(self.pending_nonces), 0)
+
+    def test_confirm_block_does_not_lower_stored_nonce(self):
+        self.nonces.set_nonce(sender=SENDER, processor=PROCESSOR, value=10)
+
+        self.pending_nonces.accept(sender=SENDER, nonce=2)
+
+        self.assertEqual(self.nonces.get_nonce(sender=SENDER, processor=PROCESSOR), 10)
+
+    def test_confirm_block_ignores_other_processors(self):
+        self.pending_nonces.confirm_block({
+            'processed': {'transaction': {'payload': {'processor': 'x' * 64, 'sender': SENDER, 'nonce': 2}}}
+        })
+
+        self.assertIsNone(self.nonces.get_nonce(sender=SENDER, processor=PROCESSOR))
+
+    def test_confirm_block_ignores_genesis_block(self):
+        self.pending_nonces.confirm_block({'number': 0, 'genesis': []})
+
+        self.assertEqual(len(self.pending_nonces), 0)
+
+    def test_prune_drops_expired_reservations(self):
+        self.pending_nonces.reserve(sender=SENDER, count=2)
+        self.pending_nonces.reservations[SENDER].expires_at = 0
+
+        self.assertEqual(self.pending_nonces.prune(), [])
+        self.assertEqual(len(self.pending_nonces), 0)
+
+    def test_reserved_range_accepted_out_of_order(self):
+        start, end = self.pending_nonces.reserve(sender=SENDER, count=5)
+        self.assertEqual((start, end), (0, 4))
+
+        queued = []
+        for nonce in [2, 4, 1, 0, 3]:
+            self.assertTrue(self.pending_nonces.check(sender=SENDER, nonce=nonce))
+            queued.extend(self.pending_nonces.accept(sender=SENDER, nonce=nonce, tx=f'tx{nonce}'))
+
+        self.assertEqual(queued, ['tx0', 'tx1', 'tx2', 'tx3', 'tx4'])
+        self.assertEqual(self.nonces.get_nonce(sender=SENDER, processor=PROCESSOR), 4)
+        self.assertEqual(len(self.pending_nonces), 0)
+
+    def test_stored_nonce_only_moves_over_contiguous_nonces(self):
+        self.pending_nonces.reserve(sender=SENDER, count=5)
+
+        self.assertEqual(self.pending_nonces.accept(sender=SENDER, nonce=2, tx='tx2'), [])
+        self.assertIsNone(self.nonces.get_nonce(sender=SENDER, processor=PROCESSOR))
+
+        self.assertEqual(self.pending_nonces.accept(sender=SENDER, nonce=0, tx='tx0'), ['tx0'])
+        self.assertEqual(self.nonces.get_nonce(sender=SENDER, processor=PROCESSOR), 0)
+
+        self.assertTrue(self.pending_nonces.check(sender=SENDER, nonce=1))
+        self.assertEqual(self.pending_nonces.accept(sender=SENDER, nonce=1, tx='tx1'), ['tx1', 'tx2'])
+        self.assertEqual(self.nonces.get_nonce(sender=SENDER, processor=PROCESSOR), 2)
+
+    def test_reserved_nonce_is_only_accepted_once(self):
+        self.pending_nonces.reserve(sender=SENDER, count=5)
+        self.pending_nonces.accept(sender=SENDER, nonce=2, tx='tx2')
+        self.pending_nonces.accept(sender=SENDER, nonce=0, tx='tx0')
+
+        self.assertFalse(self.pending_nonces.check(sender=SENDER, nonce=2))
+        self.assertFalse(self.pending_nonces.check(sender=SENDER, nonce=0))
+        self.assertTrue(self.pending_nonces.check(sender=SENDER, nonce=1))
+
+    def test_check_without_reservation_needs_higher_nonce(self):
+        self.nonces.set_nonce(sender=SENDER, processor=PROCESSOR, value=3)
+
+        self.assertFalse(self.pending_nonces.check(sender=SENDER, nonce=3))
+        self.assertTrue(self.pending_nonces.check(sender=SENDER, nonce=5))
+        self.assertEqual(self.pending_nonces.accept(sender=SENDER, nonce=5, tx='tx5'), ['tx5'])
+
+    def test_nonce_past_reservation_releases_held_transactions(self):
+        self.pending_nonces.reserve(sender=SENDER, count=3)
+        self.pending_nonces.accept(sender=SENDER, nonce=1, tx='tx1')
+
+        self.assertEqual(self.pending_nonces.accept(sender=SENDER, nonce=5, tx='tx5'), ['tx1', 'tx5'])
+        self.assertEqual(self.nonces.get_nonce(sender=SENDER, processor=PROCESSOR), 5)
+        self.assertEqual(len(self.pending_nonces), 0)
+
+    def test_second_reservation_keeps_held_transactions(self):
+        self.pending_nonces.reserve(sender=SENDER, count=2)
+        self.pending_nonces.accept(sender=SENDER, nonce=1, tx='tx1')
+
+        self.assertEqual(self.pending_nonces.reserve(sender=SENDER, count=2), (2, 3))
+        self.assertEqual(self.pending_nonces.accept(sender=SENDER, nonce=0, tx='tx0'), ['tx0', 'tx1'])
+        self.assertEqual(len(self.pending_nonces), 1)
+
+    def test_prune_hands_back_held_transactions_of_expired_reservation(self):
+        self.pending_nonces.reserve(sender=SENDER, count=5)
+        self.pending_nonces.accept(sender=SENDER, nonce=3, tx='tx3')
+        self.pending_nonces.accept(sender=SENDER, nonce=1, tx='tx1')
+        self.pending_nonces.reservations[SENDER].expires_at = 0
+
+        self.assertEqual(self.pending_nonces.get_next_nonce(sender=SENDER), 5)
+        self.assertEqual(self.pending_nonces.prune(), ['tx1', 'tx3'])
+        self.assertEqual(self.nonces.get_nonce(sender=SENDER, processor=PROCESSOR), 3)
+        self.assertEqual(len(self.pending_nonces), 0)
+
+    def test_confirm_block_drops_held_transactions_it_moved_past(self):
+        self.pending_nonces.reserve(sender=SENDER, count=5)
+        self.pending_nonces.accept(sender=SENDER, nonce=1, tx='tx1')
+        self.pending_nonces.accept(sender=SENDER, nonce=3, tx='tx3')
+
+        released = self.pending_nonces.confirm_block({
+            'processed': {'transaction': {'payload': {'processor': PROCESSOR, 'sender': SENDER, 'nonce': 2}}}
+        })
+
+        self.assertEqual(released, ['tx3'])
+        self.assertEqual(self.nonces.get_nonce(sender=SENDER, processor=PROCESSOR), 3)
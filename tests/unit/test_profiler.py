@@ -0,0 +1,97 @@
+from lamden.nodes.profiler import Profiler, collapse_stack, percentile, COLLAPSED, PSTATS
+from unittest import TestCase
+import asyncio
+import json
+import pathlib
+import pstats
+import shutil
+import sys
+import time
+
+
+def block_loop(seconds):
+    time.sleep(seconds)
+
+
+class TestProfiler(TestCase):
+    def setUp(self):
+        self.root = pathlib.Path().cwd().joinpath('temp_profiles')
+        self.addCleanup(shutil.rmtree, self.root, True)
+
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.addCleanup(self.loop.close)
+
+        self.profiler = Profiler(root=self.root, interval=0.001, lag_interval=0.005)
+        self.profiler.loop = self.loop
+
+    def run_profile(self, mode, seconds=0.3):
+        async def work():
+            self.profiler.start(seconds=seconds, mode=mode)
+            await asyncio.sleep(0.05)
+            block_loop(0.1)
+            while self.profiler.running:
+                await asyncio.sleep(0.01)
+
+        self.loop.run_until_complete(work())
+
+    def test_collapsed_profile_samples_loop_stack_and_lag(self):
+        self.run_profile(COLLAPSED)
+
+        collapsed = list(self.root.glob('*.collapsed'))
+        self.assertEqual(len(collapsed), 1)
+        self.assertIn(f'{__name__}:block_loop', collapsed[0].read_text())
+
+        lag = json.loads(list(self.root.glob('*.lag.json'))[0].read_text())
+        self.assertGreater(lag['samples'], 0)
+        self.assertGreaterEqual(lag['max'], 0.09)
+
+    def test_pstats_profile_is_loadable(self):
+        self.run_profile(PSTATS)
+
+        stats = pstats.Stats(str(list(self.root.glob('*.pstats'))[0]))
+
+        self.assertTrue(any(name == 'block_loop' for _, _, name in stats.stats))
+
+    def test_start_while_running_returns_status(self):
+        async def work():
+            first = self.profiler.start(seconds=1)
+            second = self.profiler.start(seconds=1)
+            self.profiler.stop()
+            return first, second
+
+        first, second = self.loop.run_until_complete(work())
+
+        self.assertEqual(first['started'], second['started'])
+        self.assertFalse(self.profiler.running)
+
+    def test_rejects_bad_arguments(self):
+        with self.assertRaises(ValueError):
+            self.profiler.start(seconds=1, mode='other')
+
+        with self.assertRaises(ValueError):
+            self.profiler.handle_request({'seconds': 'a'})
+
+        with self.assertRaises(ValueError):
+            self.profiler.start(seconds=0)
+
+        for seconds in ['nan', 'inf']:
+            with self.assertRaises(ValueError):
+                self.profiler.handle_request({'seconds': seconds})
+
+        self.assertFalse(self.profiler.running)
+
+    def test_stop_when_not_running_does_nothing(self):
+        self.assertEqual(self.profiler.stop(), [])
+
+
+class TestHelpers(TestCase):
+    def test_collapse_stack_is_outermost_first(self):
+        stack = collapse_stack(sys._getframe())
+
+        self.assertTrue(stack.endswith(f'{__name__}:test_collapse_stack_is_outermost_first'))
+
+    def test_percentile(self):
+        self.assertEqual(percentile([], 0.5), 0)
+        self.assertEqual(percentile([3, 1, 2, 4], 0.5), 3)
+        self.assertEqual(percentile([3, 1, 2, 4], 0.99), 4)
@@ -0,0 +1,163 @@
+from contracting.client import ContractingClient
+from contracting.db.driver import ContractDriver, InMemDriver
+from contracting.db.encoder import decode
+from copy import deepcopy
+from lamden.contracts import sync
+from lamden.crypto.canonical import block_from_tx_results
+from lamden.crypto.transaction import build_transaction
+from lamden.crypto.wallet import Wallet
+from lamden.nodes import replay
+from lamden.nodes.hlc import HLC_Clock
+from lamden.nodes.processing_queue import TxProcessingQueue
+from lamden.storage import BlockStorage
+from pathlib import Path
+from unittest import TestCase
+import shutil
+
+
+class TestReplayer(TestCase):
+    def setUp(self):
+        self.root = Path().cwd().joinpath('temp_replay')
+        if self.root.is_dir():
+            shutil.rmtree(self.root)
+
+        self.blocks = BlockStorage(root=self.root)
+
+        self.wallet = Wallet()
+        self.sender_wallet = Wallet()
+        self.receiver_wallet = Wallet()
+        self.hlc_clock = HLC_Clock()
+
+        self.source_driver = self.create_driver()
+        self.replay_driver = self.create_driver()
+
+        self.source_queue = TxProcessingQueue(
+            driver=self.source_driver,
+            client=ContractingClient(driver=self.source_driver),
+            wallet=self.wallet,
+            hlc_clock=self.hlc_clock,
+            processing_delay=lambda: {'base': 0, 'self': 0},
+            stop_node=lambda: None,
+            reprocess=None,
+            get_last_hlc_in_consensus=lambda: '0',
+            check_if_already_has_consensus=lambda hlc_timestamp: (None, None),
+            pause_all_queues=None,
+            unpause_all_queues=None
+        )
+
+        self.previous_hash = 64 * '0'
+
+    def tearDown(self):
+        if self.root.is_dir():
+            shutil.rmtree(self.root)
+
+    def create_driver(self) -> ContractDriver:
+        driver = ContractDriver(driver=InMemDriver())
+        client = ContractingClient(driver=driver)
+        client.flush()
+
+        sync.setup_genesis_contracts(['stu', 'raghu', 'steve'], client=client)
+
+        driver.driver.set(f'currency.balances:{self.sender_wallet.verifying_key}', 1_000_000)
+        return driver
+
+    def mint_block(self, nonce: int, amount: int = 5) -> dict:
+        tx = decode(build_transaction(
+            wallet=self.sender_wallet,
+            contract='currency',
+            function='transfer',
+            kwargs={'amount': amount, 'to': self.receiver_wallet.verifying_key},
+            nonce=nonce,
+            processor=self.wallet.verifying_key,
+            stamps=100
+        ))
+
+        hlc_timestamp = self.hlc_clock.get_new_hlc_timestamp()
+        processing_results = self.source_queue.process_tx(tx={
+            'tx': tx,
+            'hlc_timestamp': hlc_timestamp,
+            'signature': self.wallet.sign(f'{hlc_timestamp}'),
+            'sender': self.wallet.verifying_key
+        })
+
+        self.source_driver.soft_apply(hcl=hlc_timestamp)
+        self.source_driver.hard_apply_one(hlc=hlc_timestamp)
+
+        block = block_from_tx_results(processing_results=processing_results, proofs=[processing_results['proof']],
+                                      prev_block_hash=self.previous_hash, wallet=self.wallet)
+        self.previous_hash = block['hash']
+
+        return block
+
+    def store_blocks(self, amount: int) -> list:
+        blocks = [self.mint_block(nonce=nonce) for nonce in range(amount)]
+        for block in blocks:
+            self.blocks.store_block(deepcopy(block))
+        return blocks
+
+    def get_receiver_balance(self, driver: ContractDriver):
+        return driver.get_var(contract='currency', variable='balances', arguments=[self.receiver_wallet.verifying_key])
+
+    def test_run__replays_blocks_to_the_stored_results(self):
+        self.store_blocks(amount=3)
+
+        results = replay.Replayer(blocks=self.blocks, driver=self.replay_driver).run()
+
+        self.assertEqual(3, results['txs'])
+        self.assertEqual(0, results['mismatches'])
+        self.assertTrue(results['verified'])
+        self.assertEqual(self.get_receiver_balance(self.source_driver), self.get_receiver_balance(self.replay_driver))
+
+    def test_run__reports_blocks_with_changed_state(self):
+        blocks = [self.mint_block(nonce=nonce) for nonce in range(2)]
+        blocks[1]['processed']['state'][0]['value'] = 1
+
+        for block in blocks:
+            self.blocks.store_block(deepcopy(block))
+
+        results = replay.Replayer(blocks=self.blocks, driver=self.replay_driver).run()
+
+        self.assertEqual(1, results['mismatches'])
+        self.assertEqual(blocks[1]['number'], results['first_mismatches'][0]['number'])
+        self.assertEqual(replay.STATE_MISMATCH, results['first_mismatches'][0]['reason'])
+        self.assertEqual([blocks[1]['processed']['state'][0]['key']], results['first_mismatches'][0]['keys'])
+
+    def test_run__reports_blocks_with_changed_result(self):
+        block = self.mint_block(nonce=0)
+        block['processed']['stamps_used'] += 1
+        self.blocks.store_block(deepcopy(block))
+
+        results = replay.Replayer(blocks=self.blocks, driver=self.replay_driver).run()
+
+        self.assertEqual(replay.RESULT_HASH_MISMATCH, results['first_mismatches'][0]['reason'])
+
+    def test_run__skip_verify_does_not_compare(self):
+        block = self.mint_block(nonce=0)
+        block['processed']['stamps_used'] += 1
+        self.blocks.store_block(deepcopy(block))
+
+        results = replay.Replayer(blocks=self.blocks, driver=self.replay_driver, verify=False).run()
+
+        self.assertEqual(1, results['txs'])
+        self.assertEqual(0, results['mismatches'])
+        self.assertFalse(results['verified'])
+
+    def test_run__start_and_limit(self):
+        blocks = self.store_blocks(amount=3)
+
+        results = replay.Replayer(blocks=self.blocks, driver=self.replay_driver, verify=False).run(
+            start=int(blocks[1]['number']), limit=1
+        )
+
+        self.assertEqual(1, results['txs'])
+
+
+class TestChangedKeys(TestCase):
+    def test_returns_keys_with_other_values(self):
+        produced = [{'key': 'a', 'value': 1}, {'key': 'b', 'value': 2}]
+        expected = [{'key': 'a', 'value': 1}, {'key': 'b', 'value': 3}, {'key': 'c', 'value': 4}]
+
+        self.assertEqual(['b', 'c'], replay.changed_keys(produced=produced, expected=expected))
+
+    def test_same_writes_are_unchanged(self):
+        self.assertEqual([], replay.changed_keys(produced=[{'key': 'a', 'value': 1}], expected=[{'key': 'a', 'value': 1}]))
@@ -0,0 +1,217 @@
+from contracting.stdlib.bridge.decimal import ContractingDecimal
+from lamden.nodes.masternode.state_reader import StateReader, StateReadError, StateChangedError, keys_from_reads, \
+    read_snapshot, height_from_value, MAX_STATE_READS
+from lamden.storage import LATEST_BLOCK_HASH_KEY, LATEST_BLOCK_HEIGHT_KEY, STATE_VERSION_KEY, get_state_version, \
+    state_write
+from unittest import TestCase
+
+
+def make_key(contract, variable, args=None):
+    key = f'{contract}.{variable}'
+    if args:
+        return ':'.join((key, *[str(arg) for arg in args]))
+    return key
+
+
+class MockDriver:
+    def __init__(self, state):
+        self.state = state
+        self.reads = 0
+
+    def get(self, key):
+        self.reads += 1
+        return self.state.get(key)
+
+    def set(self, key, value):
+        self.state[key] = value
+
+
+class ChangingDriver(MockDriver):
+    # Finishes writing a new block after every read of the state version
+    def get(self, key):
+        value = super().get(key)
+        if key == STATE_VERSION_KEY:
+            self.state[key] = (value or 0) + 2
+        return value
+
+
+class InterleavingDriver(MockDriver):
+    # Runs one step of a block write before every read, like the node writing while the webserver reads
+    def __init__(self, state, write):
+        super().__init__(state)
+        self.steps = write(self)
+        self.writing = False
+
+    def get(self, key):
+        if not self.writing:
+            self.writing = True
+            next(self.steps, None)
+            self.writing = False
+        return super().get(key)
+
+
+def hard_apply(driver):
+    # Same order as the node: the state first, then the block is stored, then the height is set
+    with state_write(driver):
+        driver.set('currency.balances:a', 2)
+        driver.set('currency.balances:b', 2)
+        yield
+        yield
+        yield
+        yield
+        driver.set(LATEST_BLOCK_HEIGHT_KEY, 11)
+        yield
+
+
+class TestKeysFromReads(TestCase):
+    def test_tuple_and_dict_reads(self):
+        keys = keys_from_reads([
+            ['currency', 'balances', ['a', 'b']],
+            {'contract': 'currency', 'variable': 'balances', 'keys': [['a', 'b']]},
+            ['con_token', 'owner']
+        ], make_key=make_key)
+
+        self.assertListEqual(keys, [
+            'currency.balances:a', 'currency.balances:b', 'currency.balances:a:b', 'con_token.owner'
+        ])
+
+    def test_rejects_malformed_reads(self):
+        for reads in [None, [], {'contract': 'currency'}, [['currency']], [[1, 'balances', ['a']]],
+                      [['currency', 'balances', 'a']]]:
+            with self.assertRaises(StateReadError):
+                keys_from_reads(reads, make_key=make_key)
+
+    def test_rejects_too_many_keys(self):
+        with self.assertRaises(StateReadError):
+            keys_from_reads([['currency', 'balances', list(range(MAX_STATE_READS + 1))]], make_key=make_key)
+
+
+class TestReadSnapshot(TestCase):
+    def test_returns_values_and_height(self):
+        driver = MockDriver({LATEST_BLOCK_HEIGHT_KEY: 10, 'currency.balances:a': 5})
+
+        height, values = read_snapshot(driver, keys=['currency.balances:a', 'currency.balances:b'])
+
+        self.assertEqual(height, 10)
+        self.assertDictEqual(values, {'currency.balances:a': 5, 'currency.balances:b': None})
+
+    def test_raises_if_state_never_settles(self):
+        driver = ChangingDriver({LATEST_BLOCK_HEIGHT_KEY: 10})
+
+        with self.assertRaises(StateChangedError):
+            read_snapshot(driver, keys=['currency.balances:a'], attempts=3)
+
+    def test_does_not_return_values_of_a_block_being_written(self):
+        for attempts in range(1, 10):
+            driver = InterleavingDriver({
+                LATEST_BLOCK_HEIGHT_KEY: 10, 'currency.balances:a': 1, 'currency.balances:b': 1
+            }, write=hard_apply)
+
+            try:
+                height, values = read_snapshot(driver, keys=['currency.balances:a', 'currency.balances:b'],
+                                               attempts=attempts)
+            except StateChangedError:
+                continue
+
+            self.assertEqual(height, 11)
+            self.assertDictEqual(values, {'currency.balances:a': 2, 'currency.balances:b': 2})
+            return
+
+        self.fail('read_snapshot never returned.')
+
+    def test_retries_while_version_is_odd(self):
+        driver = MockDriver({LATEST_BLOCK_HEIGHT_KEY: 10, STATE_VERSION_KEY: 3})
+
+        with self.assertRaises(StateChangedError):
+            read_snapshot(driver, keys=['currency.balances:a'], attempts=3)
+
+    def test_state_write_makes_version_odd_while_writing(self):
+        driver = MockDriver({})
+
+        with state_write(driver):
+            self.assertEqual(get_state_version(driver), 1)
+
+        self.assertEqual(get_state_version(driver), 2)
+
+    def test_state_write_recovers_from_interrupted_write(self):
+        driver = MockDriver({STATE_VERSION_KEY: 5})
+
+        with state_write(driver):
+            self.assertEqual(get_state_version(driver), 7)
+
+        self.assertEqual(get_state_version(driver), 8)
+
+    def test_height_from_value(self):
+        self.assertEqual(height_from_value(None), -1)
+        self.assertEqual(height_from_value(ContractingDecimal('12')), 12)
+        self.assertEqual(height_from_value('12'), 12)
+
+
+class TestStateReader(TestCase):
+    def setUp(self):
+        self.driver = MockDriver({
+            LATEST_BLOCK_HEIGHT_KEY: 10,
+            LATEST_BLOCK_HASH_KEY: 'a' * 64,
+            'currency.balances:a': 5,
+            'currency.__code__': 'code'
+        })
+        self.reader = StateReader(driver=self.driver, max_keys=3)
+        self.reader.set_live(True)
+
+    def test_reads_are_cached_while_live(self):
+        self.assertEqual(self.reader.get_var('currency', 'balances', ['a']), 5)
+        self.assertEqual(self.reader.get_var('currency', 'balances', ['a']), 5)
+
+        self.assertEqual(self.driver.reads, 1)
+        self.assertEqual(self.reader.hits, 1)
+
+    def test_missing_keys_are_cached(self):
+        self.assertIsNone(self.reader.get_var('currency', 'balances', ['b']))
+        self.assertIsNone(self.reader.get_var('currency', 'balances', ['b']))
+
+        self.assertEqual(self.driver.reads, 1)
+
+    def test_reads_are_not_cached_when_not_live(self):
+        self.reader.set_live(False)
+
+        self.reader.get_var('currency', 'balances', ['a'])
+        self.reader.get_var('currency', 'balances', ['a'])
+
+        self.assertEqual(self.driver.reads, 2)
+        self.assertEqual(len(self.reader), 0)
+
+    def test_cache_is_bounded(self):
+        for key in ['a', 'b', 'c', 'd']:
+            self.reader.get_var('currency', 'balances', [key])
+
+        self.assertEqual(len(self.reader), 3)
+        self.assertNotIn('currency.balances:a', self.reader.cache)
+
+    def test_block_writes_invalidate_keys(self):
+        self.reader.get_var('currency', 'balances', ['a'])
+        self.reader.get_contract('currency')
+        self.assertEqual(self.reader.get_latest_block_height(), 10)
+
+        self.driver.state['currency.balances:a'] = 6
+        self.driver.state[LATEST_BLOCK_HEIGHT_KEY] = 11
+
+        self.reader.update_block({
+            'processed': {'state': [{'key': 'currency.balances:a', 'value': 6}]},
+            'rewards': []
+        })
+
+        self.assertEqual(self.reader.get_var('currency', 'balances', ['a']), 6)
+        self.assertEqual(self.reader.get_latest_block_height(), 11)
+        self.assertIn('currency.__code__', self.reader.cache)
+
+    def test_rewards_invalidate_keys(self):
+        self.reader.get_var('currency', 'balances', ['a'])
+
+        self.reader.update_block({'processed': {'state': []}, 'rewards': [{'key': 'currency.balances:a', 'value': 7}]})
+
+        self.assertNotIn('currency.balances:a', self.reader.cache)
+
+    def test_get_latest_block_hash_defaults_to_zeros(self):
+        self.driver.state.pop(LATEST_BLOCK_HASH_KEY)
+
+        self.assertEqual(self.reader.get_latest_block_hash(), '0' * 64)
@@ -95,6 +95,107 @@ class TestNonce(TestCase):
 
         self.assertEqual(n, 2)
 
+class TestNonceWriteBack(TestCase):
+    def setUp(self):
+        self.temp_storage_dir = Path.cwd().joinpath('temp_nonce_storage')
+        if self.temp_storage_dir.is_dir():
+            shutil.rmtree(self.temp_storage_dir)
+
+        self.nonces = NonceStorage(root=self.temp_storage_dir, write_back=True, sync_interval=0)
+        self.other_process_nonces = NonceStorage(root=self.temp_storage_dir, sync_interval=0)
+
+    def tearDown(self):
+        if self.temp_storage_dir.is_dir():
+            shutil.rmtree(self.temp_storage_dir)
+
+    def test_set_nonce_is_served_from_memory_before_commit(self):
+        self.nonces.set_nonce(sender='test', processor='test2', value=2)
+
+        self.assertEqual(self.nonces.get_nonce(sender='test', processor='test2'), 2)
+        self.assertIsNone(self.nonces.driver.get(self.nonces_key()))
+
+    def test_set_nonce_marks_key_dirty(self):
+        self.nonces.set_nonce(sender='test', processor='test2', value=2)
+
+        self.assertIn(self.nonces_key(), self.nonces.dirty)
+
+    def test_commit_writes_dirty_nonces_to_disk(self):
+        self.nonces.set_nonce(sender='test', processor='test2', value=2)
+        self.nonces.commit()
+
+        self.assertEqual(self.nonces.driver.get(self.nonces_key()), 2)
+        self.assertEqual(len(self.nonces.dirty), 0)
+
+    def test_reads_are_cached(self):
+        self.nonces.get_nonce(sender='test', processor='test2')
+
+        self.assertIn(self.nonces_key(), self.nonces.cache)
+
+    def test_other_process_sees_committed_nonce(self):
+        self.assertIsNone(self.other_process_nonces.get_nonce(sender='test', processor='test2'))
+
+        self.nonces.set_nonce(sender='test', processor='test2', value=2)
+        self.nonces.commit()
+
+        self.assertEqual(self.other_process_nonces.get_nonce(sender='test', processor='test2'), 2)
+
+    def test_write_through_is_seen_by_write_back_instance(self):
+        self.assertIsNone(self.nonces.get_nonce(sender='test', processor='test2'))
+
+        self.other_process_nonces.set_nonce(sender='test', processor='test2', value=5)
+
+        self.assertEqual(self.nonces.get_nonce(sender='test', processor='test2'), 5)
+
+    def test_dirty_values_survive_sync(self):
+        self.nonces.set_nonce(sender='test', processor='test2', value=2)
+        self.other_process_nonces.set_nonce(sender='test3', processor='test2', value=7)
+
+        self.nonces.sync(force=True)
+
+        self.assertEqual(self.nonces.get_nonce(sender='test', processor='test2'), 2)
+
+    def test_stale_cache_kept_until_sync_interval_passes(self):
+        nonces = NonceStorage(root=self.temp_storage_dir, sync_interval=60)
+        self.assertIsNone(nonces.get_nonce(sender='test', processor='test2'))
+
+        self.other_process_nonces.set_nonce(sender='test', processor='test2', value=5)
+        self.assertIsNone(nonces.get_nonce(sender='test', processor='test2'))
+
+        nonces.sync(force=True)
+        self.assertEqual(nonces.get_nonce(sender='test', processor='test2'), 5)
+
+    def test_every_commit_writes_a_new_version(self):
+        versions = set()
+        for value in range(5):
+            self.nonces.set_nonce(sender='test', processor='test2', value=value)
+            self.nonces.commit()
+            versions.add(self.nonces.version_file.read_text())
+
+        self.assertEqual(len(versions), 5)
+
+    def test_commits_in_quick_succession_are_seen_by_other_process(self):
+        senders = ['test', 'test3', 'test4']
+        for sender in senders:
+            self.other_process_nonces.get_nonce(sender=sender, processor='test2')
+
+        for value, sender in enumerate(senders):
+            self.nonces.set_nonce(sender=sender, processor='test2', value=value)
+            self.nonces.commit()
+
+            self.assertEqual(self.other_process_nonces.get_nonce(sender=sender, processor='test2'), value)
+
+    def test_commit_keeps_higher_nonce_committed_by_other_process(self):
+        self.nonces.set_nonce(sender='test', processor='test2', value=2)
+        self.other_process_nonces.set_nonce(sender='test', processor='test2', value=5)
+
+        self.nonces.commit()
+
+        self.assertEqual(self.nonces.driver.get(self.nonces_key()), 5)
+        self.assertEqual(self.nonces.get_nonce(sender='test', processor='test2'), 5)
+
+    def nonces_key(self):
+        return '__n.test:test2'
+
 SAMPLE_BLOCK = {
     'number': 1,
     'hash': 'sample_block_hash',
@@ -336,3 +437,157 @@ class TestBlockStorage(TestCase):
 
         self.assertFalse(os.path.isfile(file_path))
 
+
+    def test_get_block_numbers_returns_sorted_numbers(self):
+        blocks = generate_blocks(
+            number_of_blocks=3,
+            prev_block_hash='0' * 64,
+            prev_block_hlc=self.hlc_clock.get_new_hlc_timestamp()
+        )
+
+        for block in reversed(blocks):
+            self.bs.store_block(copy.deepcopy(block))
+
+        self.assertListEqual(self.bs.get_block_numbers(), [block.get('number') for block in blocks])
+
+    def test_get_block_numbers_sees_new_blocks(self):
+        blocks = generate_blocks(
+            number_of_blocks=2,
+            prev_block_hash='0' * 64,
+            prev_block_hlc=self.hlc_clock.get_new_hlc_timestamp()
+        )
+
+        self.bs.store_block(copy.deepcopy(blocks[0]))
+        self.assertEqual(len(self.bs.get_block_numbers()), 1)
+
+        self.bs.store_block(copy.deepcopy(blocks[1]))
+        self.assertEqual(len(self.bs.get_block_numbers()), 2)
+
+    def test_get_block_range_pages_with_next_cursor(self):
+        blocks = generate_blocks(
+            number_of_blocks=5,
+            prev_block_hash='0' * 64,
+            prev_block_hlc=self.hlc_clock.get_new_hlc_timestamp()
+        )
+
+        for block in blocks:
+            self.bs.store_block(copy.deepcopy(block))
+
+        numbers = [block.get('number') for block in blocks]
+
+        page, next_number = self.bs.get_block_range(start=0, limit=2)
+        self.assertListEqual(page, numbers[:2])
+        self.assertEqual(next_number, numbers[2])
+
+        page, next_number = self.bs.get_block_range(start=next_number, limit=10)
+        self.assertListEqual(page, numbers[2:])
+        self.assertIsNone(next_number)
+
+    def test_get_block_range_stops_at_end(self):
+        blocks = generate_blocks(
+            number_of_blocks=4,
+            prev_block_hash='0' * 64,
+            prev_block_hlc=self.hlc_clock.get_new_hlc_timestamp()
+        )
+
+        for block in blocks:
+            self.bs.store_block(copy.deepcopy(block))
+
+        numbers = [block.get('number') for block in blocks]
+
+        page, next_number = self.bs.get_block_range(start=numbers[1], end=numbers[2])
+
+        self.assertListEqual(page, numbers[1:3])
+        self.assertIsNone(next_number)
+
+    def test_iter_blocks_yields_blocks_in_order(self):
+        blocks = generate_blocks(
+            number_of_blocks=3,
+            prev_block_hash='0' * 64,
+            prev_block_hlc=self.hlc_clock.get_new_hlc_timestamp()
+        )
+
+        for block in blocks:
+            self.bs.store_block(copy.deepcopy(block))
+
+        stored_blocks = list(self.bs.iter_blocks(start=0))
+
+        self.assertListEqual([block.get('hash') for block in stored_blocks], [block.get('hash') for block in blocks])
+        self.assertIsInstance(stored_blocks[0].get('processed'), dict)
+
+    def test_get_block_numbers_sees_blocks_stored_by_other_instance(self):
+        blocks = generate_blocks(
+            number_of_blocks=3,
+            prev_block_hash='0' * 64,
+            prev_block_hlc=self.hlc_clock.get_new_hlc_timestamp()
+        )
+
+        reader = BlockStorage(root=self.temp_storage_dir)
+
+        for index, block in enumerate(blocks):
+            self.bs.store_block(copy.deepcopy(block))
+            self.assertListEqual(reader.get_block_numbers(), [block.get('number') for block in blocks[:index + 1]])
+
+    def test_get_block_numbers_only_reads_new_index_lines(self):
+        blocks = generate_blocks(
+            number_of_blocks=2,
+            prev_block_hash='0' * 64,
+            prev_block_hlc=self.hlc_clock.get_new_hlc_timestamp()
+        )
+
+        self.bs.store_block(copy.deepcopy(blocks[0]))
+        self.bs.get_block_numbers()
+        offset = self.bs.index_offset
+
+        self.bs.store_block(copy.deepcopy(blocks[1]))
+        self.bs.get_block_numbers()
+
+        self.assertGreater(self.bs.index_offset, offset)
+        self.assertEqual(self.bs.index_offset, os.path.getsize(self.bs.index_file))
+
+    def test_get_block_numbers_does_not_repeat_restored_blocks(self):
+        blocks = generate_blocks(
+            number_of_blocks=2,
+            prev_block_hash='0' * 64,
+            prev_block_hlc=self.hlc_clock.get_new_hlc_timestamp()
+        )
+
+        for block in blocks + blocks:
+            self.bs.store_block(copy.deepcopy(block))
+
+        self.assertListEqual(self.bs.get_block_numbers(), [block.get('number') for block in blocks])
+
+    def test_get_block_numbers_is_empty_after_flush(self):
+        blocks = generate_blocks(
+            number_of_blocks=2,
+            prev_block_hash='0' * 64,
+            prev_block_hlc=self.hlc_clock.get_new_hlc_timestamp()
+        )
+
+        for block in blocks:
+            self.bs.store_block(copy.deepcopy(block))
+        self.bs.get_block_numbers()
+
+        self.bs.flush()
+
+        self.assertListEqual(self.bs.get_block_numbers(), [])
+
+        self.bs.store_block(copy.deepcopy(blocks[1]))
+        self.assertListEqual(self.bs.get_block_numbers(), [blocks[1].get('number')])
+
+    def test_index_includes_blocks_stored_before_it_existed(self):
+        blocks = generate_blocks(
+            number_of_blocks=3,
+            prev_block_hash='0' * 64,
+            prev_block_hlc=self.hlc_clock.get_new_hlc_timestamp()
+        )
+
+        for block in blocks[:2]:
+            self.bs.store_block(copy.deepcopy(block))
+        os.remove(self.bs.index_file)
+
+        self.assertListEqual(self.bs.get_block_numbers(), [block.get('number') for block in blocks[:2]])
+
+        self.bs.store_block(copy.deepcopy(blocks[2]))
+
+        self.assertListEqual(self.bs.get_block_numbers(), [block.get('number') for block in blocks])
@@ -0,0 +1,195 @@
+from lamden.nodes.masternode.subscriptions import SubscriptionIndex, Subscription, SubscriptionError, \
+    SUBSCRIBED_EVENT, UNSUBSCRIBED_EVENT, ERROR_EVENT
+from unittest import TestCase
+import json
+
+SENDER = 'a' * 64
+OTHER_SENDER = 'b' * 64
+
+
+def make_block(contract='currency', function='transfer', sender=SENDER, state=None):
+    if state is None:
+        state = [{'key': f'currency.balances:{sender}', 'value': 100}]
+
+    return {
+        'hash': '1' * 64,
+        'number': '1',
+        'hlc_timestamp': '2022-07-18T17:04:54.967101696Z_0',
+        'previous': '0' * 64,
+        'proofs': [{'signature': 's' * 128, 'signer': 'c' * 64}],
+        'processed': {
+            'hash': '2' * 64,
+            'result': 'None',
+            'stamps_used': 18,
+            'state': state,
+            'status': 0,
+            'transaction': {
+                'metadata': {'signature': 's' * 128},
+                'payload': {
+                    'contract': contract,
+                    'function': function,
+                    'kwargs': {},
+                    'nonce': 0,
+                    'processor': 'c' * 64,
+                    'sender': sender,
+                    'stamps_supplied': 20
+                }
+            }
+        },
+        'rewards': [],
+        'origin': {'sender': 'c' * 64, 'signature': 's' * 128},
+        'minted': {'minter': 'c' * 64, 'signature': 's' * 128}
+    }
+
+
+class TestSubscription(TestCase):
+    def test_from_message_requires_a_filter(self):
+        with self.assertRaises(SubscriptionError):
+            Subscription.from_message({'action': 'subscribe', 'filters': {}})
+
+    def test_from_message_rejects_unknown_filter(self):
+        with self.assertRaises(SubscriptionError):
+            Subscription.from_message({'action': 'subscribe', 'filters': {'amount': '1'}})
+
+    def test_from_message_rejects_non_string_filter(self):
+        with self.assertRaises(SubscriptionError):
+            Subscription.from_message({'action': 'subscribe', 'filters': {'contract': 1}})
+
+    def test_matches_all_filters(self):
+        sub = Subscription(contract='currency', function='transfer', sender=SENDER)
+        block = make_block()
+
+        self.assertTrue(sub.matches(block['processed']['transaction']['payload'], block['processed']['state']))
+
+    def test_does_not_match_if_one_filter_differs(self):
+        sub = Subscription(contract='currency', function='approve')
+        block = make_block()
+
+        self.assertFalse(sub.matches(block['processed']['transaction']['payload'], block['processed']['state']))
+
+    def test_matches_key_prefix(self):
+        sub = Subscription(key_prefix=f'currency.balances:{SENDER}')
+        block = make_block()
+
+        self.assertTrue(sub.matches(block['processed']['transaction']['payload'], block['processed']['state']))
+
+    def test_trim_block_removes_signatures_and_unmatched_state(self):
+        sub = Subscription(key_prefix='currency.balances:' + SENDER, trim=True)
+        block = make_block(state=[
+            {'key': f'currency.balances:{SENDER}', 'value': 1},
+            {'key': f'currency.balances:{OTHER_SENDER}', 'value': 2}
+        ])
+
+        trimmed = sub.trim_block(block)
+
+        self.assertNotIn('proofs', trimmed)
+        self.assertNotIn('minted', trimmed)
+        self.assertNotIn('metadata', trimmed['processed']['transaction'])
+        self.assertEqual(trimmed['processed']['state'], [{'key': f'currency.balances:{SENDER}', 'value': 1}])
+        self.assertEqual(trimmed['hash'], block['hash'])
+
+
+class TestSubscriptionIndex(TestCase):
+    def setUp(self):
+        self.index = SubscriptionIndex()
+
+    def test_unsubscribed_clients_receive_everything(self):
+        event = {'event': 'new_block', 'data': make_block()}
+
+        messages = self.index.messages_for_event(event=event, clients=['client_1', 'client_2'])
+
+        self.assertEqual([client for client, _ in messages], ['client_1', 'client_2'])
+
+    def test_filtered_client_only_receives_matching_blocks(self):
+        self.index.subscribe('client_1', Subscription(sender=OTHER_SENDER))
+
+        event = {'event': 'new_block', 'data': make_block(sender=SENDER)}
+        messages = self.index.messages_for_event(event=event, clients=['client_1', 'client_2'])
+        self.assertEqual([client for client, _ in messages], ['client_2'])
+
+        event = {'event': 'new_block', 'data': make_block(sender=OTHER_SENDER)}
+        messages = self.index.messages_for_event(event=event, clients=['client_1', 'client_2'])
+        self.assertEqual([client for client, _ in messages], ['client_1', 'client_2'])
+
+    def test_non_block_events_are_sent_to_filtered_clients(self):
+        self.index.subscribe('client_1', Subscription(contract='con_other'))
+
+        event = {'event': 'upgrade', 'data': {'node_vk': SENDER, 'lamden_tag': 'v2'}}
+        messages = self.index.messages_for_event(event=event, clients=['client_1'])
+
+        self.assertEqual(len(messages), 1)
+
+    def test_trimmed_messages_are_encoded_once_per_prefix(self):
+        self.index.subscribe('client_1', Subscription(contract='currency', trim=True))
+        self.index.subscribe('client_2', Subscription(sender=SENDER, trim=True))
+
+        event = {'event': 'new_block', 'data': make_block()}
+        messages = self.index.messages_for_event(event=event, clients=['client_1', 'client_2'])
+
+        self.assertIs(messages[0][1], messages[1][1])
+        self.assertNotIn('proofs', json.loads(messages[0][1])['data'])
+
+    def test_key_prefix_without_contract_is_scanned(self):
+        self.index.subscribe('client_1', Subscription(key_prefix='curr'))
+
+        self.assertIn('client_1', self.index.prefix_scan)
+        self.assertEqual(self.index.matching_clients(make_block()), {'client_1'})
+
+    def test_key_prefix_is_indexed_by_contract(self):
+        self.index.subscribe('client_1', Subscription(key_prefix='con_token.balances'))
+
+        self.assertEqual(self.index.matching_clients(make_block()), set())
+        self.assertEqual(
+            self.index.matching_clients(make_block(state=[{'key': 'con_token.balances:x', 'value': 1}])),
+            {'client_1'}
+        )
+
+    def test_genesis_block_state_is_filtered(self):
+        self.index.subscribe('client_1', Subscription(key_prefix='currency.balances'))
+
+        genesis = {'hash': '0' * 64, 'number': '0', 'genesis': [{'key': 'currency.balances:x', 'value': 1}]}
+
+        self.assertEqual(self.index.matching_clients(genesis), {'client_1'})
+
+    def test_resubscribe_replaces_previous_subscription(self):
+        self.index.subscribe('client_1', Subscription(sender=SENDER))
+        self.index.subscribe('client_1', Subscription(contract='currency'))
+
+        self.assertNotIn(SENDER, self.index.by_sender)
+        self.assertIn('client_1', self.index.by_contract['currency'])
+        self.assertEqual(len(self.index), 1)
+
+    def test_unsubscribe_removes_index_entries(self):
+        self.index.subscribe('client_1', Subscription(contract='currency'))
+        self.index.unsubscribe('client_1')
+
+        self.assertEqual(self.index.by_contract, {})
+        self.assertFalse(self.index.is_subscribed('client_1'))
+
+    def test_handle_message_subscribe(self):
+        ack = self.index.handle_message(
+            client='client_1',
+            raw_message=json.dumps({'action': 'subscribe', 'filters': {'contract': 'currency'}, 'trim': True})
+        )
+
+        self.assertEqual(ack['event'], SUBSCRIBED_EVENT)
+        self.assertDictEqual(ack['data'], {'filters': {'contract': 'currency'}, 'trim': True})
+        self.assertTrue(self.index.is_subscribed('client_1'))
+
+    def test_handle_message_unsubscribe(self):
+        self.index.subscribe('client_1', Subscription(contract='currency'))
+
+        ack = self.index.handle_message(client='client_1', raw_message=json.dumps({'action': 'unsubscribe'}))
+
+        self.assertEqual(ack['event'], UNSUBSCRIBED_EVENT)
+        self.assertFalse(self.index.is_subscribed('client_1'))
+
+    def test_handle_message_malformed(self):
+        ack = self.index.handle_message(client='client_1', raw_message='not json')
+
+        self.assertEqual(ack['event'], ERROR_EVENT)
+
+    def test_handle_message_unknown_action(self):
+        ack = self.index.handle_message(client='client_1', raw_message=json.dumps({'action': 'dance'}))
+
+        self.assertEqual(ack['event'], ERROR_EVENT)
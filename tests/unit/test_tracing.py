@@ -0,0 +1,80 @@
+from lamden.tracing import Tracer, INTAKE, QUEUED, EXECUTED
+from unittest import TestCase
+import json
+import pathlib
+import shutil
+
+HLC_1 = '2022-07-18T17:04:54.967101696Z_0'
+HLC_2 = '2022-07-18T17:04:55.967101696Z_0'
+HLC_3 = '2022-07-18T17:04:56.967101696Z_0'
+
+
+class TestTracer(TestCase):
+    def setUp(self):
+        self.tracer = Tracer(sample_rate=1, capacity=2)
+
+    def test_records_spans_in_order(self):
+        self.tracer.record(HLC_1, INTAKE)
+        self.tracer.record(HLC_1, QUEUED)
+        self.tracer.record(HLC_1, EXECUTED, hold=0.5)
+
+        trace = self.tracer.get(HLC_1)
+
+        self.assertEqual([span['stage'] for span in trace['spans']], [INTAKE, QUEUED, EXECUTED])
+        self.assertEqual(trace['spans'][2]['hold'], 0.5)
+        self.assertLessEqual(trace['spans'][0]['time'], trace['spans'][2]['time'])
+
+    def test_disabled_tracer_records_nothing(self):
+        tracer = Tracer(sample_rate=0)
+        tracer.record(HLC_1, INTAKE)
+
+        self.assertFalse(tracer.enabled)
+        self.assertEqual(len(tracer), 0)
+
+    def test_oldest_trace_is_dropped_at_capacity(self):
+        self.tracer.record(HLC_1, INTAKE)
+        self.tracer.record(HLC_2, INTAKE)
+        self.tracer.record(HLC_3, INTAKE)
+
+        self.assertEqual(len(self.tracer), 2)
+        self.assertIsNone(self.tracer.get(HLC_1))
+        self.assertEqual([trace['hlc_timestamp'] for trace in self.tracer.latest()], [HLC_2, HLC_3])
+
+    def test_sampling_is_decided_by_hlc_timestamp(self):
+        tracer = Tracer(sample_rate=0.5, capacity=10_000)
+        other = Tracer(sample_rate=0.5, capacity=10_000)
+
+        hlcs = [f'2022-07-18T17:04:54.{i:09d}Z_0' for i in range(1000)]
+        for hlc in hlcs:
+            tracer.record(hlc, INTAKE)
+            other.record(hlc, INTAKE)
+
+        self.assertEqual(list(tracer.traces), list(other.traces))
+        self.assertTrue(300 < len(tracer) < 700)
+
+    def test_sample_rate_must_be_a_fraction(self):
+        with self.assertRaises(ValueError):
+            Tracer(sample_rate=2)
+
+    def test_handle_request_returns_one_or_latest_traces(self):
+        self.tracer.record(HLC_1, INTAKE)
+        self.tracer.record(HLC_2, INTAKE)
+
+        self.assertEqual(json.loads(self.tracer.handle_request({'hlc_timestamp': HLC_1}))['hlc_timestamp'], HLC_1)
+        self.assertEqual(len(json.loads(self.tracer.handle_request({'limit': '1'}))), 1)
+        self.assertEqual(len(json.loads(self.tracer.handle_request({}))), 2)
+
+        with self.assertRaises(ValueError):
+            self.tracer.handle_request({'limit': 'a'})
+
+    def test_dump_writes_one_trace_per_line(self):
+        root = pathlib.Path().cwd().joinpath('temp_traces')
+        self.addCleanup(shutil.rmtree, root, True)
+
+        self.tracer.record(HLC_1, INTAKE)
+        self.tracer.record(HLC_2, INTAKE)
+
+        self.assertEqual(self.tracer.dump(root.joinpath('traces.ndjson')), 2)
+
+        lines = root.joinpath('traces.ndjson').read_text().splitlines()
+        self.assertEqual([json.loads(line)['hlc_timestamp'] for line in lines], [HLC_1, HLC_2])
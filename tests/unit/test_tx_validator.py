@@ -461,6 +461,55 @@ class TestValidator(TestCase):
             nonces=self.driver
         )
 
+    def test_transaction_is_valid_reuses_state_cache(self):
+        w = Wallet()
+
+        client = ContractingClient()
+        client.flush()
+
+        client.set_var(
+            contract='currency',
+            variable='balances',
+            arguments=[w.verifying_key],
+            value=1_000_000
+        )
+
+        client.set_var(
+            contract='stamp_cost',
+            variable='S',
+            arguments=['value'],
+            value=20_000
+        )
+
+        state_cache = {}
+
+        for nonce in range(2):
+            tx = build_transaction(
+                wallet=w,
+                processor='b' * 64,
+                stamps=123,
+                nonce=nonce,
+                contract='currency',
+                function='transfer',
+                kwargs={
+                    'amount': 123,
+                    'to': 'jeff'
+                }
+            )
+
+            transaction.transaction_is_valid(
+                transaction=decode(tx),
+                expected_processor='b' * 64,
+                client=client,
+                nonces=self.driver,
+                state_cache=state_cache
+            )
+
+            # The cached balance is used even after the state changes
+            client.set_var(contract='currency', variable='balances', arguments=[w.verifying_key], value=0)
+
+        self.assertEqual(state_cache[('currency', 'balances', w.verifying_key)], 1_000_000)
+
     def test_transaction_valid_for_fixed(self):
         w = Wallet()
 
@@ -1,5 +1,5 @@
 from unittest import TestCase
-from lamden.crypto.wallet import Wallet, verify
+from lamden.crypto.wallet import Wallet, verify, verify_key
 from lamden.crypto.zbase import bytes_to_zbase32
 
 
@@ -71,6 +71,16 @@ class TestWallet(TestCase):
 
         self.assertFalse(verify(a.verifying_key, message, signature))
 
+    def test_verify_key_is_cached(self):
+        w = Wallet()
+
+        self.assertIs(verify_key(w.verifying_key), verify_key(w.verifying_key))
+        self.assertEqual(w.vk, verify_key(w.verifying_key))
+
+    def test_verify_with_malformed_vk_raises(self):
+        with self.assertRaises(ValueError):
+            verify('abc', 'howdy', Wallet().sign('howdy'))
+
     def test_pretty_vk_works(self):
         w = Wallet()
 
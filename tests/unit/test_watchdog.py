@@ -0,0 +1,96 @@
+from lamden.nodes.watchdog import LoopWatchdog, capture_stack, NOT_CAPTURED
+from unittest import TestCase
+import asyncio
+import json
+import sys
+import time
+
+
+def read_blocks_from_disk(seconds):
+    time.sleep(seconds)
+
+
+async def blocking_task(seconds):
+    await asyncio.sleep(0.05)
+    read_blocks_from_disk(seconds)
+
+
+class TestLoopWatchdog(TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.addCleanup(self.loop.close)
+
+        self.watchdog = LoopWatchdog(threshold=0.05, interval=0.01)
+
+    def run_watched(self, coro, settle=0.1):
+        async def work():
+            self.watchdog.start()
+            await coro
+            await asyncio.sleep(settle)
+            self.watchdog.stop()
+
+        self.loop.run_until_complete(work())
+
+    def test_blocking_call_is_attributed_to_task_and_stack(self):
+        self.run_watched(asyncio.ensure_future(blocking_task(0.2)))
+
+        top = self.watchdog.top()
+
+        self.assertEqual(len(top), 1)
+        self.assertEqual(top[0]['task'], 'blocking_task')
+        self.assertEqual(top[0]['stack'][-1], f'{__name__}:read_blocks_from_disk')
+        self.assertGreaterEqual(top[0]['max_seconds'], 0.15)
+
+    def test_repeated_blocks_are_aggregated(self):
+        async def twice():
+            await blocking_task(0.15)
+            await blocking_task(0.15)
+
+        self.run_watched(twice())
+
+        top = self.watchdog.top(by='count')
+
+        self.assertEqual(top[0]['count'], 2)
+        self.assertAlmostEqual(top[0]['total_seconds'], top[0]['max_seconds'] * 2, delta=0.1)
+
+    def test_no_blockers_when_loop_is_idle(self):
+        self.run_watched(asyncio.sleep(0.2))
+
+        self.assertEqual(self.watchdog.top(), [])
+
+    def test_record_drops_least_recent_blocker_when_full(self):
+        self.watchdog.max_blockers = 2
+
+        self.watchdog.record(('a', ()), 1)
+        self.watchdog.record(('b', ()), 1)
+        self.watchdog.record(('c', ()), 1)
+
+        self.assertEqual(sorted(blocker['task'] for blocker in self.watchdog.top()), ['b', 'c'])
+
+    def test_zero_threshold_disables(self):
+        watchdog = LoopWatchdog(threshold=0)
+
+        async def work():
+            watchdog.start()
+
+        self.loop.run_until_complete(work())
+
+        self.assertFalse(watchdog.running)
+
+    def test_handle_request(self):
+        self.watchdog.record((NOT_CAPTURED, ()), 0.5)
+
+        res = json.loads(self.watchdog.handle_request({'limit': '5', 'by': 'max'}))
+
+        self.assertEqual(res['threshold'], 0.05)
+        self.assertEqual(res['blockers'][0]['task'], NOT_CAPTURED)
+
+        with self.assertRaises(ValueError):
+            self.watchdog.handle_request({'by': 'name'})
+
+
+class TestCaptureStack(TestCase):
+    def test_stack_is_limited_to_depth(self):
+        self.assertEqual(len(capture_stack(sys._getframe(), depth=2)), 2)
+        self.assertEqual(capture_stack(sys._getframe(), depth=1), (f'{__name__}:test_stack_is_limited_to_depth', ))
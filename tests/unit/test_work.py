@@ -159,6 +159,13 @@ class TestWorkValidator(TestCase):
 
         self.assertTrue(self.wv.valid_signature(msg))
 
+    def test_valid_signature_replaces_tx_hash_of_message(self):
+        msg = self.make_tx(wallet=self.wallet)
+        msg['tx_hash'] = 'a' * 64
+
+        self.assertTrue(self.wv.valid_signature(msg))
+        self.assertEqual(tx_hash_from_tx(msg['tx']), msg['tx_hash'])
+
     def test_valid_signature_returns_false_if_invalid(self):
         msg = self.make_tx()
         msg['sender'] = Wallet().verifying_key